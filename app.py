@@ -1,107 +1,55 @@
 ﻿## Connection Check: VS Code is synced!
-import base64
 import html
-import io
-import json
+import itertools
 import os
 import re
 import time
-import zipfile
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from urllib.parse import urljoin
 
-import ddddocr
 import streamlit as st
 import streamlit.components.v1 as components
-from bs4 import BeautifulSoup
-from PIL import Image, ImageEnhance
-from playwright.sync_api import sync_playwright
-
-# Compatibility for OCR libs expecting deprecated PIL constant.
-if not hasattr(Image, "ANTIALIAS") and hasattr(Image, "Resampling"):
-    Image.ANTIALIAS = Image.Resampling.LANCZOS
-
-URL = "https://hcservices.ecourts.gov.in/hcservices/main.php"
-LEXTECHSUITE_LOGIN_URL = "https://lextechsuite.com/?opnLgn=yes"
-LEXTECHSUITE_CASES_URL = "https://lextechsuite.com/Member/Cases"
-MAX_RETRIES = 5
-CASE_TYPES_FILE = Path(__file__).with_name("bench_case_types.json")
-HIGH_COURTS = {
-    "Allahabad High Court": "13",
-    "Bombay High Court": "1",
-    "Calcutta High Court": "16",
-    "Gauhati High Court": "6",
-    "High Court  for State of Telangana": "29",
-    "High Court of Andhra Pradesh": "2",
-    "High Court of Chhattisgarh": "17",
-    "High Court of Delhi": "26",
-    "High Court of Gujarat": "18",
-    "High Court of Himachal Pradesh": "5",
-    "High Court of Jammu and Kashmir": "12",
-    "High Court of Jharkhand": "7",
-    "High Court of Karnataka": "3",
-    "High Court of Kerala": "4",
-    "High Court of Madhya Pradesh": "23",
-    "High Court of Manipur": "25",
-    "High Court of Meghalaya": "21",
-    "High Court of Orissa": "11",
-    "High Court of Punjab and Haryana": "22",
-    "High Court of Rajasthan": "9",
-    "High Court of Sikkim": "24",
-    "High Court of Tripura": "20",
-    "High Court of Uttarakhand": "15",
-    "Madras High Court": "10",
-    "Patna High Court": "8",
-}
-BENCHES_BY_HIGH_COURT = {
-    "1": {
-        "Appellate Side,Bombay": "1",
-        "Bench at Aurangabad": "3",
-        "Bench at Nagpur": "4",
-        "Bombay High Court,Bench at Kolhapur": "7",
-        "High court of Bombay at Goa": "5",
-        "Original Side,Bombay": "2",
-        "Special Court (TORTS) Bombay": "6",
-    }
-}
-
-
-def load_case_types_by_bench(path: Path):
-    if not path.exists():
-        return {}
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        if isinstance(data, dict):
-            return data
-    except Exception:
-        return {}
-    return {}
 
-
-CASE_TYPES_BY_BENCH = load_case_types_by_bench(CASE_TYPES_FILE)
-
-
-def update_terminal(message, placeholder, logs):
-    now = datetime.now().strftime("%H:%M:%S")
-    logs.append(f"[{now}] {message}")
-    # Also mirror logs to the server console (VS Code terminal / container logs).
-    if os.getenv("PRINT_SERVER_LOGS", "1") == "1":
-        try:
-            print(f"[{now}] {message}", flush=True)
-        except Exception:
-            pass
-    rendered_lines = logs[-260:]
-    lines_html = "".join(
-        f'<div class="term-line">{html.escape(line)}</div>' for line in rendered_lines
-    )
-    placeholder.empty()
-    with placeholder.container():
-        st.markdown(
-            f"""
-<div data-terminal-box="1" style="
+from browser_service import BrowserService
+from captcha_ocr import warm_up_ocr
+from debug_artifacts import (
+    DEBUG_BUNDLE_MAX_BYTES,
+    DEBUG_TIERS,
+    build_debug_bundle,
+    cap_debug_files,
+    debug_tier,
+    filter_debug_files,
+    get_debug_index,
+    get_debug_writer,
+    new_run_id,
+)
+from fetch_engine import (
+    BENCHES_BY_HIGH_COURT,
+    CASE_TYPES_BY_BENCH,
+    FETCH_WORKERS,
+    HIGH_COURTS,
+    ensure_dir,
+    iter_fetch_events,
+)
+from lextechsuite import LS_BULK_SAVE, LsUploader, send_cnrs_to_lextechsuite
+from pdf_store import get_pdf_store
+from rate_limiter import get_rate_limiter
+from result_cache import ResultCache
+
+
+TERMINAL_MAX_LINES = 260
+# While a run is active only the newest TERMINAL_LIVE_LINES are redrawn; close() draws all
+# TERMINAL_MAX_LINES once at the end.
+TERMINAL_LIVE_LINES = max(int(os.getenv("TERMINAL_LIVE_LINES", "40") or 1), 1)
+# Minimum seconds between terminal redraws; lines arriving in between are coalesced.
+TERMINAL_RENDER_INTERVAL = float(os.getenv("TERMINAL_RENDER_INTERVAL", "0.5"))
+# column-reverse keeps the box pinned to the newest line without a scroll script.
+TERMINAL_BOX_STYLE = """
   height:260px;
   overflow-y:auto;
+  display:flex;
+  flex-direction:column-reverse;
   border:1px solid #dfe3e8;
   border-radius:8px;
   background:#f5f7fb;
@@ -110,65 +58,65 @@ def update_terminal(message, placeholder, logs):
   font-family:ui-monospace, SFMono-Regular, Menlo, Monaco, Consolas, monospace;
   font-size:14px;
   line-height:1.4;
-">
-  {lines_html}
-</div>
-""",
-            unsafe_allow_html=True,
-        )
-        components.html(
-            """
-<script>
-  const boxes = window.parent.document.querySelectorAll('[data-terminal-box="1"]');
-  const box = boxes.length ? boxes[boxes.length - 1] : null;
-  if (box) { requestAnimationFrame(() => { box.scrollTop = box.scrollHeight; }); }
-</script>
-""",
-            height=0,
-        )
-
-
-def ensure_dir(path: Path):
-    path.mkdir(parents=True, exist_ok=True)
-
-
-def build_debug_file_path(debug_dir: Path, case_slug: str, attempt: int, name: str, ext: str):
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    safe_case = re.sub(r"[^A-Za-z0-9_-]", "_", case_slug)
-    return debug_dir / f"{safe_case}_attempt{attempt}_{name}_{ts}.{ext}"
-
-
-def write_debug_bytes(debug_mode, debug_dir, case_slug, attempt, name, ext, data, placeholder, logs):
-    if not debug_mode:
-        return None
-    ensure_dir(debug_dir)
-    out = build_debug_file_path(debug_dir, case_slug, attempt, name, ext)
-    out.write_bytes(data)
-    update_terminal(f"[debug] saved {name}: {out.as_posix()}", placeholder, logs)
-    return out
+"""
 
 
-def latest_file(debug_dir: Path, pattern: str):
-    if not debug_dir.exists():
-        return None
-    files = list(debug_dir.glob(pattern))
-    if not files:
-        return None
-    return max(files, key=lambda p: p.stat().st_mtime)
+class TerminalSink:
+    """Live terminal for one placeholder: keeps every line, redraws the tail at a bounded rate.
 
+    Each line is timestamped and HTML-escaped once into a ring of the last max_lines;
+    write() only redraws when `interval` has passed since the last draw, so a burst of
+    worker logs costs one render, and a live redraw sends only the last live_lines. Call
+    close() when the run ends to draw the whole ring once.
+    """
 
-def build_debug_zip_bytes(debug_dir: Path):
-    if not debug_dir.exists():
-        return b""
-    files = [p for p in debug_dir.iterdir() if p.is_file()]
-    if not files:
-        return b""
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for file_path in sorted(files):
-            zf.write(file_path, arcname=file_path.name)
-    buf.seek(0)
-    return buf.getvalue()
+    def __init__(
+        self,
+        placeholder,
+        logs=None,
+        max_lines=TERMINAL_MAX_LINES,
+        interval=TERMINAL_RENDER_INTERVAL,
+        live_lines=TERMINAL_LIVE_LINES,
+    ):
+        self.placeholder = placeholder
+        self.logs = logs if logs is not None else []
+        self.interval = interval
+        self.live_lines = live_lines
+        self._ring = deque(maxlen=max_lines)
+        self._last_render = 0.0
+        self._dirty = False
+
+    def write(self, message):
+        now = datetime.now().strftime("%H:%M:%S")
+        line = f"[{now}] {message}"
+        self.logs.append(line)
+        # Also mirror logs to the server console (VS Code terminal / container logs).
+        if os.getenv("PRINT_SERVER_LOGS", "1") == "1":
+            try:
+                print(line, flush=True)
+            except Exception:
+                pass
+        self._ring.append(f'<div class="term-line">{html.escape(line)}</div>')
+        self._dirty = True
+        if time.monotonic() - self._last_render >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if not self._dirty:
+            return
+        start = max(len(self._ring) - self.live_lines, 0)
+        self._render(itertools.islice(self._ring, start, None))
+
+    def close(self):
+        self._render(self._ring)
+
+    def _render(self, lines):
+        self.placeholder.markdown(
+            f'<div data-terminal-box="1" style="{TERMINAL_BOX_STYLE}"><div>{"".join(lines)}</div></div>',
+            unsafe_allow_html=True,
+        )
+        self._dirty = False
+        self._last_render = time.monotonic()
 
 
 def render_fetch_timer(timer_placeholder, start_time, total_cases, current_case_index):
@@ -177,513 +125,64 @@ def render_fetch_timer(timer_placeholder, start_time, total_cases, current_case_
     elapsed = max(time.time() - start_time, 0.0)
     mm = int(elapsed // 60)
     ss = int(elapsed % 60)
+    # Live politeness gauges (rate_limiter.py): how close the workers run to the host limits.
+    rate_text = "".join(
+        f" | {host.split('.')[0]}: {g['in_flight']}/{g['max_concurrency']} in flight, "
+        f"{g['waiting']} waiting, last wait {g['wait_last_ms'] / 1000:.1f}s"
+        for host, g in get_rate_limiter().gauges().items()
+    )
     timer_placeholder.caption(
-        f"Fetching timer: {mm:02d}:{ss:02d} | Case {current_case_index}/{max(total_cases, 1)}"
+        f"Fetching timer: {mm:02d}:{ss:02d} | Case {current_case_index}/{max(total_cases, 1)}{rate_text}"
     )
 
 
-def solve_captcha(page, case_slug, attempt, debug_mode, debug_dir, placeholder, logs):
-    try:
-        page.wait_for_selector("#captcha_image", state="visible", timeout=8000)
-        time.sleep(0.5)
-        locator = page.locator("#captcha_image")
-        src = (locator.get_attribute("src") or "").strip()
-        captcha_bytes = None
-
-        # Prefer the original image URL. Element screenshots in headless mode may be blurrier.
-        if src:
-            try:
-                if src.startswith("data:image"):
-                    _, b64 = src.split(",", 1)
-                    captcha_bytes = base64.b64decode(b64)
-                else:
-                    img_url = urljoin(page.url, src)
-                    res = page.request.get(img_url, timeout=15000)
-                    if res.status == 200:
-                        captcha_bytes = res.body()
-                    else:
-                        update_terminal(f"[debug] captcha URL status={res.status}", placeholder, logs)
-            except Exception as err:
-                update_terminal(f"[debug] captcha URL fetch failed: {str(err).splitlines()[0]}", placeholder, logs)
-
-        if not captcha_bytes:
-            captcha_bytes = locator.screenshot(type="png")
-
-        write_debug_bytes(
-            debug_mode, debug_dir, case_slug, attempt, "captcha_raw", "png", captcha_bytes, placeholder, logs
-        )
-
-        img = Image.open(io.BytesIO(captcha_bytes))
-        raw_w, raw_h = img.size
-        img = img.convert("RGB")
-        img = ImageEnhance.Contrast(img).enhance(3.0)
-        img = ImageEnhance.Brightness(img).enhance(1.2)
-        img = img.resize((img.width * 4, img.height * 4), Image.LANCZOS)
-        img = img.convert("L")
-        img = img.point(lambda px: 0 if px < 128 else 255, "1")
-
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        processed = buf.getvalue()
-        write_debug_bytes(
-            debug_mode, debug_dir, case_slug, attempt, "captcha_processed", "png", processed, placeholder, logs
-        )
-
-        dims = page.evaluate(
-            """() => {
-                const el = document.querySelector('#captcha_image');
-                if (!el) return null;
-                return {
-                    clientWidth: el.clientWidth,
-                    clientHeight: el.clientHeight,
-                    naturalWidth: el.naturalWidth || null,
-                    naturalHeight: el.naturalHeight || null
-                };
-            }"""
-        )
-
-        ocr = ddddocr.DdddOcr(show_ad=False)
-        raw_code = ocr.classification(processed)
-        code = re.sub(r"[^A-Za-z0-9]", "", raw_code).strip()
-
-        src_hint = "data-uri" if src.startswith("data:image") else (src[:120] or "n/a")
-        update_terminal(
-            f"[debug] captcha src={src_hint} raw={raw_w}x{raw_h} js={dims} ocr_raw='{raw_code}' ocr='{code}' len={len(code)}",
-            placeholder,
-            logs,
-        )
-        return code if len(code) == 6 else ""
-    except Exception as err:
-        update_terminal(f"[error] captcha exception: {str(err).splitlines()[0]}", placeholder, logs)
-        return ""
-
-
-def get_latest_order_link(html_content):
-    soup = BeautifulSoup(html_content, "html.parser")
-    table = soup.find("table", class_="order_table")
-    if not table:
-        return None, None
-
-    orders = []
-    for row in table.find_all("tr")[1:]:
-        cols = row.find_all("td")
-        if len(cols) < 5:
-            continue
-        date_text = cols[3].get_text(strip=True)
-        link_tag = cols[4].find("a")
-        if date_text and link_tag:
-            try:
-                dt_obj = datetime.strptime(date_text, "%d-%m-%Y")
-                orders.append((dt_obj, link_tag.get("href")))
-            except Exception:
-                continue
-
-    if not orders:
-        return None, None
-    orders.sort(key=lambda item: item[0], reverse=True)
-    return orders[0][0].strftime("%d-%m-%Y"), orders[0][1]
-
-
-def extract_cnr_number(html_content):
-    text = html_content or ""
-    # Primary: parse the exact case details table row for "CNR Number".
-    try:
-        soup = BeautifulSoup(text, "html.parser")
-        details_table = soup.select_one("table.case_details_table")
-        if details_table:
-            for tr in details_table.select("tr"):
-                row_text = tr.get_text(" ", strip=True)
-                if re.search(r"\bCNR\s*Number\b", row_text, flags=re.IGNORECASE):
-                    strong = tr.find("strong")
-                    candidate = strong.get_text(" ", strip=True) if strong else row_text
-                    cnr_match = re.search(r"\b[A-Z]{2,10}\d{2}-\d{6}-\d{4}\b", candidate)
-                    if cnr_match:
-                        return cnr_match.group(0)
-    except Exception:
-        pass
-    # Fallback: common CNR format anywhere in HTML.
-    match = re.search(r"\b[A-Z]{2,10}\d{2}-\d{6}-\d{4}\b", text)
-    if match:
-        return match.group(0)
-    return ""
-
-
 def digits_only(value: str, max_len: int):
     cleaned = re.sub(r"\D", "", str(value or ""))
     return cleaned[:max_len]
 
 
 
-def normalize_cnr_for_ls(cnr: str):
-    """Normalize CNR to the 16-char form LexTechSuite expects (strip hyphens/spaces)."""
-    raw = str(cnr or "").strip().upper()
-    return re.sub(r"[^A-Z0-9]", "", raw)
-
-
-def send_cnrs_to_lextechsuite(
-    cnrs,
-    email,
-    password,
-    headless=True,
-    terminal_placeholder=None,
-    debug=False,
-    debug_dir=Path("debug_artifacts"),
-):
-    """Send one or more CNR numbers to LexTechSuite Case Manager (+cnr -> Save Record)."""
-    logs = []
-    outcomes = []
-
-    email = (email or "").strip()
-    password = password or ""
-    if not email or not password:
-        raise ValueError("Missing LexTechSuite email/password")
-
-    cnrs_norm = []
-    for c in cnrs or []:
-        n = normalize_cnr_for_ls(c)
-        if n:
-            cnrs_norm.append(n)
-    seen = set()
-    cnrs_norm = [c for c in cnrs_norm if not (c in seen or seen.add(c))]
-    if not cnrs_norm:
-        raise ValueError("No CNRs to send")
-
-    def log(msg: str):
-        # Stream into the app Live terminal logs when available.
-        if terminal_placeholder is not None:
-            update_terminal(msg, terminal_placeholder, logs)
+@st.cache_resource(show_spinner=False)
+def get_browser_service(headless: bool):
+    # One warm browser pool per server process (and headless mode), shared by every
+    # session and rerun, so Fetch Orders / Send to LS / row retries skip the cold start.
+    return BrowserService(size=FETCH_WORKERS, headless=headless, warm_profiles=("hc", "ls"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_ocr_engine():
+    # Load the ddddocr model once per server instead of once per captcha.
+    return warm_up_ocr()
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    # Shared on-disk cache of per-case results; reruns of the same list skip the site.
+    return ResultCache()
+
+
+def label_ls_outcomes(ls_outcomes, results, outcomes):
+    # Attach case refs and display statuses to LexTechSuite send outcomes (in place).
+    cnr_to_case_ref = {}
+    for r in results:
+        c = r.get("cnr")
+        if c and c not in cnr_to_case_ref:
+            cnr_to_case_ref[c] = r.get("case_ref") or r.get("label") or ""
+    for o in outcomes:
+        c = o.get("cnr")
+        if c and c not in cnr_to_case_ref:
+            cnr_to_case_ref[c] = o.get("case_ref") or ""
+    for _o in ls_outcomes:
+        _o["case_ref"] = cnr_to_case_ref.get(_o.get("cnr"), "")
+        # Normalize for display
+        if _o.get("ok") and ("already" in str(_o.get("reason", "")).lower()):
+            _o["status"] = "Already in LexSuite"
+        elif _o.get("ok"):
+            _o["status"] = "Sent to LexSuite"
         else:
-            ts = datetime.now().strftime("%H:%M:%S")
-            logs.append(f"[{ts}] {msg}")
-
-    with sync_playwright() as p:
-        log("[ls] start")
-        browser = p.chromium.launch(
-            headless=headless,
-            args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"],
-        )
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={"width": 1440, "height": 900},
-            locale="en-US",
-        )
-        page = context.new_page()
-        page.set_default_timeout(60000)
-
-        def dump_state(tag: str):
-            if not debug:
-                return
-            try:
-                ensure_dir(debug_dir)
-                ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-                png = debug_dir / f"ls_{tag}_{ts}.png"
-                htmlp = debug_dir / f"ls_{tag}_{ts}.html"
-                page.screenshot(path=str(png), full_page=True)
-                htmlp.write_text(page.content(), encoding="utf-8", errors="ignore")
-                log(f"[ls] debug saved: {png.as_posix()}")
-            except Exception as err:
-                log(f"[ls] debug dump failed: {str(err).splitlines()[0]}")
-
-        def ensure_login_modal_visible():
-            # The login modal should auto-open on ?opnLgn=yes, but keep a safe fallback.
-            if page.locator("#loginEmail").count() > 0 and page.locator("#loginEmail").is_visible():
-                return
-            try:
-                login_btn = page.locator("a:has-text('LOGIN')")
-                if login_btn.count() == 0:
-                    login_btn = page.locator("text=LOGIN")
-                if login_btn.count() > 0:
-                    login_btn.first.click(force=True)
-                    time.sleep(0.8)
-            except Exception:
-                pass
-
-        def perform_login(tag: str):
-            # Always login from the modal-based entry URL, so we don't get stuck on /Public/Login.
-            page.goto(LEXTECHSUITE_LOGIN_URL, wait_until="domcontentloaded", timeout=60000)
-            try:
-                page.wait_for_load_state("networkidle", timeout=30000)
-            except Exception:
-                pass
-
-            ensure_login_modal_visible()
-            page.wait_for_selector("#loginEmail", state="visible", timeout=45000)
-            page.locator("#loginEmail").fill(email)
-            page.locator("#loginPassword").fill(password)
-            dump_state(f"login_before_{tag}")
-            page.locator("#btnLogin").click()
-
-            # Wait for modal to close or at least stop being visible.
-            try:
-                page.wait_for_selector("#loginEmail", state="hidden", timeout=45000)
-            except Exception:
-                pass
-            try:
-                page.wait_for_load_state("networkidle", timeout=60000)
-            except Exception:
-                pass
-
-            # If the site shows an inline error, log it.
-            try:
-                alert = (page.locator("#alert1FormLogin").inner_text() or "").strip()
-                if alert:
-                    log(f"[ls] login alert ({tag}): {alert}")
-            except Exception:
-                pass
-
-            # Debug: show cookie names (not values).
-            if debug:
-                try:
-                    cookies = context.cookies("https://lextechsuite.com")
-                    names = sorted({c.get("name") for c in cookies if c.get("name")})
-                    log(f"[ls] cookies after login ({tag}): {', '.join(names) if names else '(none)'}")
-                except Exception as err:
-                    log(f"[ls] cookie read failed: {str(err).splitlines()[0]}")
-
-            dump_state(f"login_after_{tag}")
-
-
-        log("[ls] open login")
-        perform_login("initial")
-        log("[ls] login submitted")
-
-        def _goto_case_manager():
-            last_err = None
-            for nav_try in range(1, 4):
-                try:
-                    page.goto(LEXTECHSUITE_CASES_URL, wait_until="domcontentloaded", timeout=60000)
-                    try:
-                        page.wait_for_load_state("networkidle", timeout=30000)
-                    except Exception:
-                        pass
-
-                    if "MembersOnlyPage" in page.url:
-                        log("[ls] bounced to MembersOnlyPage (logged out). Re-login...")
-                        dump_state(f"members_only_{nav_try}")
-                        perform_login(f"relogin_{nav_try}")
-                        page.goto(LEXTECHSUITE_CASES_URL, wait_until="domcontentloaded", timeout=60000)
-                        try:
-                            page.wait_for_load_state("networkidle", timeout=30000)
-                        except Exception:
-                            pass
-
-                    log(f"[ls] open Case Manager try {nav_try}/3 url={page.url}")
-
-                    # Success condition: we really are on /Member/Cases (or at least have the FAB UI).
-                    has_fab = page.locator("button.kc_fab_main_btn").count() > 0
-                    has_sub = page.locator("button.sub_fab_btn").count() > 0
-                    try:
-                        has_js = bool(page.evaluate("""() => typeof itmAddModCNR === 'function'"""))
-                    except Exception:
-                        has_js = False
-
-                    if ("/Member/Cases" in page.url) or has_fab or has_sub or has_js:
-                        log(f"[ls] Case Manager ready fab={int(has_fab)} sub={int(has_sub)} js_itmAddModCNR={has_js}")
-                        return
-
-                    last_err = RuntimeError(f"Not on Case Manager (url={page.url})")
-                except Exception as nav_err:
-                    last_err = nav_err
-                    msg = str(nav_err).splitlines()[0]
-                    log(f"[ls] Case Manager nav failed (try {nav_try}/3): {msg}")
-
-                dump_state(f"cases_nav_failed_{nav_try}")
-
-                time.sleep(2.0)
-
-            raise last_err if last_err is not None else RuntimeError("Case Manager navigation failed")
-        log("[ls] open Case Manager")
-        _goto_case_manager()
-
-        def close_add_cnr_modal():
-            try:
-                if page.locator("#fcnr_number").count() > 0 and page.locator("#fcnr_number").is_visible():
-                    try:
-                        page.locator("button.btn-close, button[data-bs-dismiss='modal']").first.click(force=True, timeout=3000)
-                    except Exception:
-                        try:
-                            page.keyboard.press("Escape")
-                        except Exception:
-                            pass
-                    try:
-                        page.wait_for_selector("#fcnr_number", state="hidden", timeout=15000)
-                    except Exception:
-                        pass
-            except Exception:
-                pass
-
-        for idx, cnr16 in enumerate(cnrs_norm, start=1):
-            try:
-                if len(cnr16) != 16:
-                    outcomes.append({"cnr": cnr16, "ok": False, "reason": "CNR must be 16 chars after normalization"})
-                    log(f"[ls] skip {idx}/{len(cnrs_norm)} cnr={cnr16} reason=len!=16")
-                    continue
-
-                log(f"[ls] add cnr {idx}/{len(cnrs_norm)}: {cnr16}")
-                close_add_cnr_modal()
-                # Open the "Add CNR" modal.
-                # The UI uses a floating action button (FAB). Expand it, then click the +cnr sub-button.
-                opened = False
-
-                log("[ls] open +cnr modal")
-
-                for attempt in range(1, 4):
-                    fab_count = 0
-                    sub_count = 0
-                    try:
-                        page.wait_for_selector("button.kc_fab_main_btn", state="attached", timeout=8000)
-                    except Exception:
-                        pass
-
-                    try:
-                        fab = page.locator("button.kc_fab_main_btn")
-                        fab_count = fab.count()
-                        if fab_count > 0:
-                            fab.first.click(force=True)
-                            time.sleep(0.35)
-                    except Exception as err:
-                        log(f"[ls] FAB click attempt {attempt}/3 failed: {str(err).splitlines()[0]}")
-
-                    try:
-                        sub = page.locator("button.sub_fab_btn[data-link-href*='itmAddModCNR']")
-                        if sub.count() == 0:
-                            sub = page.locator("button.sub_fab_btn", has_text="+cnr")
-                        sub_count = sub.count()
-                        if sub_count > 0:
-                            sub.first.click(force=True)
-                            opened = True
-                            log(f"[ls] +cnr opened via sub button (attempt {attempt}/3)")
-                    except Exception as err:
-                        log(f"[ls] +cnr sub click attempt {attempt}/3 failed: {str(err).splitlines()[0]}")
-
-                    if not opened:
-                        try:
-                            ok = page.evaluate("""() => (typeof itmAddModCNR === 'function') ? (itmAddModCNR(), true) : false""")
-                            opened = bool(ok)
-                            log(f"[ls] itmAddModCNR() -> {opened} (attempt {attempt}/3)")
-                        except Exception as js_err:
-                            log(f"[ls] itmAddModCNR() JS failed (attempt {attempt}/3): {str(js_err).splitlines()[0]}")
-
-                    # Quick visibility check.
-                    try:
-                        if page.locator("#fcnr_number").count() > 0 and page.locator("#fcnr_number").is_visible():
-                            opened = True
-                    except Exception:
-                        pass
-
-                    if opened:
-                        break
-
-                    log(f"[ls] +cnr not opened yet (attempt {attempt}/3) fab={fab_count} sub={sub_count}")
-                    time.sleep(0.8)
-
-                if not opened:
-                    try:
-                        ensure_dir(Path("debug_artifacts"))
-                        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        page.screenshot(path=f"debug_artifacts/ls_openfab_{ts}.png", full_page=True)
-                        Path(f"debug_artifacts/ls_openfab_{ts}.html").write_text(page.content(), encoding="utf-8")
-                    except Exception:
-                        pass
-
-                    try:
-                        has_js = page.evaluate("""() => typeof itmAddModCNR === 'function'""")
-                    except Exception:
-                        has_js = False
-
-                    log(f"[ls] could not open +cnr modal. fab={page.locator('button.kc_fab_main_btn').count()} sub={page.locator('button.sub_fab_btn').count()} js_itmAddModCNR={has_js}")
-                    raise RuntimeError("Could not open +cnr modal")
-
-                # Wait for the CNR input. Some pages use name= instead of id=.
-                cnr_input = page.locator("#fcnr_number")
-                if cnr_input.count() == 0:
-                    cnr_input = page.locator("input[name='fcnr_number']")
-
-                try:
-                    cnr_input.wait_for(state="visible", timeout=30000)
-                except Exception:
-                    # Dump diagnostics for this exact failure.
-                    try:
-                        ensure_dir(Path("debug_artifacts"))
-                        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        page.screenshot(path=f"debug_artifacts/ls_addcnr_{ts}.png", full_page=True)
-                        Path(f"debug_artifacts/ls_addcnr_{ts}.html").write_text(page.content(), encoding="utf-8")
-                    except Exception:
-                        pass
-
-                    has_id = page.locator("#fcnr_number").count()
-                    has_name = page.locator("input[name='fcnr_number']").count()
-                    modal_count = page.locator(".modal-content").count()
-                    log(f"[ls] +cnr modal not visible. has_id={has_id} has_name={has_name} modal_content={modal_count}")
-                    raise
-
-                log("[ls] +cnr modal visible")
-                cnr_input.fill(cnr16)
-                page.select_option("#fwher", value="h")
-                page.locator("#btnSav").click()
-                log("[ls] save record clicked")
-
-                # Wait briefly for either an error message or modal close.
-                for _ in range(20):
-                    try:
-                        if page.locator("#spErr_frmAddMod").count() > 0 and page.locator("#spErr_frmAddMod").first.is_visible():
-                            break
-                    except Exception:
-                        pass
-                    try:
-                        if page.locator("#fcnr_number").count() == 0 or not page.locator("#fcnr_number").is_visible():
-                            break
-                    except Exception:
-                        pass
-                    time.sleep(0.5)
-
-                # If it already exists, LexTechSuite shows this element.
-                try:
-                    err_loc = page.locator("#spErr_frmAddMod")
-                    if err_loc.count() > 0:
-                        msg = (err_loc.first.inner_text() or "").strip()
-                        if msg:
-                            log(f"[ls] info: {msg}")
-                        if "already exists" in msg.lower():
-                            outcomes.append({"cnr": cnr16, "ok": True, "reason": "Already in LexSuite"})
-                            # Close the modal so the next CNR can be added.
-                            close_add_cnr_modal()
-                            continue
-                        if "record has been saved" in msg.lower():
-                            outcomes.append({"cnr": cnr16, "ok": True, "reason": "Sent to LexSuite"})
-                            # Try to close the modal so next CNR can be added.
-                            close_add_cnr_modal()
-                            continue
-                except Exception:
-                    pass
-
-                # Best-effort wait for modal to close.
-                try:
-                    page.wait_for_selector("#fcnr_number", state="hidden", timeout=15000)
-                except Exception:
-                    pass
-
-                outcomes.append({"cnr": cnr16, "ok": True, "reason": "Sent to LexSuite"})
-            except Exception as err:
-                msg = str(err).splitlines()[0]
-                outcomes.append({"cnr": cnr16, "ok": False, "reason": msg})
-                log(f"[ls] failed cnr={cnr16} err={msg}")
-
-        browser.close()
-        log("[ls] done")
-
-    return outcomes, logs
-def build_case_ref(case_type: str, no: str, year: str, search_mode: str):
-    if (search_mode or "").upper() == "ST":
-        return f"FILING/{no}/{year}"
-    raw = str(case_type or "").strip()
-    code = raw
-    if "(" in raw:
-        code = raw.split("(", 1)[0].strip()
-    elif "-" in raw:
-        code = raw.split("-", 1)[0].strip()
-    code = code or "CASE"
-    return f"{code}/{no}/{year}"
+            _o["status"] = "Failed"
+            _o["reason"] = _o.get("reason") or "Unknown"
+    return ls_outcomes
 
 
 def run_bot(
@@ -695,309 +194,60 @@ def run_bot(
     fetch_start_time=None,
     debug_mode=False,
     debug_dir=Path("debug_artifacts"),
+    workers=None,
+    engine="browser",
+    use_cache=True,
+    run_id=None,
+    ls_uploader=None,
 ):
-    logs = []
+    terminal = TerminalSink(terminal_placeholder)
     results = []
     case_outcomes = []
+    total_cases = len(cases)
 
-    if debug_mode:
-        ensure_dir(debug_dir)
-
-    with sync_playwright() as p:
-        update_terminal("[start] cloud robot", terminal_placeholder, logs)
-
-        browser = p.chromium.launch(
+    render_fetch_timer(timer_placeholder, fetch_start_time, total_cases, 1)
+    try:
+        for event in iter_fetch_events(
+            cases,
+            workers=workers,
             headless=bool(st.session_state.get("ls_headless", True)),
-            args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"],
-        )
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={"width": 1920, "height": 1080},
-            device_scale_factor=2,
-        )
-        page = context.new_page()
-        page.set_default_timeout(60000)
-
-        total_cases = len(cases)
-        for case_index, case in enumerate(cases, start=1):
-            render_fetch_timer(timer_placeholder, fetch_start_time, total_cases, case_index)
-            case_label = f"{case['name']} {case['no']}/{case['year']}"
-            case_slug = f"{case['name']}_{case['no']}_{case['year']}"
-            row_no = case.get("source_row")
-            search_mode = case.get("search_mode", "CN")
-            update_terminal(f"[case] {case_label}", terminal_placeholder, logs)
-            success = False
-            fetched = False
-            outcome_reason = "Unknown"
-            latest_cnr = ""
-
-            for attempt in range(1, MAX_RETRIES + 1):
-                try:
-                    update_terminal(f"[attempt {attempt}/{MAX_RETRIES}] open page", terminal_placeholder, logs)
-                    render_fetch_timer(timer_placeholder, fetch_start_time, total_cases, case_index)
-                    try:
-                        page.goto(URL, timeout=60000, wait_until="domcontentloaded")
-                    except Exception:
-                        update_terminal("[warn] page load timeout (continue)", terminal_placeholder, logs)
-
-                    time.sleep(2)
-                    try:
-                        page.evaluate("document.querySelectorAll('.modal, .alert, #bs_alert').forEach(e => e.remove())")
-                        update_terminal("[info] popups removed", terminal_placeholder, logs)
-                    except Exception:
-                        pass
-
-                    try:
-                        page.locator("#leftPaneMenuCS").click(force=True)
-                    except Exception:
-                        page.evaluate("document.querySelector('#leftPaneMenuCS').click()")
-
-                    case_sess_state_code = case.get("sess_state_code", default_sess_state_code)
-                    case_court_complex_code = case.get("court_complex_code", default_court_complex_code)
-                    page.select_option("#sess_state_code", value=case_sess_state_code)
-                    time.sleep(1)
-                    page.select_option("#court_complex_code", value=case_court_complex_code)
-                    time.sleep(1)
-
-                    if search_mode == "ST":
-                        try:
-                            if page.locator("#CSfilingNumber").is_visible():
-                                page.locator("#CSfilingNumber").click(force=True)
-                        except Exception:
-                            page.evaluate("document.querySelector('#CSfilingNumber').click()")
-                        page.wait_for_selector("#CSFilingNumberDiv", state="visible", timeout=10000)
-                        page.locator("#filing_no").fill(case["no"])
-                        page.locator("#filyear").fill(case["year"])
-                    else:
-                        try:
-                            if page.locator("#CScaseNumber").is_visible():
-                                page.locator("#CScaseNumber").click(force=True)
-                        except Exception:
-                            page.evaluate("document.querySelector('#CScaseNumber').click()")
-                        page.select_option("#case_type", value=case["value"])
-                        page.locator("#search_case_no").fill(case["no"])
-                        page.locator("#rgyear").fill(case["year"])
-
-                    write_debug_bytes(
-                        debug_mode,
-                        debug_dir,
-                        case_slug,
-                        attempt,
-                        "page_before_captcha",
-                        "png",
-                        page.screenshot(full_page=True),
-                        terminal_placeholder,
-                        logs,
-                    )
-                    code = solve_captcha(
-                        page, case_slug, attempt, debug_mode, debug_dir, terminal_placeholder, logs
-                    )
-                    if not code:
-                        update_terminal("[warn] captcha unreadable. retrying", terminal_placeholder, logs)
-                        write_debug_bytes(
-                            debug_mode,
-                            debug_dir,
-                            case_slug,
-                            attempt,
-                            "dom_snapshot",
-                            "html",
-                            page.content().encode("utf-8", errors="ignore"),
-                            terminal_placeholder,
-                            logs,
-                        )
-                        page.reload()
-                        continue
-
-                    page.locator("#captcha").fill(code)
-                    page.locator("#goResetDiv input[value='Go']").click(force=True)
-
-                    try:
-                        page.wait_for_selector("text=Invalid Captcha", timeout=3000)
-                        update_terminal("[warn] invalid captcha. retrying", terminal_placeholder, logs)
-                        write_debug_bytes(
-                            debug_mode,
-                            debug_dir,
-                            case_slug,
-                            attempt,
-                            "invalid_captcha_page",
-                            "png",
-                            page.screenshot(full_page=True),
-                            terminal_placeholder,
-                            logs,
-                        )
-                        continue
-                    except Exception:
-                        pass
-
-                    # Filing search sometimes takes a few seconds before records are rendered.
-                    cnr_no = ""
-                    disp_rows = 0
-                    disp_links = 0
-                    show_list_visible = False
-                    show_list2_visible = False
-                    for _ in range(12):
-                        html_now = page.content()
-                        cnr_no = extract_cnr_number(html_now)
-                        disp_links = page.locator("#dispTable a").count()
-                        has_history_link = disp_links > 0
-                        has_order_table = page.locator(".order_table").count() > 0
-                        disp_rows = page.locator("#dispTable tbody tr").count()
-                        show_list_visible = page.locator("#showList").count() > 0
-                        show_list2_visible = page.locator("#showList2").count() > 0
-                        if cnr_no or has_history_link or has_order_table or disp_rows > 0 or show_list_visible or show_list2_visible:
-                            break
-                        time.sleep(1)
-                    if cnr_no:
-                        latest_cnr = cnr_no
-                        update_terminal(f"[info] CNR: {cnr_no}", terminal_placeholder, logs)
-                    elif search_mode == "ST":
-                        update_terminal("[info] CNR not found on result page", terminal_placeholder, logs)
-                    update_terminal(
-                        f"[debug] post-submit showList={show_list_visible} showList2={show_list2_visible} disp_rows={disp_rows} disp_links={disp_links}",
-                        terminal_placeholder,
-                        logs,
-                    )
-
-                    try:
-                        history_opened = False
-                        order_visible = False
-                        if page.locator("#dispTable a").count() > 0:
-                            page.locator("#dispTable a").first.click(force=True)
-                            history_opened = True
-                        elif page.locator(".order_table").count() > 0:
-                            order_visible = True
-                            history_opened = True
-                        else:
-                            raise Exception("history_link_not_found")
-
-                        for _ in range(20):
-                            html_after_view = page.content()
-                            if not cnr_no:
-                                cnr_after_view = extract_cnr_number(html_after_view)
-                                if cnr_after_view:
-                                    cnr_no = cnr_after_view
-                                    latest_cnr = cnr_no
-                                    update_terminal(f"[info] CNR: {cnr_no}", terminal_placeholder, logs)
-                            if page.locator(".order_table").count() > 0:
-                                order_visible = True
-                                break
-                            if page.locator("table.case_details_table").count() > 0:
-                                history_opened = True
-                            time.sleep(1)
-
-                        if not order_visible and history_opened:
-                            write_debug_bytes(
-                                debug_mode,
-                                debug_dir,
-                                case_slug,
-                                attempt,
-                                "after_view_no_order_table",
-                                "html",
-                                page.content().encode("utf-8", errors="ignore"),
-                                terminal_placeholder,
-                                logs,
-                            )
-                            update_terminal("[info] history opened but order table not found", terminal_placeholder, logs)
-                            outcome_reason = "History opened; order table not found"
-                            success = True
-                            break
-                        elif page.locator(".order_table").count() > 0:
-                            order_visible = True
-                            history_opened = True
-                    except Exception:
-                        write_debug_bytes(
-                            debug_mode,
-                            debug_dir,
-                            case_slug,
-                            attempt,
-                            "after_submit_no_history",
-                            "html",
-                            page.content().encode("utf-8", errors="ignore"),
-                            terminal_placeholder,
-                            logs,
-                        )
-                        update_terminal("[info] no history/orders found", terminal_placeholder, logs)
-                        outcome_reason = "No history/orders found"
-                        success = True
-                        break
-
-                    if not cnr_no:
-                        cnr_after_view = extract_cnr_number(page.content())
-                        if cnr_after_view:
-                            cnr_no = cnr_after_view
-                            latest_cnr = cnr_no
-                            update_terminal(f"[info] CNR: {cnr_no}", terminal_placeholder, logs)
-
-                    date_str, rel_link = get_latest_order_link(page.content())
-                    if date_str:
-                        full_url = f"https://hcservices.ecourts.gov.in/hcservices/{rel_link}"
-                        update_terminal(f"[info] latest order date: {date_str}", terminal_placeholder, logs)
-                        response = page.request.get(full_url)
-                        content_type = response.headers.get("content-type", "")
-                        if response.status == 200 and "application/pdf" in content_type:
-                            results.append(
-                                {
-                                    "label": f"{case['no']}/{case['year']}",
-                                    "desc": f"{case['name']} (Order: {date_str})",
-                                    "data": response.body(),
-                                    "source_row": row_no,
-                                    "cnr": cnr_no or latest_cnr,
-                                    "case_ref": build_case_ref(
-                                        case.get("case_type", ""),
-                                        case.get("no", ""),
-                                        case.get("year", ""),
-                                        case.get("search_mode", "CN"),
-                                    ),
-                                }
-                            )
-                            update_terminal("[ok] pdf downloaded", terminal_placeholder, logs)
-                            fetched = True
-                            outcome_reason = "PDF downloaded"
-                            success = True
-                            break
-                        update_terminal("[warn] order listed but file missing/broken", terminal_placeholder, logs)
-                        outcome_reason = "Order listed but PDF missing/broken"
-                        success = True
-                        break
-
-                    update_terminal("[info] no recent orders found", terminal_placeholder, logs)
-                    outcome_reason = "No recent orders found"
-                    success = True
-                    break
-                except Exception as err:
-                    msg = str(err).split("\n")[0]
-                    update_terminal(f"[warn] retry {attempt} exception: {msg}", terminal_placeholder, logs)
-                    write_debug_bytes(
-                        debug_mode,
-                        debug_dir,
-                        case_slug,
-                        attempt,
-                        "exception_page",
-                        "png",
-                        page.screenshot(full_page=True),
-                        terminal_placeholder,
-                        logs,
-                    )
-                    time.sleep(2)
-
-            if not success:
-                update_terminal("[error] failed after retries", terminal_placeholder, logs)
-                outcome_reason = "Failed after retries"
-            case_outcomes.append(
-                {
-                    "source_row": row_no,
-                    "case_label": case_label,
-                    "fetched": fetched,
-                    "reason": outcome_reason,
-                    "cnr": latest_cnr,
-                }
-            )
-            time.sleep(1)
-            render_fetch_timer(timer_placeholder, fetch_start_time, total_cases, case_index)
+            debug_mode=debug_mode,
+            debug_dir=debug_dir,
+            default_sess_state_code=default_sess_state_code,
+            default_court_complex_code=default_court_complex_code,
+            service=get_browser_service(bool(st.session_state.get("ls_headless", True))) if engine == "browser" else None,
+            engine=engine,
+            cache=get_result_cache() if use_cache else None,
+            run_id=run_id,
+        ):
+            if event[0] == "log":
+                terminal.write(event[1])
+            elif event[0] == "case":
+                _, _, result, outcome = event
+                if result is not None:
+                    results.append(result)
+                case_outcomes.append(outcome)
+                if ls_uploader is not None and outcome.get("cnr"):
+                    # Pipelined Send to LS: register the CNR while the rest of the run continues.
+                    ls_uploader.put(outcome["cnr"])
+            elif event[0] == "tick":
+                terminal.flush()
+                render_fetch_timer(timer_placeholder, fetch_start_time, total_cases, min(event[1] + 1, total_cases))
+            if ls_uploader is not None:
+                for line in ls_uploader.pop_logs():
+                    terminal.write(line)
+    finally:
+        if ls_uploader is not None:
+            ls_uploader.finish()
+    if ls_uploader is not None:
+        # Usually only the last few CNRs are still in flight here.
+        try:
+            ls_uploader.close(on_log=terminal.write)
+        except Exception as err:
+            terminal.write(f"[ls] error: {str(err).splitlines()[0]}")
+    terminal.close()
+    return results, terminal.logs, case_outcomes
 
-        browser.close()
-        update_terminal("[done] finished", terminal_placeholder, logs)
-        return results, logs, case_outcomes
 
 
 st.set_page_config(page_title="High Court Bot", layout="wide")
@@ -1305,8 +555,31 @@ with main_col:
             st.error(err)
     else:
         st.caption(f"Cases ready: {len(parsed_cases)}")
-        est_total = len(parsed_cases) * avg_case_seconds
+        est_workers = max(min(int(st.session_state.get("fetch_workers", FETCH_WORKERS)), len(parsed_cases)), 1)
+        est_total = -(-len(parsed_cases) // est_workers) * avg_case_seconds
         st.caption(f"Estimated total fetch time: ~{int(est_total // 60)}m {int(est_total % 60)}s")
+    st.number_input(
+        "Parallel browsers",
+        min_value=1,
+        max_value=8,
+        value=FETCH_WORKERS,
+        step=1,
+        key="fetch_workers",
+        help="Each browser fetches cases from the shared queue with its own captcha/session.",
+    )
+    st.selectbox(
+        "Fetch engine",
+        ["browser", "http"],
+        format_func=lambda e: {"browser": "Browser", "http": "Direct HTTP (no browser)"}[e],
+        key="fetch_engine",
+        help="Direct HTTP calls the hcservices endpoints with pooled sessions; use Browser if it starts failing.",
+    )
+    st.checkbox(
+        "Use result cache",
+        value=True,
+        key="use_result_cache",
+        help="Serve recently fetched cases from disk; older entries are re-checked and the PDF is re-downloaded only if a newer order is listed.",
+    )
     fetch_orders = st.button("Fetch Orders", disabled=not parsed_cases or bool(parse_errors))
     parsed_case_by_row_id = {c.get("row_id"): c for c in parsed_cases}
 
@@ -1321,6 +594,9 @@ with bg_col:
                 f"{entry.get('run_id', 'R-NA')} | {entry['timestamp']} | "
                 f"Fetched: {entry.get('fetched_rows', 0)} | Failed: {entry.get('failed_rows', 0)}"
             )
+            cache_counts = entry.get("cache") or {}
+            if any(cache_counts.values()):
+                header += f" | Cache: {cache_counts.get('hit', 0)} hit / {cache_counts.get('stale', 0)} stale / {cache_counts.get('miss', 0)} miss"
             with st.expander(header, expanded=False):
                 for cidx, case in enumerate(entry["cases"], start=1):
                     hc1, hc2 = st.columns([10, 1])
@@ -1345,9 +621,16 @@ with bg_col:
         st.caption("No run history yet.")
 
     st.subheader("Background")
-    default_debug_mode = os.getenv("DEBUG_MODE", "1") == "1"
+    default_debug_tier = debug_tier(os.getenv("DEBUG_MODE", "failures"))
     default_debug_dir = os.getenv("DEBUG_DIR", "debug_artifacts")
-    debug_mode = st.checkbox("Enable cloud diagnostics", value=default_debug_mode)
+    debug_level = st.selectbox(
+        "Cloud diagnostics",
+        DEBUG_TIERS,
+        index=DEBUG_TIERS.index(default_debug_tier),
+        format_func=lambda t: {"off": "Off", "failures": "Failures only", "full": "Full"}[t],
+        help="Failures only keeps the last few screenshots/DOM snapshots per case in memory and saves them when the case fails.",
+    )
+    debug_mode = debug_level != "off"
     debug_dir = Path(default_debug_dir)
     st.caption("Live terminal logs")
     timer_placeholder = st.empty()
@@ -1362,10 +645,30 @@ with bg_col:
         st.session_state["ls_headless"] = True
     if "ls_debug" not in st.session_state:
         st.session_state["ls_debug"] = False
+    if "ls_bulk" not in st.session_state:
+        st.session_state["ls_bulk"] = LS_BULK_SAVE
+    if "ls_stream" not in st.session_state:
+        st.session_state["ls_stream"] = False
     st.text_input("LS email", key="ls_email")
     st.text_input("LS password", type="password", key="ls_password")
     st.checkbox("LS headless", key="ls_headless", help="Turn OFF for local debugging if login modal does not appear in headless mode.")
+    # Start (or reuse) the shared browser pool now so the first fetch/send finds it warm.
+    get_browser_service(bool(st.session_state.get("ls_headless", True)))
+    ocr_stats = get_ocr_engine().stats()
+    if ocr_stats["load_seconds"] is not None:
+        avg_ms = (ocr_stats["avg_inference_seconds"] or 0.0) * 1000
+        st.caption(f"OCR model loaded in {ocr_stats['load_seconds']:.2f}s | {ocr_stats['inferences']} captcha(s), avg {avg_ms:.0f} ms")
     st.checkbox("LS debug", key="ls_debug", help="Save LS screenshots + HTML into debug_artifacts when login/navigation fails.")
+    st.checkbox(
+        "LS bulk save",
+        key="ls_bulk",
+        help="Enter the first CNR in the +cnr modal, then replay its Save Record request for the rest (much faster for large batches).",
+    )
+    st.checkbox(
+        "Send to LS during fetch",
+        key="ls_stream",
+        help="Log in to LexTechSuite when Fetch Orders starts and register each CNR as soon as its case is fetched.",
+    )
     st.caption("Send uses CNR(s) from the last run.")
 
     ls_last_logs = st.session_state.get("ls_last_send_logs", [])
@@ -1376,7 +679,11 @@ with bg_col:
     ls_last_outcomes = st.session_state.get("ls_last_send_outcomes", [])
     if ls_last_outcomes:
         ok_cnt = len([o for o in ls_last_outcomes if o.get("ok")])
-        st.caption(f"Last LS send: {ok_cnt}/{len(ls_last_outcomes)} submitted")
+        skipped_cnt = len([o for o in ls_last_outcomes if o.get("skipped")])
+        st.caption(
+            f"Last LS send: {ok_cnt}/{len(ls_last_outcomes)} submitted"
+            + (f" ({skipped_cnt} already in LexSuite, skipped)" if skipped_cnt else "")
+        )
         with st.expander("Last LS send results", expanded=False):
             for o in ls_last_outcomes[:100]:
                 st.write(f"{'OK' if o.get('ok') else 'FAIL'} | {o.get('cnr')} | {o.get('reason')}")
@@ -1395,21 +702,44 @@ with bg_col:
             st.code(log_text, language="bash")
 
     if debug_dir.exists():
-        debug_files = sorted([p for p in debug_dir.iterdir() if p.is_file()], key=lambda p: p.stat().st_mtime, reverse=True)
-        st.caption(f"Debug files: {len(debug_files)}")
-        if debug_files:
-            zip_bytes = build_debug_zip_bytes(debug_dir)
-            if zip_bytes:
-                st.download_button(
-                    "Download all debug files (.zip)",
-                    data=zip_bytes,
-                    file_name=f"debug_artifacts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-                    mime="application/zip",
-                    key="download_all_debug_zip",
+        debug_index = get_debug_index(debug_dir)
+        debug_stats = debug_index.stats()
+        st.caption(f"Debug files: {debug_stats['files']} ({debug_stats['bytes'] / 1e6:.1f}MB)")
+        if debug_stats["files"]:
+            bundle_run = st.selectbox("Debug bundle run", ["All runs"] + debug_index.run_ids(), key="debug_bundle_run")
+            bundle_case = st.text_input("Debug bundle case", key="debug_bundle_case", placeholder="e.g. SA_508_1999")
+            bundle_files = filter_debug_files(
+                debug_index.files(None if bundle_run == "All runs" else bundle_run),
+                case=bundle_case,
+            )
+
+            zipped_files, skipped = cap_debug_files(bundle_files)
+
+            def read_debug_bundle(files=tuple(zipped_files)):
+                # Built (or reused) only when the button is clicked. Streamlit serves downloads
+                # from memory, so the selection is capped at DEBUG_BUNDLE_MAX_BYTES.
+                debug_index.touch(name for name, _, _ in files)
+                return build_debug_bundle(debug_dir, list(files)).read_bytes()
+
+            if skipped:
+                st.caption(
+                    f"Bundle limited to the newest {len(zipped_files)} files "
+                    f"({DEBUG_BUNDLE_MAX_BYTES / 1e6:.0f}MB); {skipped} older files left out. "
+                    "Pick a run or case to narrow it."
                 )
+
+            bundle_name = bundle_run if bundle_run != "All runs" else "debug_artifacts"
+            st.download_button(
+                f"Download debug files (.zip, {len(zipped_files)} files)",
+                data=read_debug_bundle,
+                file_name=f"{bundle_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                mime="application/zip",
+                key="download_all_debug_zip",
+                disabled=not zipped_files,
+            )
             with st.expander("Latest debug files", expanded=False):
-                for p in debug_files[:20]:
-                    st.write(p.name)
+                for name, _, _ in bundle_files[:20]:
+                    st.write(name)
     else:
         st.caption("No debug files yet.")
 
@@ -1417,9 +747,24 @@ run_single_retry = retry_row_id is not None and retry_row_id in parsed_case_by_r
 
 if fetch_orders or run_single_retry:
     run_now = datetime.now()
-    run_id = run_now.strftime("R-%y%m%d-%H%M%S")
+    run_id = new_run_id()
     run_cases = parsed_cases if fetch_orders else [parsed_case_by_row_id[retry_row_id]]
     t0 = time.time()
+    fetch_engine_name = st.session_state.get("fetch_engine", "browser")
+    fetch_workers = int(st.session_state.get("fetch_workers", FETCH_WORKERS))
+    ls_uploader = None
+    if st.session_state.get("ls_stream"):
+        try:
+            ls_uploader = LsUploader(
+                st.session_state.get("ls_email", ""),
+                st.session_state.get("ls_password", ""),
+                get_browser_service(bool(st.session_state.get("ls_headless", True))),
+                debug=bool(st.session_state.get("ls_debug", False)),
+                debug_dir=debug_dir,
+                bulk=bool(st.session_state.get("ls_bulk", False)),
+            ).start(busy_slots=min(fetch_workers, len(run_cases)) if fetch_engine_name == "browser" else 0)
+        except Exception as err:
+            st.warning(f"Send to LS during fetch skipped: {err}")
     results, run_logs, case_outcomes = run_bot(
         run_cases,
         terminal,
@@ -1427,12 +772,25 @@ if fetch_orders or run_single_retry:
         default_court_complex_code="1",
         timer_placeholder=timer_placeholder,
         fetch_start_time=t0,
-        debug_mode=debug_mode,
+        debug_mode=debug_level,
         debug_dir=debug_dir,
+        workers=fetch_workers,
+        engine=fetch_engine_name,
+        use_cache=bool(st.session_state.get("use_result_cache", True)),
+        run_id=run_id,
+        ls_uploader=ls_uploader,
     )
+    if ls_uploader is not None:
+        if ls_uploader.error is None:
+            st.session_state["ls_last_send_outcomes"] = label_ls_outcomes(ls_uploader.outcomes, results, case_outcomes)
+            st.session_state["ls_last_send_logs"] = ls_uploader.logs
+        else:
+            st.session_state["ls_last_send_logs"] = ls_uploader.logs + [f"[error] {ls_uploader.error}"]
     timer_placeholder.empty()
     elapsed = max(time.time() - t0, 1.0)
-    per_case = elapsed / max(len(run_cases), 1)
+    # Per-case estimate is per browser; the caption divides by the worker count again.
+    used_workers = max(min(int(st.session_state.get("fetch_workers", FETCH_WORKERS)), len(run_cases)), 1)
+    per_case = elapsed * used_workers / max(len(run_cases), 1)
     old_avg = float(st.session_state.get("avg_case_seconds", 35.0))
     st.session_state["avg_case_seconds"] = (old_avg * 0.7) + (per_case * 0.3)
 
@@ -1462,6 +820,7 @@ if fetch_orders or run_single_retry:
             "total_rows": len(run_cases),
             "fetched_rows": len([o for o in case_outcomes if o.get("fetched")]),
             "failed_rows": len([o for o in case_outcomes if not o.get("fetched")]),
+            "cache": {kind: len([o for o in case_outcomes if o.get("cache") == kind]) for kind in ("hit", "stale", "miss")},
             "cases": [
                 {
                     "bench": c["bench"],
@@ -1478,15 +837,18 @@ if fetch_orders or run_single_retry:
     st.session_state["run_history"] = st.session_state["run_history"][:20]
 
     if debug_mode:
+        # Artifacts are written in the background; let the queue drain before listing them.
+        get_debug_writer().flush(timeout=5)
         ensure_dir(debug_dir)
-        log_path = debug_dir / f"terminal_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        log_path = debug_dir / f"{run_id}_terminal_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         log_path.write_text("\n".join(run_logs), encoding="utf-8")
+        get_debug_index(debug_dir).add_file(log_path, run_id)
 
     if debug_mode:
         with bg_col:
             st.info("Diagnostics saved.")
-            raw_img = latest_file(debug_dir, "*_captcha_raw_*.png")
-            processed_img = latest_file(debug_dir, "*_captcha_processed_*.png")
+            raw_img = get_debug_index(debug_dir).latest("captcha_raw")
+            processed_img = get_debug_index(debug_dir).latest("captcha_processed")
             if raw_img or processed_img:
                 st.markdown("### Latest Captcha Diagnostics")
                 col1, col2 = st.columns(2)
@@ -1516,6 +878,12 @@ with main_col:
     not_fetched_rows = [str(o.get("source_row")) for o in last_outcomes if not o.get("fetched") and o.get("source_row")]
     if not_fetched_rows:
         st.warning(f"Rows not fetched: {', '.join(not_fetched_rows)}")
+    cache_kinds = [o.get("cache") for o in last_outcomes if o.get("cache")]
+    if cache_kinds:
+        st.caption(
+            f"Result cache: {cache_kinds.count('hit')} hit | {cache_kinds.count('stale')} revalidated | "
+            f"{cache_kinds.count('miss')} miss"
+        )
     cnr_only_rows = [
         {
             "row": o.get("source_row"),
@@ -1548,28 +916,53 @@ with main_col:
     if results_to_show:
         st.markdown("---")
         st.success(f"Fetched {len(results_to_show)} orders")
+        show_thumbs = st.toggle(
+            "First-page thumbnails",
+            key="pdf_thumbnails",
+            help="Rendered once per PDF (needs pypdfium2) and cached on disk.",
+        )
+        pdf_store = get_pdf_store()
         for idx, res in enumerate(results_to_show, start=1):
-            with st.expander(res["desc"], expanded=True):
+            pdf_key_raw = f"{res.get('label', '')}_{res.get('cnr', '')}_{res.get('source_row', '')}_{idx}"
+            pdf_key = "download_pdf_" + re.sub(r"[^A-Za-z0-9_]+", "_", pdf_key_raw).strip("_")
+            pdf_ref = res.get("pdf_ref")
+            has_pdf = pdf_store.exists(pdf_ref)
+            thumb_url = pdf_store.thumbnail_url(pdf_ref) if show_thumbs and has_pdf else None
+            if thumb_url:
+                thumb_col, body_col = st.columns([1, 5])
+                thumb_col.markdown(
+                    f'<img src="{thumb_url}" style="width:100%;border:1px solid #ddd;" alt="first page">',
+                    unsafe_allow_html=True,
+                )
+            else:
+                body_col = st.container()
+            # Previews render only while their expander is open, and by URL, so reruns stay
+            # cheap however many orders were fetched.
+            with body_col:
+                preview = st.expander(res["desc"], key=f"preview_{pdf_key}", on_change="rerun")
+            with preview:
                 if res.get("case_ref"):
                     st.caption(f"Case: {res['case_ref']}")
                 elif res.get("label"):
                     st.caption(f"Case: {res['label']}")
                 if res.get("cnr"):
                     st.caption(f"CNR: {res['cnr']}")
-                pdf_key_raw = f"{res.get('label', '')}_{res.get('cnr', '')}_{res.get('source_row', '')}_{idx}"
-                pdf_key = "download_pdf_" + re.sub(r"[^A-Za-z0-9_]+", "_", pdf_key_raw).strip("_")
+                if not has_pdf:
+                    st.warning("PDF is no longer in the local store. Retry this row to fetch it again.")
+                    continue
+                # Session state holds only the store ref; the file is read when the button is clicked.
                 st.download_button(
                     label="Download PDF",
-                    data=res["data"],
+                    data=lambda ref=pdf_ref: pdf_store.read(ref),
                     file_name=f"{res['label'].replace('/', '_')}.pdf",
                     mime="application/pdf",
                     key=pdf_key,
                 )
-                b64_pdf = base64.b64encode(res["data"]).decode("utf-8")
-                pdf_display = (
-                    f'<iframe src="data:application/pdf;base64,{b64_pdf}" width="100%" height="500"></iframe>'
-                )
-                st.markdown(pdf_display, unsafe_allow_html=True)
+                if preview.open:
+                    st.markdown(
+                        f'<iframe src="{pdf_store.preview_url(pdf_ref)}" width="100%" height="500"></iframe>',
+                        unsafe_allow_html=True,
+                    )
     elif "last_results" in st.session_state:
         st.warning("Run finished, but no orders were fetched in this attempt. Check terminal/debug artifacts in Background.")
 
@@ -1614,34 +1007,20 @@ if st.session_state.pop("send_to_ls_now", False):
         password = st.session_state.get("ls_password", "")
         with st.spinner(f"Sending {len(cnrs)} CNR(s) to LexTechSuite..."):
             try:
-                cnr_to_case_ref = {}
-                for r in last_results:
-                    c = r.get("cnr")
-                    if c and c not in cnr_to_case_ref:
-                        cnr_to_case_ref[c] = r.get("case_ref") or r.get("label") or ""
-                for o in last_outcomes:
-                    c = o.get("cnr")
-                    if c and c not in cnr_to_case_ref:
-                        cnr_to_case_ref[c] = o.get("case_ref") or ""
+                ls_terminal = TerminalSink(terminal)
                 ls_outcomes, ls_logs = send_cnrs_to_lextechsuite(
                     cnrs=cnrs,
                     email=email,
                     password=password,
                     headless=bool(st.session_state.get("ls_headless", True)),
-                    terminal_placeholder=terminal,
+                    on_log=ls_terminal.write,
                     debug=bool(st.session_state.get("ls_debug", False)),
                     debug_dir=debug_dir,
+                    service=get_browser_service(bool(st.session_state.get("ls_headless", True))),
+                    bulk=bool(st.session_state.get("ls_bulk", False)),
                 )
-                for _o in ls_outcomes:
-                    _o["case_ref"] = cnr_to_case_ref.get(_o.get("cnr"), "")
-                    # Normalize for display
-                    if _o.get("ok") and ("already" in str(_o.get("reason", "")).lower()):
-                        _o["status"] = "Already in LexSuite"
-                    elif _o.get("ok"):
-                        _o["status"] = "Sent to LexSuite"
-                    else:
-                        _o["status"] = "Failed"
-                        _o["reason"] = _o.get("reason") or "Unknown"
+                ls_terminal.close()
+                label_ls_outcomes(ls_outcomes, last_results, last_outcomes)
                 st.session_state["ls_last_send_outcomes"] = ls_outcomes
                 st.session_state["ls_last_send_logs"] = ls_logs
                 ok_cnt = len([o for o in ls_outcomes if o.get("ok")])
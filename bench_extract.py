@@ -0,0 +1,115 @@
+"""Micro-benchmark: legacy per-call BeautifulSoup extraction vs. extract_case_snapshot.
+
+    python bench_extract.py                      # saved snapshots in debug_artifacts/
+    python bench_extract.py page1.html page2.html --repeat 50
+
+The legacy run mirrors the old fetch flow: extract_cnr_number() and
+get_latest_order_link() each parsed the full page with html.parser.
+"""
+import argparse
+import gzip
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from fetch_engine import CNR_PATTERN, HTML_PARSER, extract_case_snapshot, latest_order
+
+SNAPSHOT_GLOBS = tuple(
+    f"*{name}*{ext}"
+    for name in ("dom_snapshot", "after_view_no_order_table", "after_submit_no_history")
+    for ext in (".html", ".html.gz")
+)
+
+
+def legacy_latest_order_link(html_content):
+    soup = BeautifulSoup(html_content, "html.parser")
+    table = soup.find("table", class_="order_table")
+    if not table:
+        return None, None
+    orders = []
+    for row in table.find_all("tr")[1:]:
+        cols = row.find_all("td")
+        if len(cols) < 5:
+            continue
+        date_text = cols[3].get_text(strip=True)
+        link_tag = cols[4].find("a")
+        if date_text and link_tag:
+            try:
+                orders.append((datetime.strptime(date_text, "%d-%m-%Y"), link_tag.get("href")))
+            except Exception:
+                continue
+    if not orders:
+        return None, None
+    orders.sort(key=lambda item: item[0], reverse=True)
+    return orders[0][0].strftime("%d-%m-%Y"), orders[0][1]
+
+
+def legacy_cnr_number(html_content):
+    text = html_content or ""
+    soup = BeautifulSoup(text, "html.parser")
+    details_table = soup.select_one("table.case_details_table")
+    if details_table:
+        for tr in details_table.select("tr"):
+            row_text = tr.get_text(" ", strip=True)
+            if re.search(r"\bCNR\s*Number\b", row_text, flags=re.IGNORECASE):
+                strong = tr.find("strong")
+                candidate = strong.get_text(" ", strip=True) if strong else row_text
+                cnr_match = re.search(CNR_PATTERN, candidate)
+                if cnr_match:
+                    return cnr_match.group(0)
+    match = re.search(CNR_PATTERN, text)
+    return match.group(0) if match else ""
+
+
+def legacy(html):
+    return legacy_cnr_number(html), legacy_latest_order_link(html)
+
+
+def single_pass(html):
+    snapshot = extract_case_snapshot(html)
+    return snapshot["cnr"], latest_order(snapshot)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="saved page HTML (default: snapshots in --debug-dir)")
+    parser.add_argument("--debug-dir", default="debug_artifacts")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    paths = [Path(f) for f in args.files]
+    if not paths:
+        paths = sorted({p for pattern in SNAPSHOT_GLOBS for p in Path(args.debug_dir).glob(pattern)})
+    if not paths:
+        print("no snapshot HTML found; run a fetch with debug on or pass files", file=sys.stderr)
+        return 2
+    pages = [
+        (gzip.decompress(p.read_bytes()) if p.suffix == ".gz" else p.read_bytes()).decode("utf-8", errors="ignore")
+        for p in paths
+    ]
+
+    mismatches = [str(p) for p, html in zip(paths, pages) if legacy(html) != single_pass(html)]
+    timings = {}
+    for name, fn in (("legacy", legacy), ("single_pass", single_pass)):
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            for html in pages:
+                fn(html)
+        timings[name] = (time.perf_counter() - t0) / (args.repeat * len(pages)) * 1000
+
+    print(f"pages={len(pages)} repeat={args.repeat} parser={HTML_PARSER}")
+    for name, ms in timings.items():
+        print(f"{name:<12} {ms:>8.2f} ms/page")
+    print(f"speedup      {timings['legacy'] / max(timings['single_pass'], 1e-9):>8.1f}x")
+    if mismatches:
+        print(f"results differ on {len(mismatches)} page(s): {', '.join(mismatches)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import atexit
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from playwright.sync_api import sync_playwright
+
+from resource_policy import get_resource_policy
+
+BROWSER_ARGS = ["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"]
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+CONTEXT_PROFILES = {
+    # hcservices scraping: large viewport + 2x scale for sharper captcha/debug captures.
+    "hc": {
+        "user_agent": USER_AGENT,
+        "viewport": {"width": 1920, "height": 1080},
+        "device_scale_factor": 2,
+    },
+    # LexTechSuite Case Manager.
+    "ls": {
+        "user_agent": USER_AGENT,
+        "viewport": {"width": 1440, "height": 900},
+        "locale": "en-US",
+    },
+}
+# Profiles whose contexts may be handed to the next job; others are closed after every job
+# (LexTechSuite contexts carry one account's login and must never leak to another user).
+REUSABLE_PROFILES = {"hc"}
+# A context is recycled (closed and replaced by a fresh one) after this many jobs or any error.
+CONTEXT_MAX_USES = max(int(os.getenv("CONTEXT_MAX_USES", "25") or 1), 1)
+
+
+def new_context(browser, profile):
+    # Every context gets the resource policy (see resource_policy.py) before its first page.
+    return get_resource_policy().install(browser.new_context(**CONTEXT_PROFILES[profile]))
+
+
+class BrowserService:
+    """Long-lived pool of browser slots that run jobs on pre-created contexts.
+
+    Playwright's sync API is bound to the thread that started it, so every slot is a
+    thread owning its own driver + browser. Jobs are callables fn(context, *args) that
+    run on whichever slot is free; the slot keeps one pre-created context per warm profile
+    and hands it to the next job, recycling it after CONTEXT_MAX_USES jobs, a failure, or
+    every job for profiles outside REUSABLE_PROFILES.
+    """
+
+    def __init__(self, size=1, headless=True, warm_profiles=("hc",)):
+        self.headless = headless
+        self.warm_profiles = tuple(warm_profiles)
+        self._jobs = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.ensure_capacity(size)
+        # Shut the drivers down cleanly instead of letting interpreter exit kill them mid-pipe.
+        atexit.register(self.close)
+
+    @property
+    def size(self):
+        return len(self._threads)
+
+    def ensure_capacity(self, size):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BrowserService is closed")
+            while len(self._threads) < size:
+                slot_id = len(self._threads) + 1
+                t = threading.Thread(target=self._run, args=(slot_id,), name=f"browser-slot-{slot_id}", daemon=True)
+                self._threads.append(t)
+                t.start()
+
+    def submit(self, fn, *args, profile="hc", **kwargs):
+        if self._closed:
+            raise RuntimeError("BrowserService is closed")
+        fut = Future()
+        self._jobs.put((fut, fn, args, kwargs, profile))
+        return fut
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+        for _ in threads:
+            self._jobs.put(None)
+        for t in threads:
+            t.join(timeout=30)
+
+    def _run(self, slot_id):
+        try:
+            with sync_playwright() as p:
+                self._serve(p)
+        except Exception as err:
+            # Driver failed to start: fail jobs fast instead of leaving callers waiting.
+            msg = str(err).splitlines()[0] if str(err) else type(err).__name__
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                if job[0].set_running_or_notify_cancel():
+                    job[0].set_exception(RuntimeError(f"browser slot {slot_id} failed: {msg}"))
+
+    def _serve(self, p):
+        browser = None
+        warm = {}
+        while True:
+            # Warm up between jobs so the next lease is instant.
+            try:
+                if browser is None or not browser.is_connected():
+                    browser = None
+                    warm = {}
+                    browser = p.chromium.launch(headless=self.headless, args=BROWSER_ARGS)
+                for profile in self.warm_profiles:
+                    if profile not in warm:
+                        warm[profile] = [new_context(browser, profile), 0]
+            except Exception:
+                pass
+
+            job = self._jobs.get()
+            if job is None:
+                break
+            fut, fn, args, kwargs, profile = job
+            if not fut.set_running_or_notify_cancel():
+                continue
+
+            try:
+                if browser is None or not browser.is_connected():
+                    browser = p.chromium.launch(headless=self.headless, args=BROWSER_ARGS)
+                    warm = {}
+                entry = warm.pop(profile, None) or [new_context(browser, profile), 0]
+            except Exception as err:
+                fut.set_exception(err)
+                continue
+
+            context = entry[0]
+            ok = False
+            try:
+                fut.set_result(fn(context, *args, **kwargs))
+                ok = True
+            except BaseException as err:
+                fut.set_exception(err)
+
+            entry[1] += 1
+            try:
+                for pg in list(context.pages):
+                    pg.close()
+                if ok and profile in REUSABLE_PROFILES and entry[1] < CONTEXT_MAX_USES:
+                    warm[profile] = entry
+                else:
+                    context.close()
+            except Exception:
+                # Browser went away mid-job; the next loop relaunches it.
+                pass
+
+        if browser is not None:
+            try:
+                browser.close()
+            except Exception:
+                pass
+
+
+def run_with_logs(service, fn, *args, log=None, profile="hc", **kwargs):
+    """Run fn(context, *args, log=..., **kwargs) on a service slot and relay its log lines.
+
+    Log lines are delivered to `log` on the calling thread (e.g. the Streamlit script thread).
+    """
+    lines = queue.Queue()
+    fut = service.submit(fn, *args, profile=profile, log=lines.put, **kwargs)
+    while True:
+        try:
+            msg = lines.get(timeout=0.2)
+        except queue.Empty:
+            if fut.done() and lines.empty():
+                break
+            continue
+        if log is not None:
+            log(msg)
+    return fut.result()
@@ -0,0 +1,559 @@
+import atexit
+import gzip
+import hashlib
+import io
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import zipfile
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+
+from PIL import Image
+
+# jpeg (Chromium encodes it natively, so the capture itself is cheaper), webp or png.
+DEBUG_SCREENSHOT_FORMAT = os.getenv("DEBUG_SCREENSHOT_FORMAT", "jpeg").lower()
+DEBUG_SCREENSHOT_QUALITY = int(os.getenv("DEBUG_SCREENSHOT_QUALITY", "70"))
+# Pending writes beyond this are dropped rather than slowing a fetch down.
+DEBUG_QUEUE_SIZE = max(int(os.getenv("DEBUG_QUEUE_SIZE", "64") or 1), 1)
+# off: nothing; failures: keep recent frames in memory, save them only when a case fails;
+# full: save every frame as it is captured.
+DEBUG_TIERS = ("off", "failures", "full")
+# Frames per case kept in memory by the failures tier.
+DEBUG_RING_SIZE = max(int(os.getenv("DEBUG_RING_SIZE", "6") or 1), 1)
+DEBUG_BUNDLE_DIR = Path(os.getenv("DEBUG_BUNDLE_DIR", "cache/debug_bundles"))
+DEBUG_BUNDLE_KEEP = 3
+# st.download_button holds the bundle in memory, so it only takes the newest files up to
+# this many (uncompressed) bytes; 0 disables the cap.
+DEBUG_BUNDLE_MAX_BYTES = int(os.getenv("DEBUG_BUNDLE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Retention: least recently used artifacts are evicted above DEBUG_MAX_BYTES, and
+# anything older than DEBUG_MAX_AGE_DAYS is removed (0 disables a cap).
+DEBUG_MAX_BYTES = int(os.getenv("DEBUG_MAX_BYTES", str(256 * 1024 * 1024)))
+DEBUG_MAX_AGE_DAYS = float(os.getenv("DEBUG_MAX_AGE_DAYS", "7"))
+DEBUG_INDEX_NAME = "index.jsonl"
+# Artifact names start with the run id, e.g. R-261017-091500_SA_508_1999_attempt1_captcha_raw_....png
+RUN_ID_PATTERN = re.compile(r"^(R-\d{6}-\d{6})_")
+# Already-compressed artifacts are stored in bundles as-is instead of deflated again.
+STORED_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".gz", ".zip"}
+
+
+_WARNED_TIERS = set()
+
+
+def debug_tier(value):
+    """Normalize a debug setting (tier name, DEBUG_MODE value or bool) to a DEBUG_TIERS entry.
+
+    DEBUG_MODE=1 keeps its old meaning (capture everything, "full"). Unknown values turn
+    diagnostics off with a warning instead of failing the import of the app.
+    """
+    value = str(value).strip().lower() if value is not None else "off"
+    if value in ("", "0", "false", "no", "off", "none"):
+        return "off"
+    if value == "failures":
+        return "failures"
+    if value in ("1", "2", "true", "yes", "on", "full"):
+        return "full"
+    if value not in _WARNED_TIERS:
+        _WARNED_TIERS.add(value)
+        print(f"[warn] unknown debug tier '{value}' (choose from {', '.join(DEBUG_TIERS)}); diagnostics off", file=sys.stderr)
+    return "off"
+
+
+def ensure_dir(path: Path):
+    path.mkdir(parents=True, exist_ok=True)
+
+
+def new_run_id():
+    return datetime.now().strftime("R-%y%m%d-%H%M%S")
+
+
+def build_debug_file_path(debug_dir: Path, case_slug: str, attempt: int, name: str, ext: str, run_id=None):
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    safe_case = re.sub(r"[^A-Za-z0-9_-]", "_", case_slug)
+    prefix = f"{run_id}_" if run_id else ""
+    return debug_dir / f"{prefix}{safe_case}_attempt{attempt}_{name}_{ts}.{ext}"
+
+
+def run_id_of(name):
+    match = RUN_ID_PATTERN.match(name)
+    return match.group(1) if match else None
+
+
+def parse_debug_file_name(name):
+    """(run_id, case_slug, attempt, kind) recovered from a build_debug_file_path() name."""
+    run_id = run_id_of(name)
+    rest = name[len(run_id) + 1 :] if run_id else name
+    match = re.match(r"(.+?)_attempt(\d+)_(.+)_\d{8}_\d{6}_\d{6}\.", rest)
+    if match:
+        return run_id, match.group(1), int(match.group(2)), match.group(3)
+    if rest.startswith("terminal_log"):
+        return run_id, "", 0, "terminal_log"
+    return run_id, "", 0, "other"
+
+
+def scan_debug_dir(debug_dir):
+    """[(name, size, mtime_ns)] for the files in debug_dir, newest first (one scandir pass)."""
+    files = []
+    try:
+        with os.scandir(debug_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith(".tmp") and entry.name != DEBUG_INDEX_NAME:
+                    st = entry.stat()
+                    files.append((entry.name, st.st_size, st.st_mtime_ns))
+    except FileNotFoundError:
+        return []
+    files.sort(key=lambda f: f[2], reverse=True)
+    return files
+
+
+def filter_debug_files(files, run_id=None, case=None):
+    case_key = re.sub(r"[^A-Za-z0-9_-]", "_", case.strip()).lower() if case else ""
+    return [
+        f
+        for f in files
+        if (not run_id or run_id_of(f[0]) == run_id) and (not case_key or case_key in f[0].lower())
+    ]
+
+
+def cap_debug_files(files, max_bytes=DEBUG_BUNDLE_MAX_BYTES):
+    """Newest scan_debug_dir() entries that fit in max_bytes; returns (kept, skipped_count)."""
+    if not max_bytes:
+        return list(files), 0
+    kept, total = [], 0
+    for f in sorted(files, key=lambda f: f[2], reverse=True):
+        if total + f[1] > max_bytes:
+            break
+        kept.append(f)
+        total += f[1]
+    return kept, len(files) - len(kept)
+
+
+def build_debug_bundle(debug_dir, files, bundle_dir=DEBUG_BUNDLE_DIR):
+    """Zip the given scan_debug_dir() entries to a file and return its path.
+
+    The zip is written to disk file by file (never held in memory) and named by a
+    fingerprint of the selection, so asking again for an unchanged selection reuses it.
+    """
+    debug_dir = Path(debug_dir)
+    bundle_dir = Path(bundle_dir)
+    fingerprint = hashlib.sha1(json.dumps([str(debug_dir.resolve()), sorted(files)]).encode("utf-8")).hexdigest()
+    target = bundle_dir / f"debug_{fingerprint[:16]}.zip"
+    if target.is_file():
+        os.utime(target)
+        return target
+    ensure_dir(bundle_dir)
+    tmp = target.with_name(target.name + ".tmp")
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, _, _ in sorted(files):
+            path = debug_dir / name
+            if not path.is_file():
+                continue
+            suffix = path.suffix.lower()
+            zf.write(path, arcname=name, compress_type=zipfile.ZIP_STORED if suffix in STORED_SUFFIXES else zipfile.ZIP_DEFLATED)
+    os.replace(tmp, target)
+    old_bundles = sorted(bundle_dir.glob("debug_*.zip"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in old_bundles[DEBUG_BUNDLE_KEEP:]:
+        stale.unlink(missing_ok=True)
+    return target
+
+
+class DebugIndex:
+    """Append-only index (<debug_dir>/index.jsonl) of the artifacts in one debug dir.
+
+    Each written artifact appends {"op": "add", path, run_id, case, attempt, kind, size, ts};
+    evictions and bundle downloads append "evict" / "touch" records. The records are
+    replayed into memory once and then read incrementally, so listing a run or finding
+    the latest captcha costs a single stat of the index file instead of a directory scan.
+    add() also applies retention: artifacts older than max_age_days go first, then least
+    recently used ones until the dir is under max_bytes.
+    """
+
+    def __init__(self, debug_dir, max_bytes=None, max_age_days=None):
+        self.debug_dir = Path(debug_dir)
+        self.path = self.debug_dir / DEBUG_INDEX_NAME
+        self.max_bytes = DEBUG_MAX_BYTES if max_bytes is None else int(max_bytes)
+        self.max_age_days = DEBUG_MAX_AGE_DAYS if max_age_days is None else float(max_age_days)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._entries = OrderedDict()  # name -> record, least recently used first
+        self._latest = {}  # kind -> name
+        self._runs = {}  # run_id -> {name: None}
+        self._bytes = 0
+        self._offset = 0
+        self._records = 0
+        self._next_age_check = 0.0
+
+    def refresh(self):
+        """Pick up records appended since the last call (by this or another process)."""
+        with self._lock:
+            try:
+                size = self.path.stat().st_size
+            except FileNotFoundError:
+                if self._offset or not self.debug_dir.is_dir():
+                    self._reset()
+                    return
+                self._rebuild()
+                return
+            if size < self._offset:
+                self._reset()
+            if size == self._offset:
+                return
+            with open(self.path, "rb") as fh:
+                fh.seek(self._offset)
+                chunk = fh.read()
+            # A writer may be mid-line; leave a partial last line for the next refresh.
+            end = chunk.rfind(b"\n") + 1
+            for line in chunk[:end].splitlines():
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    continue
+            self._offset += end
+
+    def _rebuild(self):
+        # No index yet (first run or deleted): seed it from the files already on disk, oldest first.
+        lines = []
+        for name, size, mtime_ns in reversed(scan_debug_dir(self.debug_dir)):
+            run_id, case, attempt, kind = parse_debug_file_name(name)
+            lines.append(
+                {"op": "add", "path": name, "run_id": run_id, "case": case, "attempt": attempt,
+                 "kind": kind, "size": size, "ts": mtime_ns / 1e9}
+            )
+        self._write_records(lines, mode="w")
+
+    def _apply(self, record):
+        op, name = record["op"], record["path"]
+        self._records += 1
+        if op == "add":
+            self._drop(name)
+            self._entries[name] = record
+            self._bytes += record.get("size", 0)
+            latest = self._latest.get(record.get("kind"))
+            if latest is None or self._entries[latest]["ts"] <= record["ts"]:
+                self._latest[record.get("kind")] = name
+            self._runs.setdefault(record.get("run_id"), {})[name] = None
+        elif op == "touch" and name in self._entries:
+            self._entries.move_to_end(name)
+        elif op == "evict":
+            self._drop(name)
+
+    def _drop(self, name):
+        record = self._entries.pop(name, None)
+        if record is None:
+            return
+        self._bytes -= record.get("size", 0)
+        self._runs.get(record.get("run_id"), {}).pop(name, None)
+        kind = record.get("kind")
+        if self._latest.get(kind) == name:
+            # Rare (the newest file of a kind was evicted); fall back to the newest remaining one.
+            same_kind = [r for r in self._entries.values() if r.get("kind") == kind]
+            if same_kind:
+                self._latest[kind] = max(same_kind, key=lambda r: r["ts"])["path"]
+            else:
+                self._latest.pop(kind, None)
+
+    def _write_records(self, records, mode="a"):
+        if not records and mode == "a":
+            return
+        ensure_dir(self.debug_dir)
+        data = "".join(json.dumps(r) + "\n" for r in records).encode("utf-8")
+        if mode == "w":
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, self.path)
+            self._reset()
+        else:
+            self.refresh()
+            with open(self.path, "ab") as fh:
+                fh.write(data)
+        self.refresh()
+
+    def add(self, name, run_id=None, case="", attempt=0, kind="other", size=0):
+        with self._lock:
+            self._write_records(
+                [{"op": "add", "path": name, "run_id": run_id, "case": case, "attempt": attempt,
+                  "kind": kind, "size": size, "ts": time.time()}]
+            )
+            self.enforce()
+
+    def add_file(self, path, run_id=None):
+        """Index a file written outside the DebugWriter (e.g. the terminal log)."""
+        path = Path(path)
+        parsed_run, case, attempt, kind = parse_debug_file_name(path.name)
+        self.add(path.name, run_id or parsed_run, case, attempt, kind, path.stat().st_size)
+
+    def touch(self, names):
+        with self._lock:
+            self._write_records([{"op": "touch", "path": name} for name in names if name in self._entries])
+
+    def enforce(self):
+        """Apply the age and size caps; returns the number of evicted artifacts."""
+        with self._lock:
+            self.refresh()
+            victims = []
+            now = time.time()
+            if self.max_age_days > 0 and now >= self._next_age_check:
+                # Age needs a full pass over the index; once a minute is plenty.
+                self._next_age_check = now + 60
+                cutoff = now - self.max_age_days * 86400
+                victims = [name for name, r in self._entries.items() if r["ts"] < cutoff]
+            if self.max_bytes > 0:
+                total = self._bytes - sum(self._entries[name].get("size", 0) for name in victims)
+                chosen = set(victims)
+                for name, record in self._entries.items():
+                    if total <= self.max_bytes:
+                        break
+                    if name not in chosen:
+                        victims.append(name)
+                        total -= record.get("size", 0)
+            if not victims:
+                return 0
+            for name in victims:
+                (self.debug_dir / name).unlink(missing_ok=True)
+            self._write_records([{"op": "evict", "path": name} for name in victims])
+            # Evict records pile up; rewrite the index once they outnumber the live entries.
+            if self._records > 2 * len(self._entries) + 256:
+                self._write_records(list(self._entries.values()), mode="w")
+            return len(victims)
+
+    def latest(self, kind):
+        """Path of the newest artifact of a kind (e.g. "captcha_raw"), or None."""
+        with self._lock:
+            self.refresh()
+            name = self._latest.get(kind)
+            return self.debug_dir / name if name else None
+
+    def files(self, run_id=None):
+        """[(name, size, ts)] newest first, optionally for one run; the shape scan_debug_dir() returns."""
+        with self._lock:
+            self.refresh()
+            names = self._runs.get(run_id, {}) if run_id else self._entries
+            records = [self._entries[name] for name in names]
+        records.sort(key=lambda r: r["ts"], reverse=True)
+        return [(r["path"], r.get("size", 0), r["ts"]) for r in records]
+
+    def run_ids(self):
+        with self._lock:
+            self.refresh()
+            return sorted((run_id for run_id, names in self._runs.items() if run_id and names), reverse=True)
+
+    def stats(self):
+        with self._lock:
+            self.refresh()
+            return {"files": len(self._entries), "bytes": self._bytes}
+
+
+_INDEXES = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def get_debug_index(debug_dir):
+    key = str(Path(debug_dir).resolve())
+    with _INDEX_LOCK:
+        if key not in _INDEXES:
+            _INDEXES[key] = DebugIndex(debug_dir)
+        return _INDEXES[key]
+
+
+def _encode_webp(data):
+    with Image.open(io.BytesIO(data)) as img:
+        buf = io.BytesIO()
+        img.convert("RGB").save(buf, format="WEBP", quality=DEBUG_SCREENSHOT_QUALITY, method=4)
+        return buf.getvalue()
+
+
+ENCODERS = {
+    "gzip": lambda data: gzip.compress(data, compresslevel=6),
+    "webp": _encode_webp,
+}
+
+
+class DebugWriter:
+    """Writes debug artifacts on a background thread behind a bounded queue.
+
+    submit() never blocks: when the queue is full the artifact is dropped and counted,
+    so a slow disk can not stall the scrape loop. Compression (gzip, WebP) runs on the
+    writer thread too; the fetch thread only captures.
+    """
+
+    def __init__(self, maxsize=DEBUG_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name="debug-writer", daemon=True)
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, path, data, encoding=None, meta=None):
+        # meta (run_id, case, attempt, kind) is recorded in the dir's DebugIndex once written.
+        try:
+            self._queue.put_nowait((Path(path), data, encoding, meta))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def flush(self, timeout=10.0):
+        # Wait (bounded) for queued artifacts, e.g. before zipping the debug dir or at exit.
+        # Same condition Queue.join() waits on, but with a deadline and on the calling thread.
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            path, data, encoding, meta = self._queue.get()
+            try:
+                if encoding:
+                    data = ENCODERS[encoding](data)
+                ensure_dir(path.parent)
+                tmp = path.with_name(path.name + ".tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+                with self._lock:
+                    self.written += 1
+                    self.bytes_written += len(data)
+                try:
+                    get_debug_index(path.parent).add(path.name, size=len(data), **(meta or {}))
+                except Exception:
+                    pass
+            except Exception:
+                with self._lock:
+                    self.dropped += 1
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "written": self.written,
+                "dropped": self.dropped,
+                "bytes": self.bytes_written,
+                "pending": self._queue.qsize(),
+            }
+
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+
+def get_debug_writer():
+    global _WRITER
+    if _WRITER is None:
+        with _WRITER_LOCK:
+            if _WRITER is None:
+                _WRITER = DebugWriter()
+    return _WRITER
+
+
+class CaseDebug:
+    """Debug capture for one case, following the debug tier.
+
+    In the full tier every frame is queued for writing as it is captured. In the
+    failures tier the last DEBUG_RING_SIZE frames stay in memory and are only written
+    by flush(), which the fetch flow calls on an invalid captcha, an exception or a
+    final failure; frames of cases that end well are discarded.
+    """
+
+    def __init__(self, debug_mode, debug_dir, case_slug, log, run_id=None, ring_size=DEBUG_RING_SIZE):
+        self.tier = debug_tier(debug_mode)
+        self.enabled = self.tier != "off"
+        self.debug_dir = Path(debug_dir)
+        self.case_slug = case_slug
+        self.run_id = run_id
+        self.log = log
+        self._ring = deque(maxlen=ring_size)
+
+    def bytes(self, attempt, name, ext, data, encoding=None):
+        if not self.enabled:
+            return None
+        out = build_debug_file_path(self.debug_dir, self.case_slug, attempt, name, ext, self.run_id)
+        if self.tier == "full":
+            return self._write(out, attempt, name, data, encoding)
+        self._ring.append((out, attempt, name, data, encoding))
+        return None
+
+    def screenshot(self, attempt, name, page):
+        if not self.enabled:
+            return None
+        # The failures tier keeps the visible viewport only; full keeps today's full-page capture.
+        full_page = self.tier == "full"
+        try:
+            if DEBUG_SCREENSHOT_FORMAT == "png":
+                data, ext, encoding = page.screenshot(full_page=full_page), "png", None
+            elif DEBUG_SCREENSHOT_FORMAT == "webp":
+                data, ext, encoding = page.screenshot(full_page=full_page), "webp", "webp"
+            else:
+                data = page.screenshot(full_page=full_page, type="jpeg", quality=DEBUG_SCREENSHOT_QUALITY)
+                ext, encoding = "jpg", None
+        except Exception as err:
+            self.log(f"[debug] screenshot {name} failed: {str(err).splitlines()[0]}")
+            return None
+        return self.bytes(attempt, name, ext, data, encoding)
+
+    def html(self, attempt, name, source):
+        """Page HTML, saved gzipped (.html.gz). source is a page or an HTML/text string."""
+        if not self.enabled:
+            return None
+        try:
+            text = source if isinstance(source, str) else source.content()
+        except Exception as err:
+            self.log(f"[debug] html {name} failed: {str(err).splitlines()[0]}")
+            return None
+        return self.bytes(attempt, name, "html.gz", text.encode("utf-8", errors="ignore"), "gzip")
+
+    def flush(self, reason):
+        if not self._ring:
+            return
+        self.log(f"[debug] {reason}: saving {len(self._ring)} recent frame(s)")
+        while self._ring:
+            self._write(*self._ring.popleft())
+
+    def _write(self, out, attempt, name, data, encoding):
+        meta = {"run_id": self.run_id, "case": self.case_slug, "attempt": attempt, "kind": name}
+        if get_debug_writer().submit(out, data, encoding, meta):
+            self.log(f"[debug] saved {name}: {out.as_posix()}")
+            return out
+        self.log(f"[debug] writer busy; dropped {name}")
+        return None
+
+
+class CaseDebugs:
+    """The CaseDebug of every case in a fetch run, shared by its workers.
+
+    The RetryScheduler runs one attempt at a time and may requeue a case onto another
+    worker; keeping one CaseDebug per case lets a later flush still save the frames the
+    earlier attempts buffered.
+    """
+
+    def __init__(self, debug_mode, debug_dir):
+        self.debug_mode = debug_mode
+        self.debug_dir = debug_dir
+        self._lock = threading.Lock()
+        self._cases = {}
+
+    def get(self, key, case_slug, log, run_id=None):
+        with self._lock:
+            debug = self._cases.get(key)
+            if debug is None:
+                debug = self._cases[key] = CaseDebug(self.debug_mode, self.debug_dir, case_slug, log, run_id=run_id)
+            return debug
+
+    def discard(self, key):
+        with self._lock:
+            self._cases.pop(key, None)
@@ -0,0 +1,1056 @@
+import argparse
+import base64
+import csv
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, SoupStrainer
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from browser_service import BrowserService
+from debug_artifacts import CaseDebug, CaseDebugs, debug_tier, ensure_dir, get_debug_writer, new_run_id
+from pdf_store import get_pdf_store
+from rate_limiter import get_rate_limiter
+from resource_policy import get_resource_policy
+from retry_scheduler import RETRY_POLICY, SITE_DOWN_REASON, RetryScheduler, classify_failure
+from result_cache import RESULT_CACHE_PATH, RESULT_CACHE_TTL, ResultCache
+from captcha_ocr import CAPTCHA_PREPROCESS, encode_png, get_ocr_engine, preprocess_captcha, warm_up_ocr
+
+URL = "https://hcservices.ecourts.gov.in/hcservices/main.php"
+MAX_RETRIES = 5
+FETCH_WORKERS = max(int(os.getenv("FETCH_WORKERS", "2") or 1), 1)
+# Per-step timeouts (ms) for the hcservices flow. Every wait returns as soon as the page
+# is ready; these only bound how long a stuck step may take.
+STEP_TIMEOUTS = {
+    "goto": 60000,
+    "form_ready": 15000,
+    "bench_options": 10000,
+    "case_types": 10000,
+    "captcha_image": 8000,
+    "submit_result": 12000,
+    "history": 20000,
+    "history_orders_grace": 5000,
+}
+CNR_PATTERN = r"\b[A-Z]{2,10}\d{2}-\d{6}-\d{4}\b"
+# SUBMIT_STATE_JS reads body.innerText (a layout pass), so it is polled on an interval
+# instead of every animation frame.
+SUBMIT_POLL_MS = 100
+# Resolves once the search has answered: "invalid" for a rejected captcha, "result" when any
+# result marker rendered. Mirrors the markers the old polling loop looked for.
+SUBMIT_STATE_JS = """(cnrPattern) => {
+    const text = document.body ? document.body.innerText : '';
+    if (/Invalid Captcha/i.test(text)) return 'invalid';
+    const visible = (sel) => { const el = document.querySelector(sel); return !!(el && el.offsetParent !== null); };
+    if (new RegExp(cnrPattern).test(text)
+        || document.querySelector('#dispTable a, .order_table, #dispTable tbody tr')
+        || visible('#showList') || visible('#showList2')) return 'result';
+    return false;
+}"""
+HISTORY_STATE_JS = """() => {
+    if (document.querySelector('.order_table')) return 'orders';
+    if (document.querySelector('table.case_details_table')) return 'details';
+    return false;
+}"""
+# One round trip for everything the flow reads off the result/history view, instead of
+# page.content() plus a locator count per selector. Same fields as extract_case_snapshot().
+PROBE_JS = """(cnrPattern) => {
+    const cellText = (el) => (el.innerText || el.textContent || '').replace(/\\s+/g, ' ').trim();
+    const cnrRe = new RegExp(cnrPattern);
+    const details = {};
+    let cnr = '';
+    const detailsTable = document.querySelector('table.case_details_table');
+    if (detailsTable) {
+        for (const tr of detailsTable.querySelectorAll('tr')) {
+            const cells = Array.from(tr.querySelectorAll('td, th'), cellText);
+            for (let i = 0; i + 1 < cells.length; i += 2) {
+                const label = cells[i].replace(/[:\\s]+$/, '');
+                if (label && !(label in details)) details[label] = cells[i + 1];
+            }
+            if (!cnr && /\\bCNR\\s*Number\\b/i.test(cells.join(' '))) {
+                const strong = tr.querySelector('strong');
+                const m = (strong ? cellText(strong) : cells.join(' ')).match(cnrRe);
+                if (m) cnr = m[0];
+            }
+        }
+    }
+    if (!cnr) {
+        const m = document.documentElement.innerHTML.match(cnrRe);
+        if (m) cnr = m[0];
+    }
+    const orderTable = document.querySelector('table.order_table');
+    const orders = [];
+    if (orderTable) {
+        for (const tr of Array.from(orderTable.querySelectorAll('tr')).slice(1)) {
+            const tds = tr.querySelectorAll('td');
+            if (tds.length < 5) continue;
+            const a = tds[4].querySelector('a');
+            orders.push({date: cellText(tds[3]), link: a ? a.getAttribute('href') : null, cells: Array.from(tds, cellText)});
+        }
+    }
+    return {
+        cnr,
+        details,
+        orders,
+        has_order_table: !!orderTable,
+        disp_links: document.querySelectorAll('#dispTable a').length,
+        disp_rows: document.querySelectorAll('#dispTable tbody tr').length,
+        show_list: !!document.querySelector('#showList'),
+        show_list2: !!document.querySelector('#showList2'),
+    };
+}"""
+CASE_TYPES_FILE = Path(__file__).with_name("bench_case_types.json")
+HIGH_COURTS = {
+    "Allahabad High Court": "13",
+    "Bombay High Court": "1",
+    "Calcutta High Court": "16",
+    "Gauhati High Court": "6",
+    "High Court  for State of Telangana": "29",
+    "High Court of Andhra Pradesh": "2",
+    "High Court of Chhattisgarh": "17",
+    "High Court of Delhi": "26",
+    "High Court of Gujarat": "18",
+    "High Court of Himachal Pradesh": "5",
+    "High Court of Jammu and Kashmir": "12",
+    "High Court of Jharkhand": "7",
+    "High Court of Karnataka": "3",
+    "High Court of Kerala": "4",
+    "High Court of Madhya Pradesh": "23",
+    "High Court of Manipur": "25",
+    "High Court of Meghalaya": "21",
+    "High Court of Orissa": "11",
+    "High Court of Punjab and Haryana": "22",
+    "High Court of Rajasthan": "9",
+    "High Court of Sikkim": "24",
+    "High Court of Tripura": "20",
+    "High Court of Uttarakhand": "15",
+    "Madras High Court": "10",
+    "Patna High Court": "8",
+}
+BENCHES_BY_HIGH_COURT = {
+    "1": {
+        "Appellate Side,Bombay": "1",
+        "Bench at Aurangabad": "3",
+        "Bench at Nagpur": "4",
+        "Bombay High Court,Bench at Kolhapur": "7",
+        "High court of Bombay at Goa": "5",
+        "Original Side,Bombay": "2",
+        "Special Court (TORTS) Bombay": "6",
+    }
+}
+
+
+def load_case_types_by_bench(path: Path):
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            return data
+    except Exception:
+        return {}
+    return {}
+
+
+CASE_TYPES_BY_BENCH = load_case_types_by_bench(CASE_TYPES_FILE)
+
+
+def solve_captcha(page, debug, attempt, log):
+    try:
+        page.wait_for_selector("#captcha_image", state="visible", timeout=STEP_TIMEOUTS["captcha_image"])
+        wait_for_js(
+            page,
+            "() => { const el = document.querySelector('#captcha_image'); return !!(el && el.complete && el.naturalWidth > 0); }",
+            None,
+            STEP_TIMEOUTS["captcha_image"],
+        )
+        locator = page.locator("#captcha_image")
+        src = (locator.get_attribute("src") or "").strip()
+        captcha_bytes = None
+
+        # Prefer the original image URL. Element screenshots in headless mode may be blurrier.
+        if src:
+            try:
+                if src.startswith("data:image"):
+                    _, b64 = src.split(",", 1)
+                    captcha_bytes = base64.b64decode(b64)
+                else:
+                    img_url = urljoin(page.url, src)
+                    with get_rate_limiter().slot(img_url):
+                        res = page.request.get(img_url, timeout=15000)
+                    if res.status == 200:
+                        captcha_bytes = res.body()
+                    else:
+                        log(f"[debug] captcha URL status={res.status}")
+            except Exception as err:
+                log(f"[debug] captcha URL fetch failed: {str(err).splitlines()[0]}")
+
+        if not captcha_bytes:
+            captcha_bytes = locator.screenshot(type="png")
+
+        debug.bytes(attempt, "captcha_raw", "png", captcha_bytes)
+
+        processed, (raw_w, raw_h) = preprocess_captcha(captcha_bytes)
+        if debug.enabled:
+            debug.bytes(attempt, "captcha_processed", "png", encode_png(processed))
+
+        dims = page.evaluate(
+            """() => {
+                const el = document.querySelector('#captcha_image');
+                if (!el) return null;
+                return {
+                    clientWidth: el.clientWidth,
+                    clientHeight: el.clientHeight,
+                    naturalWidth: el.naturalWidth || null,
+                    naturalHeight: el.naturalHeight || null
+                };
+            }"""
+        )
+
+        ocr = get_ocr_engine()
+        raw_code = ocr.classify(processed)
+        code = re.sub(r"[^A-Za-z0-9]", "", raw_code).strip()
+
+        src_hint = "data-uri" if src.startswith("data:image") else (src[:120] or "n/a")
+        log(
+            f"[debug] captcha src={src_hint} raw={raw_w}x{raw_h} js={dims} ocr_raw='{raw_code}' ocr='{code}' "
+            f"len={len(code)} prep={CAPTCHA_PREPROCESS} ocr_ms={ocr.last_inference_seconds * 1000:.1f}"
+        )
+        return code if len(code) == 6 else ""
+    except Exception as err:
+        log(f"[error] captcha exception: {str(err).splitlines()[0]}")
+        return ""
+
+
+def _html_parser():
+    # lxml is several times faster than the stdlib parser; fall back if it is missing.
+    try:
+        import lxml  # noqa: F401
+
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+HTML_PARSER = _html_parser()
+# Only tables are read, so the parser skips building the rest of the page tree. The
+# case_details_table / order_table classes are matched after parsing: a strainer with a
+# class list drops tables that carry extra classes (e.g. "order_table table-bordered").
+SNAPSHOT_TABLES = SoupStrainer("table")
+
+
+def extract_case_snapshot(html_content):
+    """Parse a page snapshot once and return everything the fetch flow reads from it.
+
+    Returns {"cnr", "details", "orders", "has_order_table"}: details maps the case
+    details labels to their values, orders is [{"date", "link", "cells"}] newest first.
+    """
+    text = html_content or ""
+    snapshot = {"cnr": "", "details": {}, "orders": [], "has_order_table": False}
+    try:
+        soup = BeautifulSoup(text, HTML_PARSER, parse_only=SNAPSHOT_TABLES)
+    except Exception:
+        soup = None
+
+    if soup is not None:
+        details_table = soup.find("table", class_="case_details_table")
+        if details_table:
+            for tr in details_table.find_all("tr"):
+                cells = [td.get_text(" ", strip=True) for td in tr.find_all(["td", "th"])]
+                for label, value in zip(cells[::2], cells[1::2]):
+                    if label:
+                        snapshot["details"].setdefault(label.rstrip(": "), value)
+                if not snapshot["cnr"] and re.search(r"\bCNR\s*Number\b", " ".join(cells), flags=re.IGNORECASE):
+                    strong = tr.find("strong")
+                    candidate = strong.get_text(" ", strip=True) if strong else " ".join(cells)
+                    cnr_match = re.search(CNR_PATTERN, candidate)
+                    if cnr_match:
+                        snapshot["cnr"] = cnr_match.group(0)
+
+        order_table = soup.find("table", class_="order_table")
+        if order_table:
+            snapshot["has_order_table"] = True
+            rows = []
+            for row in order_table.find_all("tr")[1:]:
+                cols = row.find_all("td")
+                if len(cols) < 5:
+                    continue
+                link_tag = cols[4].find("a")
+                rows.append(
+                    {
+                        "date": cols[3].get_text(strip=True),
+                        "link": link_tag.get("href") if link_tag else None,
+                        "cells": [td.get_text(" ", strip=True) for td in cols],
+                    }
+                )
+            snapshot["orders"] = sort_orders(rows)
+
+    if not snapshot["cnr"]:
+        # Fallback: common CNR format anywhere in HTML.
+        match = re.search(CNR_PATTERN, text)
+        if match:
+            snapshot["cnr"] = match.group(0)
+    return snapshot
+
+
+def sort_orders(rows):
+    # Keep rows with a dd-mm-yyyy date and a link, newest first.
+    orders = []
+    for row in rows:
+        if not (row.get("date") and row.get("link")):
+            continue
+        try:
+            dt_obj = datetime.strptime(row["date"], "%d-%m-%Y")
+        except ValueError:
+            continue
+        orders.append((dt_obj, dict(row, date=dt_obj.strftime("%d-%m-%Y"))))
+    orders.sort(key=lambda item: item[0], reverse=True)
+    return [order for _, order in orders]
+
+
+def probe_page(page):
+    """Read the result/history view in one page.evaluate; same keys as extract_case_snapshot()."""
+    snapshot = page.evaluate(PROBE_JS, CNR_PATTERN)
+    snapshot["orders"] = sort_orders(snapshot["orders"])
+    return snapshot
+
+
+def latest_order(snapshot):
+    if not snapshot["orders"]:
+        return None, None
+    return snapshot["orders"][0]["date"], snapshot["orders"][0]["link"]
+
+
+def get_latest_order_link(html_content):
+    return latest_order(extract_case_snapshot(html_content))
+
+
+def extract_cnr_number(html_content):
+    return extract_case_snapshot(html_content)["cnr"]
+
+
+def build_case_ref(case_type: str, no: str, year: str, search_mode: str):
+    if (search_mode or "").upper() == "ST":
+        return f"FILING/{no}/{year}"
+    raw = str(case_type or "").strip()
+    code = raw
+    if "(" in raw:
+        code = raw.split("(", 1)[0].strip()
+    elif "-" in raw:
+        code = raw.split("-", 1)[0].strip()
+    code = code or "CASE"
+    return f"{code}/{no}/{year}"
+
+
+def wait_for_js(page, expression, arg=None, timeout=10000, polling="raf"):
+    """Wait until expression(arg) is truthy (every animation frame, or every `polling` ms); None on timeout."""
+    try:
+        return page.wait_for_function(expression, arg=arg, timeout=timeout, polling=polling).json_value()
+    except PlaywrightTimeoutError:
+        return None
+
+
+def select_and_wait(page, selector, value, dependent_selector, dependent_value, timeout):
+    # Changing the select fires the site's AJAX that fills the dependent select; continue the
+    # moment the option we need next is attached instead of sleeping a fixed second.
+    page.select_option(selector, value=value)
+    if dependent_selector:
+        wait_for_js(
+            page,
+            "([sel, val]) => !!document.querySelector(`${sel} option[value=\"${val}\"]`)",
+            [dependent_selector, dependent_value],
+            timeout,
+        )
+
+
+def case_slug(case):
+    return f"{case['name']}_{case['no']}_{case['year']}"
+
+
+def fetch_case(page, case, debug_mode, debug_dir, log, attempts=None, debug=None):
+    """Run the hcservices flow for one case. Returns (result or None, outcome).
+
+    attempts are the attempt numbers to run here (default: all MAX_RETRIES back to back);
+    the RetryScheduler passes one at a time, together with the case's CaseDebug so frames
+    buffered by earlier attempts can still be flushed. A case that is not settled carries
+    the failure class of its last attempt in outcome["failure"].
+    """
+    attempts = list(attempts or range(1, MAX_RETRIES + 1))
+    case_label = f"{case['name']} {case['no']}/{case['year']}"
+    row_no = case.get("source_row")
+    search_mode = case.get("search_mode", "CN")
+    if debug is None:
+        debug = CaseDebug(debug_mode, debug_dir, case_slug(case), log, run_id=case.get("run_id"))
+    if attempts[0] == 1:
+        log(f"[case] {case_label}")
+    result = None
+    success = False
+    fetched = False
+    outcome_reason = "Unknown"
+    latest_cnr = ""
+    failure = None
+
+    for attempt in attempts:
+        try:
+            log(f"[attempt {attempt}/{MAX_RETRIES}] open page")
+            try:
+                with get_rate_limiter().slot(URL) as waited:
+                    if waited >= 1:
+                        log(f"[rate] waited {waited:.1f}s for a request slot")
+                    page.goto(URL, timeout=STEP_TIMEOUTS["goto"], wait_until="domcontentloaded")
+            except Exception:
+                log("[warn] page load timeout (continue)")
+
+            page.wait_for_selector("#leftPaneMenuCS", state="attached", timeout=STEP_TIMEOUTS["form_ready"])
+            try:
+                page.evaluate("document.querySelectorAll('.modal, .alert, #bs_alert').forEach(e => e.remove())")
+                log("[info] popups removed")
+            except Exception:
+                pass
+
+            try:
+                page.locator("#leftPaneMenuCS").click(force=True)
+            except Exception:
+                page.evaluate("document.querySelector('#leftPaneMenuCS').click()")
+
+            page.wait_for_selector("#sess_state_code", state="attached", timeout=STEP_TIMEOUTS["form_ready"])
+            select_and_wait(
+                page,
+                "#sess_state_code",
+                case["sess_state_code"],
+                "#court_complex_code",
+                case["court_complex_code"],
+                STEP_TIMEOUTS["bench_options"],
+            )
+            select_and_wait(
+                page,
+                "#court_complex_code",
+                case["court_complex_code"],
+                "#case_type" if search_mode != "ST" else None,
+                case.get("value"),
+                STEP_TIMEOUTS["case_types"],
+            )
+
+            if search_mode == "ST":
+                try:
+                    if page.locator("#CSfilingNumber").is_visible():
+                        page.locator("#CSfilingNumber").click(force=True)
+                except Exception:
+                    page.evaluate("document.querySelector('#CSfilingNumber').click()")
+                page.wait_for_selector("#CSFilingNumberDiv", state="visible", timeout=10000)
+                page.locator("#filing_no").fill(case["no"])
+                page.locator("#filyear").fill(case["year"])
+            else:
+                try:
+                    if page.locator("#CScaseNumber").is_visible():
+                        page.locator("#CScaseNumber").click(force=True)
+                except Exception:
+                    page.evaluate("document.querySelector('#CScaseNumber').click()")
+                page.select_option("#case_type", value=case["value"])
+                page.locator("#search_case_no").fill(case["no"])
+                page.locator("#rgyear").fill(case["year"])
+
+            debug.screenshot(attempt, "page_before_captcha", page)
+            code = solve_captcha(page, debug, attempt, log)
+            if not code:
+                log("[warn] captcha unreadable. retrying")
+                debug.html(attempt, "dom_snapshot", page)
+                debug.flush("captcha unreadable")
+                # The next attempt navigates afresh; a reload here would only load the page twice.
+                failure = "captcha_unreadable"
+                continue
+
+            page.locator("#captcha").fill(code)
+            page.locator("#goResetDiv input[value='Go']").click(force=True)
+
+            submit_state = wait_for_js(
+                page, SUBMIT_STATE_JS, CNR_PATTERN, STEP_TIMEOUTS["submit_result"], polling=SUBMIT_POLL_MS
+            )
+            if submit_state == "invalid":
+                log("[warn] invalid captcha. retrying")
+                debug.screenshot(attempt, "invalid_captcha_page", page)
+                debug.flush("invalid captcha")
+                failure = "captcha_invalid"
+                continue
+
+            # Filing search sometimes takes a few seconds before records are rendered;
+            # SUBMIT_STATE_JS above already waited for that, so probe the page once.
+            probe = probe_page(page)
+            cnr_no = probe["cnr"]
+            if cnr_no:
+                latest_cnr = cnr_no
+                log(f"[info] CNR: {cnr_no}")
+            elif search_mode == "ST":
+                log("[info] CNR not found on result page")
+            log(
+                f"[debug] post-submit showList={probe['show_list']} showList2={probe['show_list2']} "
+                f"disp_rows={probe['disp_rows']} disp_links={probe['disp_links']}"
+            )
+
+            history_missing = False
+            try:
+                history_opened = False
+                order_visible = False
+                history_state = None
+                if probe["disp_links"] > 0:
+                    page.locator("#dispTable a").first.click(force=True)
+                    history_opened = True
+                elif probe["has_order_table"]:
+                    order_visible = True
+                    history_opened = True
+                else:
+                    raise Exception("history_link_not_found")
+
+                if not order_visible:
+                    # History loads over AJAX: stop the moment the order table renders. If only
+                    # the case details arrive, give the orders a short grace period, not the full wait.
+                    history_state = wait_for_js(page, HISTORY_STATE_JS, None, STEP_TIMEOUTS["history"])
+                    if history_state == "details":
+                        wait_for_js(
+                            page, "() => !!document.querySelector('.order_table')", None, STEP_TIMEOUTS["history_orders_grace"]
+                        )
+
+                # One probe of the settled history view serves the CNR and the order list.
+                snapshot = probe_page(page) if history_opened and not order_visible else probe
+                order_visible = snapshot["has_order_table"]
+                if not cnr_no and snapshot["cnr"]:
+                    cnr_no = snapshot["cnr"]
+                    latest_cnr = cnr_no
+                    log(f"[info] CNR: {cnr_no}")
+
+                # Nothing of the history view rendered: the AJAX failed or stalled, which says
+                # nothing about the case, so retry instead of settling on "order table not found".
+                history_missing = history_opened and not order_visible and history_state is None and not snapshot["details"]
+                if not order_visible and history_opened and not history_missing:
+                    debug.html(attempt, "after_view_no_order_table", page)
+                    log("[info] history opened but order table not found")
+                    outcome_reason = "History opened; order table not found"
+                    success = True
+                    break
+            except Exception:
+                debug.html(attempt, "after_submit_no_history", page)
+                log("[info] no history/orders found")
+                outcome_reason = "No history/orders found"
+                success = True
+                break
+            if history_missing:
+                log("[warn] history did not load. retrying")
+                debug.html(attempt, "history_not_loaded", page)
+                debug.flush("history did not load")
+                failure = "missing_history"
+                continue
+
+            date_str, rel_link = latest_order(snapshot)
+            if date_str:
+                full_url = f"https://hcservices.ecourts.gov.in/hcservices/{rel_link}"
+                log(f"[info] latest order date: {date_str}")
+                if reuse_cached_order(case, rel_link):
+                    result = build_order_result(case, date_str, case["cached"]["pdf_ref"], cnr_no or latest_cnr, rel_link)
+                    log("[cache] latest order unchanged; reusing cached pdf")
+                    fetched = True
+                    outcome_reason = "PDF unchanged (cached)"
+                    success = True
+                    break
+                with get_rate_limiter().slot(full_url):
+                    response = page.request.get(full_url)
+                content_type = response.headers.get("content-type", "")
+                if response.status == 200 and "application/pdf" in content_type:
+                    pdf_ref = get_pdf_store().put(response.body())
+                    result = build_order_result(case, date_str, pdf_ref, cnr_no or latest_cnr, rel_link)
+                    log("[ok] pdf downloaded")
+                    fetched = True
+                    outcome_reason = "PDF downloaded"
+                    success = True
+                    break
+                log("[warn] order listed but file missing/broken")
+                outcome_reason = "Order listed but PDF missing/broken"
+                success = True
+                break
+
+            log("[info] no recent orders found")
+            outcome_reason = "No recent orders found"
+            success = True
+            break
+        except Exception as err:
+            msg = str(err).split("\n")[0]
+            failure = classify_failure(err)
+            log(f"[warn] retry {attempt} exception ({failure}): {msg}")
+            debug.screenshot(attempt, "exception_page", page)
+            debug.flush("exception")
+            if attempt != attempts[-1]:
+                time.sleep(RETRY_POLICY[failure]["backoff"])
+
+    if not success:
+        outcome_reason = "Failed after retries"
+        if attempts[-1] >= MAX_RETRIES:
+            log("[error] failed after retries")
+            debug.flush("failed after retries")
+    outcome = {
+        "source_row": row_no,
+        "case_label": case_label,
+        "fetched": fetched,
+        "reason": outcome_reason,
+        "cnr": latest_cnr,
+    }
+    if not success:
+        outcome["failure"] = failure
+    return result, outcome
+
+
+def build_order_result(case, date_str, pdf_ref, cnr, order_link=None):
+    # Results carry a pdf_store ref, not the PDF bytes; read them back with get_pdf_store().
+    return {
+        "label": f"{case['no']}/{case['year']}",
+        "desc": f"{case['name']} (Order: {date_str})",
+        "order_date": date_str,
+        "order_link": order_link,
+        "pdf_ref": pdf_ref,
+        "source_row": case.get("source_row"),
+        "cnr": cnr,
+        "case_ref": build_case_ref(
+            case.get("case_type", ""),
+            case.get("no", ""),
+            case.get("year", ""),
+            case.get("search_mode", "CN"),
+        ),
+    }
+
+
+def reuse_cached_order(case, rel_link):
+    # Revalidating a stale cache entry: the listing was re-read, but the PDF behind an
+    # unchanged link is the one already stored.
+    cached = case.get("cached")
+    return bool(
+        cached
+        and rel_link
+        and cached.get("order_link") == rel_link
+        and get_pdf_store().exists(cached.get("pdf_ref"))
+    )
+
+
+def cached_case_events(case, entry):
+    """Result, outcome and log lines for a fresh cache hit, shaped like a fetched case.
+
+    Entries whose PDF is no longer in the store are not hits; iter_fetch_events fetches them.
+    """
+    result = None
+    if entry["fetched"]:
+        result = build_order_result(case, entry["order_date"], entry["pdf_ref"], entry["cnr"], entry["order_link"])
+    outcome = failed_case_outcome(case, entry["reason"])
+    outcome.update({"fetched": result is not None, "cnr": entry["cnr"], "cache": "hit"})
+    logs = [
+        f"[case] {outcome['case_label']}",
+        f"[cache] hit age={int(entry['age'] // 60)}m: {entry['reason']}" + (f" ({entry['order_date']})" if result else ""),
+    ]
+    return result, outcome, logs
+
+
+def failed_case_outcome(case, reason="Failed after retries"):
+    return {
+        "source_row": case.get("source_row"),
+        "case_label": f"{case['name']} {case['no']}/{case['year']}",
+        "fetched": False,
+        "reason": reason,
+        "cnr": "",
+    }
+
+
+def run_scheduled_cases(worker_id, scheduler, events, fetch, debugs):
+    """Worker loop shared by both engines: one fetch(case, log, attempts, debug) per scheduled attempt.
+
+    Failed attempts go back to the scheduler, which requeues the case behind the others;
+    only settled cases are reported as "done". debugs (a CaseDebugs shared by all workers
+    of the run) hands every attempt of a case the same CaseDebug.
+    """
+    while True:
+        item = scheduler.next()
+        if item is None:
+            break
+        case_index, case, attempt = item
+
+        def log(msg, case_index=case_index):
+            events.put(("log", case_index, msg))
+
+        debug = debugs.get(case_index, case_slug(case), log, run_id=case.get("run_id"))
+        try:
+            result, outcome = fetch(case, log, [attempt], debug)
+        except Exception as err:
+            msg = str(err).splitlines()[0] if str(err) else type(err).__name__
+            log(f"[error] worker {worker_id} crashed: {msg}")
+            result = None
+            outcome = failed_case_outcome(case)
+            outcome["failure"] = classify_failure(err)
+        verdict = scheduler.report(case_index, case, outcome.get("failure"))
+        if isinstance(verdict, tuple):
+            delay = verdict[1]
+            log(f"[retry] {outcome['failure']}: case requeued" + (f", next attempt in {delay:.0f}s" if delay else ""))
+            continue
+        if verdict == "abort":
+            log("[error] site unavailable; giving up on this case")
+            outcome["reason"] = SITE_DOWN_REASON
+        debugs.discard(case_index)
+        events.put(("done", case_index, result, outcome))
+
+
+def fetch_worker(context, worker_id, scheduler, events, debug_mode, debug_dir, debugs):
+    # Runs on a BrowserService slot: one leased context per worker keeps captcha and
+    # session cookies isolated from the other workers.
+    page = context.new_page()
+    page.set_default_timeout(60000)
+    run_scheduled_cases(
+        worker_id,
+        scheduler,
+        events,
+        lambda case, log, attempts, debug: fetch_case(page, case, debug_mode, debug_dir, log, attempts, debug),
+        debugs,
+    )
+
+
+def iter_fetch_events(
+    cases,
+    workers=None,
+    headless=True,
+    debug_mode=False,
+    debug_dir=Path("debug_artifacts"),
+    default_sess_state_code="1",
+    default_court_complex_code="1",
+    service=None,
+    engine="browser",
+    base_url=None,
+    cache=None,
+    run_id=None,
+):
+    """Fetch cases on a worker pool and yield events in source-row order.
+
+    Yields ("log", message), ("case", index, result, outcome) and periodic ("tick", done)
+    while waiting, so callers can refresh progress displays. Pass a long-lived
+    BrowserService to reuse warm browsers; otherwise one is started for this run.
+    engine="http" talks to the hcservices endpoints directly (see hc_http.py) instead.
+    With a ResultCache, fresh hits are served without a fetch and stale entries are
+    revalidated; outcomes carry cache="hit"/"stale"/"miss". Debug artifacts are
+    named with run_id (generated when not given).
+    """
+    debug_mode = debug_tier(debug_mode)
+    if debug_mode != "off":
+        ensure_dir(debug_dir)
+    run_id = run_id or new_run_id()
+
+    total_cases = len(cases)
+    queued = {}
+    pending_logs = {}
+    finished = {}
+    cache_counts = {"hit": 0, "stale": 0, "miss": 0, "unchanged": 0}
+    for case_index, case in enumerate(cases):
+        case = dict(case)
+        case.setdefault("sess_state_code", default_sess_state_code)
+        case.setdefault("court_complex_code", default_court_complex_code)
+        case["run_id"] = run_id
+        entry = cache.get(case) if cache is not None else None
+        if entry is not None and entry["fetched"] and not get_pdf_store().exists(entry["pdf_ref"]):
+            # The PDF was pruned from the store since: fetch the case again.
+            entry = None
+        if entry is not None and entry["fresh"]:
+            result, outcome, logs = cached_case_events(case, entry)
+            finished[case_index] = (result, outcome)
+            pending_logs[case_index] = logs
+            cache_counts["hit"] += 1
+            continue
+        if cache is not None:
+            case["cache"] = "stale" if entry is not None else "miss"
+            cache_counts[case["cache"]] += 1
+        if entry is not None:
+            case["cached"] = entry
+        queued[case_index] = case
+
+    worker_count = max(min(int(workers or FETCH_WORKERS), len(queued)), 1)
+    yield ("log", f"[start] cloud robot run={run_id} engine={engine} workers={worker_count}")
+    if cache is not None:
+        yield ("log", f"[cache] hits={cache_counts['hit']} stale={cache_counts['stale']} misses={cache_counts['miss']}")
+
+    executor = None
+    own_service = False
+    if not queued:
+        engine = "cache"
+    elif engine == "http":
+        # hc_http builds on this module's helpers, so it is imported on first use.
+        from hc_http import http_fetch_worker
+
+        executor = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="hc-http")
+    elif engine == "browser":
+        own_service = service is None
+        if own_service:
+            service = BrowserService(size=worker_count, headless=headless)
+        else:
+            service.ensure_capacity(worker_count)
+    else:
+        raise ValueError(f"unknown fetch engine '{engine}'")
+    policy_before = get_resource_policy().stats() if engine == "browser" and get_resource_policy().enabled else None
+    rate_before = get_rate_limiter().gauges()
+    if queued:
+        # Browsers start in their own threads; load the shared OCR model meanwhile.
+        ocr = warm_up_ocr()
+        yield ("log", f"[ocr] ready {ocr.summary()}")
+
+    events = queue.Queue()
+    # Failed attempts are requeued behind the other cases (see retry_scheduler.py).
+    scheduler = RetryScheduler(queued.items(), MAX_RETRIES, notify=lambda msg: events.put(("notice", msg)))
+    debugs = CaseDebugs(debug_mode, debug_dir)
+    try:
+        if not queued:
+            jobs = {}
+        elif executor is not None:
+            jobs = {
+                executor.submit(
+                    http_fetch_worker, worker_id, scheduler, events, debug_mode, debug_dir, debugs, base_url
+                ): worker_id
+                for worker_id in range(1, worker_count + 1)
+            }
+        else:
+            jobs = {
+                service.submit(fetch_worker, worker_id, scheduler, events, debug_mode, debug_dir, debugs): worker_id
+                for worker_id in range(1, worker_count + 1)
+            }
+
+        # Workers finish out of order; buffer per case and release in source-row order so
+        # results, outcomes and logs read exactly like a sequential run. Cache hits are
+        # already in `finished`.
+        next_index = 0
+        while True:
+            for msg in pending_logs.pop(next_index, []):
+                yield ("log", msg)
+            if next_index in finished:
+                result, outcome = finished.pop(next_index)
+                yield ("case", next_index, result, outcome)
+                next_index += 1
+                continue
+            if next_index >= total_cases:
+                break
+            try:
+                event = events.get(timeout=0.5)
+            except queue.Empty:
+                yield ("tick", next_index)
+                for job in [j for j in jobs if j.done()]:
+                    worker_id = jobs.pop(job)
+                    if job.exception() is not None:
+                        err = job.exception()
+                        yield ("log", f"[error] worker {worker_id} failed: {str(err).splitlines()[0] if str(err) else type(err).__name__}")
+                if not jobs and events.empty():
+                    break
+                continue
+
+            kind = event[0]
+            if kind == "notice":
+                yield ("log", event[1])
+            elif kind == "log":
+                _, case_index, msg = event
+                if case_index == next_index:
+                    yield ("log", msg)
+                else:
+                    pending_logs.setdefault(case_index, []).append(msg)
+            elif kind == "done":
+                _, case_index, result, outcome = event
+                case = queued[case_index]
+                if cache is not None:
+                    outcome["cache"] = case["cache"]
+                    cache_counts["unchanged"] += int(outcome["reason"] == "PDF unchanged (cached)")
+                    cache.put(case, outcome, result)
+                finished[case_index] = (result, outcome)
+            yield ("tick", next_index)
+
+        # Cases never picked up (every worker failed to launch) are reported, not dropped.
+        for case_index in range(next_index, total_cases):
+            for msg in pending_logs.pop(case_index, []):
+                yield ("log", msg)
+            if case_index in finished:
+                result, outcome = finished.pop(case_index)
+            else:
+                reason = SITE_DOWN_REASON if scheduler.aborted else "Failed after retries"
+                result, outcome = None, failed_case_outcome(cases[case_index], reason)
+            yield ("case", case_index, result, outcome)
+    finally:
+        # Stop workers after their current case if the consumer goes away (e.g. rerun).
+        scheduler.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if own_service:
+            service.close()
+    if queued:
+        yield ("log", f"[ocr] {get_ocr_engine().summary()}")
+        yield ("log", f"[retry] {scheduler.summary()}")
+    if policy_before is not None:
+        get_resource_policy().save_size_hints()
+        yield ("log", f"[policy] {get_resource_policy().summary(since=policy_before)}")
+    rate_summary = get_rate_limiter().summary(since=rate_before)
+    if rate_summary:
+        yield ("log", f"[rate] {rate_summary}")
+    if debug_mode != "off":
+        ds = get_debug_writer().stats()
+        yield ("log", f"[debug] writer written={ds['written']} pending={ds['pending']} dropped={ds['dropped']}")
+    if cache is not None:
+        yield (
+            "log",
+            f"[cache] hits={cache_counts['hit']} stale={cache_counts['stale']} (unchanged={cache_counts['unchanged']}) "
+            f"misses={cache_counts['miss']} {cache.summary()}",
+        )
+    yield ("log", "[done] finished")
+
+
+def resolve_case_record(record, source_row, default_sess_state_code="1"):
+    """Turn one JSONL/CSV record into a run_bot case dict. Raises ValueError when invalid.
+
+    Accepts either raw site codes (sess_state_code, court_complex_code, value) or the
+    labels used by the UI (high_court, bench, case_type).
+    """
+    rec = {str(k).strip(): ("" if v is None else str(v).strip()) for k, v in dict(record).items()}
+    mode = (rec.get("search_mode") or rec.get("mode") or "CN").upper()
+    if mode not in ("CN", "ST"):
+        raise ValueError(f"unknown search_mode '{mode}'")
+    no = rec.get("no", "")
+    year = rec.get("year", "")
+    if not no.isdigit():
+        raise ValueError("no must be numeric")
+    if not (year.isdigit() and len(year) == 4):
+        raise ValueError("year must be a 4-digit number")
+
+    sess_state_code = rec.get("sess_state_code") or HIGH_COURTS.get(rec.get("high_court", ""), "")
+    sess_state_code = sess_state_code or default_sess_state_code
+    bench = rec.get("bench", "")
+    court_complex_code = rec.get("court_complex_code") or BENCHES_BY_HIGH_COURT.get(sess_state_code, {}).get(bench, "")
+    if not court_complex_code:
+        raise ValueError(f"unknown bench '{bench}' (set court_complex_code)")
+
+    case_type = rec.get("case_type", "")
+    value = ""
+    if mode != "ST":
+        value = rec.get("value", "")
+        if not value:
+            label_to_value = {item.get("label"): item.get("value") for item in CASE_TYPES_BY_BENCH.get(bench, [])}
+            value = label_to_value.get(case_type) or ""
+        if not value:
+            raise ValueError(f"case_type '{case_type}' is not valid for bench '{bench}' (set value)")
+
+    return {
+        "source_row": int(rec["source_row"]) if rec.get("source_row", "").isdigit() else source_row,
+        "bench": bench,
+        "case_type": case_type,
+        "search_mode": mode,
+        "name": rec.get("name") or (case_type if mode != "ST" else "Filing Number") or value,
+        "value": value,
+        "no": no,
+        "year": year,
+        "sess_state_code": sess_state_code,
+        "court_complex_code": court_complex_code,
+    }
+
+
+def load_case_records(path):
+    """Read a case list from .csv or JSONL ('-' reads JSONL from stdin)."""
+    if path == "-":
+        handle = sys.stdin
+    else:
+        handle = open(path, encoding="utf-8-sig", newline="")
+    try:
+        if path != "-" and Path(path).suffix.lower() == ".csv":
+            return [row for row in csv.DictReader(handle)]
+        records = []
+        for line in handle:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                records.append(json.loads(line))
+        return records
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch latest High Court orders without the Streamlit UI.")
+    parser.add_argument("cases", help="case list (.jsonl or .csv, '-' for JSONL on stdin)")
+    parser.add_argument("-o", "--out", default="-", help="JSONL results file (default: stdout)")
+    parser.add_argument("--pdf-dir", default="orders", help="directory for downloaded PDFs")
+    parser.add_argument("-w", "--workers", type=int, default=FETCH_WORKERS)
+    parser.add_argument("--engine", choices=("browser", "http"), default="browser", help="browser (Playwright) or direct HTTP")
+    parser.add_argument("--base-url", default=None, help="hcservices base URL for --engine http (e.g. a local stand-in)")
+    parser.add_argument("--high-court", default="1", help="default sess_state_code for records without one")
+    parser.add_argument("--headed", action="store_true", help="show the browser windows")
+    parser.add_argument(
+        "--debug",
+        nargs="?",
+        const="failures",
+        default="off",
+        choices=("off", "failures", "full"),
+        help="debug artifacts: failures (frames of failed cases only, the default with --debug) or full",
+    )
+    parser.add_argument("--debug-dir", default=os.getenv("DEBUG_DIR", "debug_artifacts"))
+    parser.add_argument("--cache", default=RESULT_CACHE_PATH, help="result cache database (SQLite)")
+    parser.add_argument("--cache-ttl", type=float, default=RESULT_CACHE_TTL, help="seconds a cached result is served as-is")
+    parser.add_argument("--no-cache", action="store_true", help="always fetch; do not read or write the result cache")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not echo logs to stderr")
+    args = parser.parse_args(argv)
+
+    cases = []
+    for idx, record in enumerate(load_case_records(args.cases), start=1):
+        try:
+            cases.append(resolve_case_record(record, idx, args.high_court))
+        except ValueError as err:
+            print(f"[error] record {idx}: {err}", file=sys.stderr)
+    if not cases:
+        print("[error] no valid cases", file=sys.stderr)
+        return 2
+
+    pdf_dir = Path(args.pdf_dir)
+    ensure_dir(pdf_dir)
+    out = sys.stdout if args.out == "-" else open(args.out, "a", encoding="utf-8")
+    cache = None if args.no_cache else ResultCache(args.cache, ttl=args.cache_ttl)
+    failed = 0
+    try:
+        for event in iter_fetch_events(
+            cases,
+            workers=args.workers,
+            headless=not args.headed,
+            debug_mode=args.debug,
+            debug_dir=Path(args.debug_dir),
+            default_sess_state_code=args.high_court,
+            engine=args.engine,
+            base_url=args.base_url,
+            cache=cache,
+        ):
+            if event[0] == "log":
+                if not args.quiet:
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] {event[1]}", file=sys.stderr, flush=True)
+            elif event[0] == "case":
+                _, case_index, result, outcome = event
+                case = cases[case_index]
+                line = dict(outcome)
+                line["case_ref"] = build_case_ref(case["case_type"], case["no"], case["year"], case["search_mode"])
+                line["order_date"] = None
+                line["pdf_path"] = None
+                if result is not None:
+                    safe_ref = re.sub(r"[^A-Za-z0-9_-]", "_", line["case_ref"])
+                    pdf_path = pdf_dir / f"{outcome['source_row']:04d}_{safe_ref}.pdf"
+                    shutil.copyfile(get_pdf_store().path(result["pdf_ref"]), pdf_path)
+                    line["cnr"] = result.get("cnr") or line["cnr"]
+                    line["order_date"] = result.get("order_date")
+                    line["pdf_path"] = pdf_path.as_posix()
+                if not outcome.get("fetched") and outcome.get("reason") in ("Failed after retries", SITE_DOWN_REASON):
+                    failed += 1
+                out.write(json.dumps(line, ensure_ascii=False) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if cache is not None:
+            cache.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
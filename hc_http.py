@@ -0,0 +1,327 @@
+import json
+import os
+import random
+import re
+import time
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from browser_service import USER_AGENT
+from captcha_ocr import CAPTCHA_PREPROCESS, encode_png, get_ocr_engine, preprocess_captcha
+from debug_artifacts import CaseDebug
+from fetch_engine import (
+    MAX_RETRIES,
+    build_order_result,
+    case_slug,
+    extract_case_snapshot,
+    latest_order,
+    reuse_cached_order,
+    run_scheduled_cases,
+)
+from pdf_store import get_pdf_store
+from rate_limiter import get_rate_limiter
+from retry_scheduler import RETRY_POLICY, classify_failure
+
+# Point at a local stand-in server with HC_BASE_URL=http://127.0.0.1:8000/hcservices/
+HC_BASE_URL = os.getenv("HC_BASE_URL", "https://hcservices.ecourts.gov.in/hcservices/")
+# Endpoints the main.php page calls for the case-status search (relative to HC_BASE_URL).
+ENDPOINTS = {
+    "main": "main.php",
+    "captcha": "securimage/securimage_show.php",
+    "search": "cases_qry/index_qry.php?action_code=showRecords",
+    "history": "cases_qry/o_civil_case_history.php",
+}
+HTTP_TIMEOUT = float(os.getenv("HC_HTTP_TIMEOUT", "30"))
+
+
+class HcHttpClient:
+    """hcservices case-status search over one pooled, keep-alive HTTP session.
+
+    Each client carries its own cookie jar, so the captcha it fetches belongs to its
+    session; use one client per worker.
+    """
+
+    def __init__(self, base_url=None, pool_size=4):
+        self.base_url = (base_url or HC_BASE_URL).rstrip("/") + "/"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        self._primed = False
+
+    def url(self, name_or_path):
+        return urljoin(self.base_url, ENDPOINTS.get(name_or_path, name_or_path))
+
+    def prime(self, force=False):
+        # Loads main.php once to get the session cookie the captcha is bound to; force (or a
+        # previous invalidate()) loads it again for a new session.
+        if self._primed and not force:
+            return
+        res = self._request("GET", self.url("main"))
+        res.raise_for_status()
+        self._primed = True
+
+    def invalidate(self):
+        # After a failure that may come from an expired PHP session: the next prime() renews it.
+        self._primed = False
+
+    def captcha(self):
+        res = self._request(
+            "GET",
+            self.url("captcha"),
+            params={str(random.random()): ""},
+            headers={"Referer": self.url("main")},
+        )
+        res.raise_for_status()
+        return res.content
+
+    def search(self, case, code):
+        data = {
+            "court_code": case["court_complex_code"],
+            "state_code": case["sess_state_code"],
+            "court_complex_code": case["court_complex_code"],
+            "captcha": code,
+        }
+        if case.get("search_mode", "CN") == "ST":
+            data.update({"caseStatusSearchType": "CSfilingNumber", "filing_no": case["no"], "filyear": case["year"]})
+        else:
+            data.update(
+                {
+                    "caseStatusSearchType": "CScaseNumber",
+                    "case_type": case["value"],
+                    "case_no": case["no"],
+                    "rgyear": case["year"],
+                    "caseNoType": "new",
+                    "displayOldCaseNo": "NO",
+                }
+            )
+        res = self._request("POST", self.url("search"), data=data, headers=self._xhr_headers())
+        res.raise_for_status()
+        return res.text
+
+    def history(self, case, record):
+        data = {
+            "court_code": case["court_complex_code"],
+            "state_code": case["sess_state_code"],
+            "court_complex_code": case["court_complex_code"],
+            "case_no": record.get("case_no", ""),
+            "cino": record.get("cino", ""),
+            "appFlag": "",
+        }
+        res = self._request("POST", self.url("history"), data=data, headers=self._xhr_headers())
+        res.raise_for_status()
+        return res.text
+
+    def download(self, rel_link):
+        res = self._request("GET", self.url(rel_link), headers={"Referer": self.url("main")})
+        return res.status_code, res.headers.get("content-type", ""), res.content
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, method, url, **kwargs):
+        # Every call goes through the shared per-host limiter (rate_limiter.py).
+        with get_rate_limiter().slot(url):
+            return self.session.request(method, url, timeout=HTTP_TIMEOUT, **kwargs)
+
+    def _xhr_headers(self):
+        return {"X-Requested-With": "XMLHttpRequest", "Referer": self.url("main")}
+
+
+def parse_search_records(text):
+    """Pull case records (dicts with cino/case_no) out of a showRecords response.
+
+    The endpoint answers with JSON whose values may themselves be JSON-encoded strings,
+    so decode recursively and keep every dict that identifies a case.
+    """
+    records = []
+
+    def walk(node):
+        if isinstance(node, str):
+            stripped = node.strip()
+            if stripped[:1] in ("[", "{"):
+                try:
+                    walk(json.loads(stripped))
+                except ValueError:
+                    pass
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+        elif isinstance(node, dict):
+            if node.get("cino") or node.get("case_no"):
+                records.append(node)
+            for value in node.values():
+                walk(value)
+
+    try:
+        walk(json.loads(text))
+    except ValueError:
+        pass
+    return records
+
+
+def format_cino(cino):
+    # "MHHC010012342020" -> "MHHC01-001234-2020", the form shown on the case details table.
+    cino = str(cino or "").strip().upper()
+    match = re.fullmatch(r"([A-Z]{2,10}\d{2})(\d{6})(\d{4})", cino)
+    return "-".join(match.groups()) if match else cino
+
+
+def solve_captcha_http(client, debug, attempt, log):
+    try:
+        captcha_bytes = client.captcha()
+        debug.bytes(attempt, "captcha_raw", "png", captcha_bytes)
+        processed, (raw_w, raw_h) = preprocess_captcha(captcha_bytes)
+        if debug.enabled:
+            debug.bytes(attempt, "captcha_processed", "png", encode_png(processed))
+        ocr = get_ocr_engine()
+        raw_code = ocr.classify(processed)
+        code = re.sub(r"[^A-Za-z0-9]", "", raw_code).strip()
+        log(
+            f"[debug] captcha src=http raw={raw_w}x{raw_h} ocr_raw='{raw_code}' ocr='{code}' "
+            f"len={len(code)} prep={CAPTCHA_PREPROCESS} ocr_ms={ocr.last_inference_seconds * 1000:.1f}"
+        )
+        return code if len(code) == 6 else ""
+    except Exception as err:
+        log(f"[error] captcha exception: {str(err).splitlines()[0]}")
+        return ""
+
+
+def fetch_case_http(client, case, debug_mode, debug_dir, log, attempts=None, debug=None):
+    """HTTP twin of fetch_engine.fetch_case: same log lines, result and outcome shapes."""
+    attempts = list(attempts or range(1, MAX_RETRIES + 1))
+    case_label = f"{case['name']} {case['no']}/{case['year']}"
+    search_mode = case.get("search_mode", "CN")
+    if debug is None:
+        debug = CaseDebug(debug_mode, debug_dir, case_slug(case), log, run_id=case.get("run_id"))
+    if attempts[0] == 1:
+        log(f"[case] {case_label}")
+    result = None
+    success = False
+    fetched = False
+    outcome_reason = "Unknown"
+    latest_cnr = ""
+    failure = None
+
+    for attempt in attempts:
+        try:
+            log(f"[attempt {attempt}/{MAX_RETRIES}] open session")
+            # A retry always starts on a fresh session: the last one may have expired.
+            client.prime(force=attempt > 1)
+            code = solve_captcha_http(client, debug, attempt, log)
+            if not code:
+                log("[warn] captcha unreadable. retrying")
+                debug.flush("captcha unreadable")
+                failure = "captcha_unreadable"
+                continue
+
+            search_text = client.search(case, code)
+            if re.search(r"Invalid Captcha", search_text, flags=re.IGNORECASE):
+                log("[warn] invalid captcha. retrying")
+                debug.bytes(attempt, "invalid_captcha_response", "txt", search_text.encode("utf-8"))
+                debug.flush("invalid captcha")
+                # An expired session also reads as an invalid captcha.
+                client.invalidate()
+                failure = "captcha_invalid"
+                continue
+
+            records = parse_search_records(search_text)
+            cino = next((r.get("cino") for r in records if r.get("cino")), "")
+            cnr_no = format_cino(cino) if cino else extract_case_snapshot(search_text)["cnr"]
+            if cnr_no:
+                latest_cnr = cnr_no
+                log(f"[info] CNR: {cnr_no}")
+            elif search_mode == "ST":
+                log("[info] CNR not found on result page")
+            log(f"[debug] post-submit records={len(records)}")
+
+            if not records:
+                debug.bytes(attempt, "after_submit_no_history", "txt", search_text.encode("utf-8"))
+                log("[info] no history/orders found")
+                outcome_reason = "No history/orders found"
+                success = True
+                break
+
+            history_html = client.history(case, records[0])
+            snapshot = extract_case_snapshot(history_html)
+            if not cnr_no and snapshot["cnr"]:
+                cnr_no = snapshot["cnr"]
+                latest_cnr = cnr_no
+                log(f"[info] CNR: {cnr_no}")
+
+            if not snapshot["has_order_table"]:
+                debug.html(attempt, "after_view_no_order_table", history_html)
+                log("[info] history opened but order table not found")
+                outcome_reason = "History opened; order table not found"
+                success = True
+                break
+
+            date_str, rel_link = latest_order(snapshot)
+            if date_str:
+                log(f"[info] latest order date: {date_str}")
+                if reuse_cached_order(case, rel_link):
+                    result = build_order_result(case, date_str, case["cached"]["pdf_ref"], latest_cnr, rel_link)
+                    log("[cache] latest order unchanged; reusing cached pdf")
+                    fetched = True
+                    outcome_reason = "PDF unchanged (cached)"
+                    success = True
+                    break
+                status, content_type, body = client.download(rel_link)
+                if status == 200 and "application/pdf" in content_type:
+                    result = build_order_result(case, date_str, get_pdf_store().put(body), latest_cnr, rel_link)
+                    log("[ok] pdf downloaded")
+                    fetched = True
+                    outcome_reason = "PDF downloaded"
+                    success = True
+                    break
+                log("[warn] order listed but file missing/broken")
+                outcome_reason = "Order listed but PDF missing/broken"
+                success = True
+                break
+
+            log("[info] no recent orders found")
+            outcome_reason = "No recent orders found"
+            success = True
+            break
+        except Exception as err:
+            msg = str(err).split("\n")[0]
+            failure = classify_failure(err)
+            log(f"[warn] retry {attempt} exception ({failure}): {msg}")
+            client.invalidate()
+            debug.flush("exception")
+            if attempt != attempts[-1]:
+                time.sleep(RETRY_POLICY[failure]["backoff"])
+
+    if not success:
+        outcome_reason = "Failed after retries"
+        if attempts[-1] >= MAX_RETRIES:
+            log("[error] failed after retries")
+            debug.flush("failed after retries")
+    outcome = {
+        "source_row": case.get("source_row"),
+        "case_label": case_label,
+        "fetched": fetched,
+        "reason": outcome_reason,
+        "cnr": latest_cnr,
+    }
+    if not success:
+        outcome["failure"] = failure
+    return result, outcome
+
+
+def http_fetch_worker(worker_id, scheduler, events, debug_mode, debug_dir, debugs, base_url=None):
+    # Same contract as fetch_engine.fetch_worker, minus the browser: one client per worker.
+    client = HcHttpClient(base_url=base_url)
+    try:
+        run_scheduled_cases(
+            worker_id,
+            scheduler,
+            events,
+            lambda case, log, attempts, debug: fetch_case_http(client, case, debug_mode, debug_dir, log, attempts, debug),
+            debugs,
+        )
+    finally:
+        client.close()
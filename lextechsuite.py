@@ -0,0 +1,872 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from browser_service import USER_AGENT, BrowserService, run_with_logs
+from debug_artifacts import CaseDebug
+from ls_session import get_ls_session_store, restore_storage_state
+
+# Point at a local stand-in server with LEXTECHSUITE_BASE_URL=http://127.0.0.1:8766/
+LEXTECHSUITE_BASE_URL = os.getenv("LEXTECHSUITE_BASE_URL", "https://lextechsuite.com/").rstrip("/") + "/"
+LEXTECHSUITE_LOGIN_URL = urljoin(LEXTECHSUITE_BASE_URL, "?opnLgn=yes")
+LEXTECHSUITE_CASES_URL = urljoin(LEXTECHSUITE_BASE_URL, "Member/Cases")
+# Bulk save: the first CNR goes through the +cnr modal while its Save Record request is
+# captured; the others replay that request with the context's cookies, LS_BULK_CONCURRENCY
+# at a time, instead of driving the modal once per CNR.
+LS_BULK_SAVE = os.getenv("LS_BULK_SAVE", "0").strip().lower() in ("1", "true", "on", "yes")
+LS_BULK_CONCURRENCY = max(int(os.getenv("LS_BULK_CONCURRENCY", "4") or 1), 1)
+LS_HTTP_TIMEOUT = float(os.getenv("LS_HTTP_TIMEOUT", "30"))
+# Sent by the requests session itself (or tied to the browser connection); never replayed.
+SAVE_SKIP_HEADERS = {"cookie", "content-length", "host", "connection", "accept-encoding"}
+SESSION_EXPIRED_REASON = "LexSuite session expired"
+# A replayed save whose response does not say "saved" or "already exists": the CNR is
+# entered again through the modal rather than reported as sent.
+SAVE_UNCONFIRMED_REASON = "Save not confirmed"
+# Before sending, the CNRs already registered for the member are read from the Case
+# Manager's case-list endpoint and skipped; the list is re-read after LS_KNOWN_REFRESH
+# seconds. Set LS_SKIP_KNOWN=0 to send every CNR and rely on the "already exists" message.
+LS_SKIP_KNOWN = os.getenv("LS_SKIP_KNOWN", "1").strip().lower() not in ("0", "false", "off", "")
+LS_KNOWN_REFRESH = float(os.getenv("LS_KNOWN_REFRESH", "300"))
+# The case-list endpoint (JSON). Empty: use the GET XHR the Case Manager makes that lists
+# CNRs. Pages are followed with LS_CASES_PAGE_PARAM until one brings no new CNR.
+LS_CASES_LIST_URL = os.getenv("LS_CASES_LIST_URL", "").strip()
+LS_CASES_PAGE_PARAM = os.getenv("LS_CASES_PAGE_PARAM", "page").strip()
+LS_CASES_MAX_PAGES = max(int(os.getenv("LS_CASES_MAX_PAGES", "200") or 1), 1)
+PAGE_PARAMS = ("page", "pageno", "pagenumber", "pageindex", "pagenum", "p")
+# CNR as shown on the site ("MHHC01-001234-2020") or normalized ("MHHC010012342020").
+CNR_PATTERN = re.compile(r"\b([A-Z]{4}\d{2})-?(\d{6})-?(\d{4})\b")
+
+
+def normalize_cnr_for_ls(cnr: str):
+    """Normalize CNR to the 16-char form LexTechSuite expects (strip hyphens/spaces)."""
+    raw = str(cnr or "").strip().upper()
+    return re.sub(r"[^A-Z0-9]", "", raw)
+
+
+def extract_cnrs(text):
+    """Normalized CNRs mentioned anywhere in a page or API response."""
+    return {"".join(m.groups()) for m in CNR_PATTERN.finditer(str(text or "").upper())}
+
+
+def listed_cnrs(text):
+    """CNRs of a case-list response: the values of its *cnr* fields (e.g. "CNRNo").
+
+    Other fields (titles, notes) may quote CNRs of other cases and are not read. A body
+    that is not JSON is an HTML listing: every CNR in it counts.
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return extract_cnrs(text)
+    found = set()
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            for key, value in item.items():
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+                elif isinstance(value, str) and "cnr" in key.lower():
+                    cnr16 = normalize_cnr_for_ls(value)
+                    if len(cnr16) == 16 and CNR_PATTERN.fullmatch(cnr16):
+                        found.add(cnr16)
+        elif isinstance(item, list):
+            stack.extend(item)
+    return found
+
+
+def with_page(url, param, page):
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != param]
+    return urlunsplit(parts._replace(query=urlencode(query + [(param, str(page))])))
+
+
+class KnownCnrs:
+    """CNRs already registered for one member, read from the Case Manager's case list.
+
+    The list comes from list_url (LS_CASES_LIST_URL, or the GET XHR the Case Manager made
+    that lists CNRs, see discover()), read page by page until a page brings no new CNR.
+    One instance per account lives for the whole process (get_known_cnrs()), so later sends
+    only re-read the list once it is older than max_age. CNRs saved or reported as existing
+    are added as they go.
+    """
+
+    def __init__(self, list_url=None, max_age=None):
+        self.list_url = list_url or LS_CASES_LIST_URL or None
+        self.page_param = LS_CASES_PAGE_PARAM
+        self.first_page = 1
+        self.max_age = LS_KNOWN_REFRESH if max_age is None else float(max_age)
+        self.cnrs = set()
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, cnr16):
+        return cnr16 in self.cnrs
+
+    def __len__(self):
+        return len(self.cnrs)
+
+    def add(self, cnr16):
+        with self._lock:
+            self.cnrs.add(cnr16)
+
+    def discover(self, responses):
+        """Take the case list from the Case Manager's XHRs (if not configured); True once known."""
+        if self.list_url:
+            return True
+        best = (0, None)
+        for response in responses:
+            try:
+                if response.request.method != "GET":
+                    continue
+                found = listed_cnrs(response.text()) if "json" in response.headers.get("content-type", "") else set()
+            except Exception:
+                continue
+            if len(found) > best[0]:
+                best = (len(found), response.url)
+        if best[1] is None:
+            return False
+        self.list_url = best[1]
+        query = parse_qsl(urlsplit(self.list_url).query)
+        for key, value in query:
+            if key.lower() in PAGE_PARAMS and value.isdigit():
+                self.page_param, self.first_page = key, int(value)
+                break
+        return True
+
+    @property
+    def stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age
+
+    def refresh(self, request):
+        """Read the case list with a plain APIRequestContext; returns how many CNRs were new.
+
+        The list only counts as loaded (and stays unread until max_age) once a page was read;
+        after a failed first request the next batch tries again.
+        """
+        if not self.list_url:
+            return 0
+        added = 0
+        seen = set()
+        read = False
+        for page in range(self.first_page, self.first_page + LS_CASES_MAX_PAGES):
+            try:
+                res = request.get(with_page(self.list_url, self.page_param, page), timeout=15000)
+                # A dead session is redirected to MembersOnlyPage with a 200.
+                if not res.ok or "MembersOnlyPage" in res.url:
+                    break
+                found = listed_cnrs(res.text())
+            except Exception:
+                break
+            read = True
+            # Stop at the first page that lists nothing new (also covers endpoints that
+            # ignore the page parameter and return the same list every time).
+            if not found - seen:
+                break
+            seen |= found
+            with self._lock:
+                added += len(found - self.cnrs)
+                self.cnrs |= found
+        if read:
+            self.loaded_at = time.monotonic()
+        return added
+
+
+_KNOWN = {}
+_KNOWN_LOCK = threading.Lock()
+
+
+def get_known_cnrs(email):
+    key = (email or "").strip().lower()
+    with _KNOWN_LOCK:
+        if key not in _KNOWN:
+            _KNOWN[key] = KnownCnrs()
+        return _KNOWN[key]
+
+
+def capture_save_request(request, cnr16):
+    """Replay template from a request sent by the +cnr modal's Save Record, or None if it is not that request."""
+    try:
+        body = request.post_data or ""
+    except Exception:
+        return None
+    if request.method != "POST" or (cnr16 not in body and cnr16 not in request.url):
+        return None
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in SAVE_SKIP_HEADERS and not k.startswith(":")}
+    return {"url": request.url, "body": body, "headers": headers, "cnr": cnr16}
+
+
+def classify_save_response(status, url, text):
+    """(ok, reason) for a replayed Save Record response, using the texts the modal shows.
+
+    Only the modal's own success messages count as sent; any other answer (an error page,
+    a login form served with 200, an empty body) is SAVE_UNCONFIRMED_REASON.
+    """
+    low = (text or "").lower()
+    if "MembersOnlyPage" in url or "opnLgn" in url:
+        return False, SESSION_EXPIRED_REASON
+    if status >= 400:
+        return False, f"{SAVE_UNCONFIRMED_REASON} (HTTP {status})"
+    if "already exists" in low:
+        return True, "Already in LexSuite"
+    if "record has been saved" in low:
+        return True, "Sent to LexSuite"
+    if "invalid" in low:
+        return False, re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", text)).strip()[:200]
+    return False, SAVE_UNCONFIRMED_REASON
+
+
+def needs_modal(outcome):
+    """Bulk outcomes the modal should redo: expired session or an unconfirmed save."""
+    return outcome["reason"] == SESSION_EXPIRED_REASON or outcome["reason"].startswith(SAVE_UNCONFIRMED_REASON)
+
+
+def bulk_save_cnrs(template, cnrs, cookies, log, concurrency=None):
+    """Replay a captured Save Record request for each CNR over one pooled requests session.
+
+    The captured body (including any anti-forgery token) is reused as is with only the CNR
+    swapped, so the session behind cookies must be the one the request was captured on.
+    Returns outcomes in the order of cnrs.
+    """
+    concurrency = concurrency or LS_BULK_CONCURRENCY
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    session.headers.update(template["headers"])
+    for c in cookies:
+        session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+
+    def save(cnr16):
+        url = template["url"].replace(template["cnr"], cnr16)
+        body = template["body"].replace(template["cnr"], cnr16)
+        try:
+            res = session.post(url, data=body.encode("utf-8"), timeout=LS_HTTP_TIMEOUT)
+            ok, reason = classify_save_response(res.status_code, res.url, res.text)
+        except requests.RequestException as err:
+            ok, reason = False, f"{SAVE_UNCONFIRMED_REASON} ({str(err).splitlines()[0]})"
+        return {"cnr": cnr16, "ok": ok, "reason": reason}
+
+    outcomes = []
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for idx, outcome in enumerate(pool.map(save, cnrs), start=1):
+                outcomes.append(outcome)
+                log(f"[ls] bulk {idx}/{len(cnrs)}: {outcome['cnr']} {'ok' if outcome['ok'] else 'FAIL'} ({outcome['reason']})")
+    finally:
+        session.close()
+    return outcomes
+
+
+def send_cnrs_to_lextechsuite(
+    cnrs,
+    email,
+    password,
+    headless=True,
+    on_log=None,
+    debug=False,
+    debug_dir=Path("debug_artifacts"),
+    service=None,
+    bulk=None,
+):
+    """Send one or more CNR numbers to LexTechSuite Case Manager (+cnr -> Save Record).
+
+    With bulk (default LS_BULK_SAVE) only the first CNR is entered in the modal; the rest
+    replay its Save Record request (see bulk_save_cnrs).
+    """
+    logs = []
+
+    email = (email or "").strip()
+    password = password or ""
+    if not email or not password:
+        raise ValueError("Missing LexTechSuite email/password")
+
+    cnrs_norm = []
+    for c in cnrs or []:
+        n = normalize_cnr_for_ls(c)
+        if n:
+            cnrs_norm.append(n)
+    seen = set()
+    cnrs_norm = [c for c in cnrs_norm if not (c in seen or seen.add(c))]
+    if not cnrs_norm:
+        raise ValueError("No CNRs to send")
+
+    def log(msg: str):
+        ts = datetime.now().strftime("%H:%M:%S")
+        logs.append(f"[{ts}] {msg}")
+        # Stream into the app Live terminal logs when available.
+        if on_log is not None:
+            on_log(msg)
+
+    own_service = service is None
+    if own_service:
+        service = BrowserService(size=1, headless=headless, warm_profiles=())
+    try:
+        outcomes = run_with_logs(
+            service,
+            _send_job,
+            [cnrs_norm],
+            email,
+            password,
+            debug,
+            debug_dir,
+            LS_BULK_SAVE if bulk is None else bool(bulk),
+            profile="ls",
+            log=log,
+        )
+    finally:
+        if own_service:
+            service.close()
+    return outcomes, logs
+
+
+class LsUploader:
+    """Registers CNRs in LexTechSuite while a fetch run is still producing them.
+
+    start() submits one "ls" job to the BrowserService, which logs in straight away and
+    then sends whatever put() has queued since its last batch. Log lines are buffered for
+    the caller's thread (pop_logs()). finish() ends the queue; close() also waits for the
+    job and returns (outcomes, logs) like send_cnrs_to_lextechsuite (also kept on
+    .outcomes / .logs, or the job's exception on .error).
+    """
+
+    def __init__(self, email, password, service, debug=False, debug_dir=Path("debug_artifacts"), bulk=None):
+        self.email = (email or "").strip()
+        self.password = password or ""
+        if not self.email or not self.password:
+            raise ValueError("Missing LexTechSuite email/password")
+        self.service = service
+        self.debug = debug
+        self.debug_dir = debug_dir
+        self.bulk = LS_BULK_SAVE if bulk is None else bool(bulk)
+        self.logs = []
+        self.outcomes = []
+        self.error = None
+        self._queue = queue.Queue()
+        self._lines = queue.Queue()
+        self._seen = set()
+        self._future = None
+        self._finished = False
+
+    def start(self, busy_slots=0):
+        # The job holds its slot until finish(); make sure the fetch workers still get theirs.
+        self.service.ensure_capacity(busy_slots + 1)
+        self._future = self.service.submit(
+            _send_job,
+            self._batches(),
+            self.email,
+            self.password,
+            self.debug,
+            self.debug_dir,
+            self.bulk,
+            profile="ls",
+            log=self._lines.put,
+        )
+        return self
+
+    def put(self, cnr):
+        cnr16 = normalize_cnr_for_ls(cnr)
+        if not cnr16 or cnr16 in self._seen or self._finished:
+            return False
+        self._seen.add(cnr16)
+        self._queue.put(cnr16)
+        return True
+
+    def pop_logs(self):
+        lines = []
+        while True:
+            try:
+                msg = self._lines.get_nowait()
+            except queue.Empty:
+                break
+            self.logs.append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+            lines.append(msg)
+        return lines
+
+    def finish(self):
+        if not self._finished:
+            self._finished = True
+            self._queue.put(None)
+
+    def close(self, on_log=None):
+        self.finish()
+        while True:
+            done = self._future.done()
+            for line in self.pop_logs():
+                if on_log is not None:
+                    on_log(line)
+            if done:
+                break
+            time.sleep(0.2)
+        try:
+            self.outcomes = self._future.result()
+        except Exception as err:
+            self.error = err
+            raise
+        return self.outcomes, self.logs
+
+    def _batches(self):
+        # Everything queued since the last batch goes together, so bulk replays stay wide.
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            done = None in batch
+            batch = [c for c in batch if c is not None]
+            if batch:
+                yield batch
+            if done:
+                return
+
+
+def _send_job(context, cnr_batches, email, password, debug, debug_dir, bulk, log):
+    # Runs on a BrowserService slot with a leased "ls" context. cnr_batches is an iterable
+    # of lists of normalized, unique CNRs; it may block until the next batch arrives.
+    log("[ls] start")
+    page = context.new_page()
+    page.set_default_timeout(60000)
+
+    # LS dumps go through CaseDebug like the fetch ones (DebugWriter + DebugIndex). Failure
+    # dumps are always taken; the step-by-step dump_state() ones only with debug on.
+    ls_debug = CaseDebug("full" if debug else "failures", debug_dir, "lextechsuite", log)
+
+    def dump_state(tag: str):
+        if not debug:
+            return
+        ls_debug.screenshot(0, f"ls_{tag}", page)
+        ls_debug.html(0, f"ls_{tag}", page)
+
+    def dump_failure(tag: str):
+        ls_debug.screenshot(0, f"ls_{tag}", page)
+        ls_debug.html(0, f"ls_{tag}", page)
+        ls_debug.flush(tag)
+
+    def ensure_login_modal_visible():
+        # The login modal should auto-open on ?opnLgn=yes, but keep a safe fallback.
+        if page.locator("#loginEmail").count() > 0 and page.locator("#loginEmail").is_visible():
+            return
+        try:
+            login_btn = page.locator("a:has-text('LOGIN')")
+            if login_btn.count() == 0:
+                login_btn = page.locator("text=LOGIN")
+            if login_btn.count() > 0:
+                login_btn.first.click(force=True)
+                time.sleep(0.8)
+        except Exception:
+            pass
+
+    store = get_ls_session_store()
+    login_state = {"fresh": False}
+
+    def session_valid():
+        # A plain request with the context's cookies: no rendering, no networkidle wait.
+        try:
+            res = context.request.get(LEXTECHSUITE_CASES_URL, timeout=15000)
+            return res.ok and "/Member/Cases" in res.url and "MembersOnlyPage" not in res.url
+        except Exception as err:
+            log(f"[ls] session check failed: {str(err).splitlines()[0]}")
+            return False
+
+    def perform_login(tag: str):
+        login_state["fresh"] = True
+        # Always login from the modal-based entry URL, so we don't get stuck on /Public/Login.
+        page.goto(LEXTECHSUITE_LOGIN_URL, wait_until="domcontentloaded", timeout=60000)
+        try:
+            page.wait_for_load_state("networkidle", timeout=30000)
+        except Exception:
+            pass
+
+        ensure_login_modal_visible()
+        page.wait_for_selector("#loginEmail", state="visible", timeout=45000)
+        page.locator("#loginEmail").fill(email)
+        page.locator("#loginPassword").fill(password)
+        dump_state(f"login_before_{tag}")
+        page.locator("#btnLogin").click()
+
+        # Wait for modal to close or at least stop being visible.
+        try:
+            page.wait_for_selector("#loginEmail", state="hidden", timeout=45000)
+        except Exception:
+            pass
+        try:
+            page.wait_for_load_state("networkidle", timeout=60000)
+        except Exception:
+            pass
+
+        # If the site shows an inline error, log it.
+        try:
+            alert = (page.locator("#alert1FormLogin").inner_text() or "").strip()
+            if alert:
+                log(f"[ls] login alert ({tag}): {alert}")
+        except Exception:
+            pass
+
+        # Debug: show cookie names (not values).
+        if debug:
+            try:
+                cookies = context.cookies(LEXTECHSUITE_BASE_URL)
+                names = sorted({c.get("name") for c in cookies if c.get("name")})
+                log(f"[ls] cookies after login ({tag}): {', '.join(names) if names else '(none)'}")
+            except Exception as err:
+                log(f"[ls] cookie read failed: {str(err).splitlines()[0]}")
+
+        dump_state(f"login_after_{tag}")
+
+
+    saved = store.load(email, password)
+    if saved is not None:
+        restore_storage_state(context, saved)
+        if session_valid():
+            log("[ls] reusing saved login session")
+        else:
+            log("[ls] saved login session expired; logging in")
+            store.delete(email)
+            context.clear_cookies()
+            saved = None
+    if saved is None:
+        log("[ls] open login")
+        perform_login("initial")
+        log("[ls] login submitted")
+
+    def save_session():
+        # After any login that reached the Case Manager: keep the session for the next send.
+        if not login_state["fresh"]:
+            return
+        login_state["fresh"] = False
+        try:
+            if store.save(email, password, context.storage_state()):
+                log("[ls] login session saved")
+            else:
+                log("[ls] login session not saved (cryptography not installed)")
+        except Exception as err:
+            log(f"[ls] login session save failed: {str(err).splitlines()[0]}")
+
+    def _goto_case_manager():
+        last_err = None
+        for nav_try in range(1, 4):
+            try:
+                page.goto(LEXTECHSUITE_CASES_URL, wait_until="domcontentloaded", timeout=60000)
+                try:
+                    page.wait_for_load_state("networkidle", timeout=30000)
+                except Exception:
+                    pass
+
+                if "MembersOnlyPage" in page.url:
+                    log("[ls] bounced to MembersOnlyPage (logged out). Re-login...")
+                    dump_state(f"members_only_{nav_try}")
+                    perform_login(f"relogin_{nav_try}")
+                    page.goto(LEXTECHSUITE_CASES_URL, wait_until="domcontentloaded", timeout=60000)
+                    try:
+                        page.wait_for_load_state("networkidle", timeout=30000)
+                    except Exception:
+                        pass
+
+                log(f"[ls] open Case Manager try {nav_try}/3 url={page.url}")
+
+                # Success condition: we really are on /Member/Cases (or at least have the FAB UI).
+                has_fab = page.locator("button.kc_fab_main_btn").count() > 0
+                has_sub = page.locator("button.sub_fab_btn").count() > 0
+                try:
+                    has_js = bool(page.evaluate("""() => typeof itmAddModCNR === 'function'"""))
+                except Exception:
+                    has_js = False
+
+                if ("/Member/Cases" in page.url) or has_fab or has_sub or has_js:
+                    log(f"[ls] Case Manager ready fab={int(has_fab)} sub={int(has_sub)} js_itmAddModCNR={has_js}")
+                    save_session()
+                    return
+
+                last_err = RuntimeError(f"Not on Case Manager (url={page.url})")
+            except Exception as nav_err:
+                last_err = nav_err
+                msg = str(nav_err).splitlines()[0]
+                log(f"[ls] Case Manager nav failed (try {nav_try}/3): {msg}")
+
+            dump_state(f"cases_nav_failed_{nav_try}")
+
+            time.sleep(2.0)
+
+        raise last_err if last_err is not None else RuntimeError("Case Manager navigation failed")
+    known = get_known_cnrs(email)
+    listing = []
+    ls_host = urlsplit(LEXTECHSUITE_BASE_URL).hostname or ""
+
+    def on_listing_response(response):
+        # Read after navigation: response bodies are not fetched from inside the event handler.
+        host = urlsplit(response.url).hostname or ""
+        if response.request.resource_type in ("xhr", "fetch") and (host == ls_host or host.endswith("." + ls_host)):
+            listing.append(response)
+
+    log("[ls] open Case Manager")
+    # Only watch the Case Manager's XHRs while the case-list endpoint is still unknown.
+    watch = LS_SKIP_KNOWN and not known.list_url
+    if watch:
+        page.on("response", on_listing_response)
+    try:
+        _goto_case_manager()
+    finally:
+        if watch:
+            page.remove_listener("response", on_listing_response)
+    if LS_SKIP_KNOWN:
+        if not known.discover(listing):
+            log("[ls] case list endpoint not found (set LS_CASES_LIST_URL); only CNRs sent in this session are skipped")
+        elif known.stale:
+            added = known.refresh(context.request)
+            if known.stale:
+                log(f"[ls] could not read the case list at {known.list_url}; trying again before the next batch")
+            else:
+                log(f"[ls] {len(known)} CNR(s) already in LexSuite (+{added} from {known.list_url})")
+        else:
+            log(f"[ls] {len(known)} CNR(s) already in LexSuite (cached list)")
+
+    def close_add_cnr_modal():
+        try:
+            if page.locator("#fcnr_number").count() > 0 and page.locator("#fcnr_number").is_visible():
+                try:
+                    page.locator("button.btn-close, button[data-bs-dismiss='modal']").first.click(force=True, timeout=3000)
+                except Exception:
+                    try:
+                        page.keyboard.press("Escape")
+                    except Exception:
+                        pass
+                try:
+                    page.wait_for_selector("#fcnr_number", state="hidden", timeout=15000)
+                except Exception:
+                    pass
+        except Exception:
+            pass
+
+    order = []
+
+    def add_cnr_via_modal(idx, cnr16):
+        log(f"[ls] add cnr {idx}/{len(order)}: {cnr16}")
+        close_add_cnr_modal()
+        # Open the "Add CNR" modal.
+        # The UI uses a floating action button (FAB). Expand it, then click the +cnr sub-button.
+        opened = False
+
+        log("[ls] open +cnr modal")
+
+        for attempt in range(1, 4):
+            fab_count = 0
+            sub_count = 0
+            try:
+                page.wait_for_selector("button.kc_fab_main_btn", state="attached", timeout=8000)
+            except Exception:
+                pass
+
+            try:
+                fab = page.locator("button.kc_fab_main_btn")
+                fab_count = fab.count()
+                if fab_count > 0:
+                    fab.first.click(force=True)
+                    time.sleep(0.35)
+            except Exception as err:
+                log(f"[ls] FAB click attempt {attempt}/3 failed: {str(err).splitlines()[0]}")
+
+            try:
+                sub = page.locator("button.sub_fab_btn[data-link-href*='itmAddModCNR']")
+                if sub.count() == 0:
+                    sub = page.locator("button.sub_fab_btn", has_text="+cnr")
+                sub_count = sub.count()
+                if sub_count > 0:
+                    sub.first.click(force=True)
+                    opened = True
+                    log(f"[ls] +cnr opened via sub button (attempt {attempt}/3)")
+            except Exception as err:
+                log(f"[ls] +cnr sub click attempt {attempt}/3 failed: {str(err).splitlines()[0]}")
+
+            if not opened:
+                try:
+                    ok = page.evaluate("""() => (typeof itmAddModCNR === 'function') ? (itmAddModCNR(), true) : false""")
+                    opened = bool(ok)
+                    log(f"[ls] itmAddModCNR() -> {opened} (attempt {attempt}/3)")
+                except Exception as js_err:
+                    log(f"[ls] itmAddModCNR() JS failed (attempt {attempt}/3): {str(js_err).splitlines()[0]}")
+
+            # Quick visibility check.
+            try:
+                if page.locator("#fcnr_number").count() > 0 and page.locator("#fcnr_number").is_visible():
+                    opened = True
+            except Exception:
+                pass
+
+            if opened:
+                break
+
+            log(f"[ls] +cnr not opened yet (attempt {attempt}/3) fab={fab_count} sub={sub_count}")
+            time.sleep(0.8)
+
+        if not opened:
+            dump_failure("openfab")
+
+            try:
+                has_js = page.evaluate("""() => typeof itmAddModCNR === 'function'""")
+            except Exception:
+                has_js = False
+
+            log(f"[ls] could not open +cnr modal. fab={page.locator('button.kc_fab_main_btn').count()} sub={page.locator('button.sub_fab_btn').count()} js_itmAddModCNR={has_js}")
+            raise RuntimeError("Could not open +cnr modal")
+
+        # Wait for the CNR input. Some pages use name= instead of id=.
+        cnr_input = page.locator("#fcnr_number")
+        if cnr_input.count() == 0:
+            cnr_input = page.locator("input[name='fcnr_number']")
+
+        try:
+            cnr_input.wait_for(state="visible", timeout=30000)
+        except Exception:
+            # Dump diagnostics for this exact failure.
+            dump_failure("addcnr")
+
+            has_id = page.locator("#fcnr_number").count()
+            has_name = page.locator("input[name='fcnr_number']").count()
+            modal_count = page.locator(".modal-content").count()
+            log(f"[ls] +cnr modal not visible. has_id={has_id} has_name={has_name} modal_content={modal_count}")
+            raise
+
+        log("[ls] +cnr modal visible")
+        cnr_input.fill(cnr16)
+        page.select_option("#fwher", value="h")
+        page.locator("#btnSav").click()
+        log("[ls] save record clicked")
+
+        # Wait briefly for either an error message or modal close.
+        for _ in range(20):
+            try:
+                if page.locator("#spErr_frmAddMod").count() > 0 and page.locator("#spErr_frmAddMod").first.is_visible():
+                    break
+            except Exception:
+                pass
+            try:
+                if page.locator("#fcnr_number").count() == 0 or not page.locator("#fcnr_number").is_visible():
+                    break
+            except Exception:
+                pass
+            time.sleep(0.5)
+
+        # If it already exists, LexTechSuite shows this element.
+        try:
+            err_loc = page.locator("#spErr_frmAddMod")
+            if err_loc.count() > 0:
+                msg = (err_loc.first.inner_text() or "").strip()
+                if msg:
+                    log(f"[ls] info: {msg}")
+                if "already exists" in msg.lower():
+                    # Close the modal so the next CNR can be added.
+                    close_add_cnr_modal()
+                    return {"cnr": cnr16, "ok": True, "reason": "Already in LexSuite"}
+                if "record has been saved" in msg.lower():
+                    # Try to close the modal so next CNR can be added.
+                    close_add_cnr_modal()
+                    return {"cnr": cnr16, "ok": True, "reason": "Sent to LexSuite"}
+        except Exception:
+            pass
+
+        # Best-effort wait for modal to close.
+        try:
+            page.wait_for_selector("#fcnr_number", state="hidden", timeout=15000)
+        except Exception:
+            pass
+
+        return {"cnr": cnr16, "ok": True, "reason": "Sent to LexSuite"}
+
+    def add_cnr(idx, cnr16):
+        try:
+            return add_cnr_via_modal(idx, cnr16)
+        except Exception as err:
+            msg = str(err).splitlines()[0]
+            log(f"[ls] failed cnr={cnr16} err={msg}")
+            return {"cnr": cnr16, "ok": False, "reason": msg}
+
+    results = {}
+    capture = {"template": None, "tried": not bulk}
+
+    def record(outcome):
+        results[outcome["cnr"]] = outcome
+        if outcome["ok"] and not outcome.get("skipped"):
+            # Saved (or reported as existing): later batches and sends skip it.
+            known.add(outcome["cnr"])
+
+    def send_batch(batch):
+        first = len(order) + 1
+        order.extend(batch)
+        pending = []
+        for idx, cnr16 in enumerate(batch, start=first):
+            if len(cnr16) != 16:
+                results[cnr16] = {"cnr": cnr16, "ok": False, "reason": "CNR must be 16 chars after normalization"}
+                log(f"[ls] skip {idx}/{len(order)} cnr={cnr16} reason=len!=16")
+                continue
+            pending.append((idx, cnr16))
+
+        if LS_SKIP_KNOWN and pending:
+            if known.list_url and known.stale:
+                added = known.refresh(context.request)
+                if not known.stale:
+                    log(f"[ls] existing cases refreshed: +{added} (total {len(known)})")
+            skipped = [c for _, c in pending if c in known]
+            for cnr16 in skipped:
+                results[cnr16] = {"cnr": cnr16, "ok": True, "reason": "Already in LexSuite", "skipped": True}
+            if skipped:
+                pending = [(i, c) for i, c in pending if c not in known]
+                log(f"[ls] skipped {len(skipped)} CNR(s) already in LexSuite; {len(pending)} to send")
+
+        if not capture["tried"] and pending:
+            # Enter the first CNR through the modal and keep the POST requests it sends.
+            capture["tried"] = True
+            captured = []
+
+            def on_request(request):
+                if request.method == "POST":
+                    captured.append(request)
+
+            idx, cnr16 = pending.pop(0)
+            page.on("request", on_request)
+            try:
+                record(add_cnr(idx, cnr16))
+            finally:
+                page.remove_listener("request", on_request)
+            capture["template"] = next((t for t in (capture_save_request(r, cnr16) for r in captured) if t), None)
+            if capture["template"] is None:
+                log("[ls] bulk: Save Record request not captured; using the modal for every CNR")
+
+        if capture["template"] is not None and pending:
+            log(f"[ls] bulk: replaying Save Record for {len(pending)} CNR(s), concurrency={LS_BULK_CONCURRENCY}")
+            outcomes = bulk_save_cnrs(capture["template"], [c for _, c in pending], context.cookies(), log)
+            for outcome in outcomes:
+                if not needs_modal(outcome):
+                    record(outcome)
+            pending = [(i, c) for i, c in pending if c not in results]
+            if any(o["reason"] == SESSION_EXPIRED_REASON for o in outcomes):
+                log(f"[ls] bulk: session expired; {len(pending)} CNR(s) go through the modal")
+                _goto_case_manager()
+                # The captured body may carry a token of the old session: capture again.
+                capture.update(template=None, tried=False)
+            elif pending:
+                log(f"[ls] bulk: {len(pending)} save(s) not confirmed; retrying them through the modal")
+
+        for idx, cnr16 in pending:
+            record(add_cnr(idx, cnr16))
+
+    for batch in cnr_batches:
+        send_batch(batch)
+
+    outcomes = [results[c] for c in order]
+    skipped = len([o for o in outcomes if o.get("skipped")])
+    failed = len([o for o in outcomes if not o["ok"]])
+    log(f"[ls] done: {len(outcomes) - skipped - failed} sent, {skipped} skipped (already in LexSuite), {failed} failed")
+    return outcomes
@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+LS_SESSION_DIR = os.getenv("LS_SESSION_DIR", "cache/ls_sessions")
+# A saved login older than this is not tried at all; younger ones are still validated first.
+LS_SESSION_TTL = float(os.getenv("LS_SESSION_TTL", str(12 * 3600)))
+# Optional server-side secret mixed into the key; without it only the account password
+# (which every send needs anyway) can decrypt a saved session.
+LS_SESSION_KEY = os.getenv("LS_SESSION_KEY", "")
+KDF_ITERATIONS = 200_000
+SALT_BYTES = 16
+
+
+def _fernet(password, salt):
+    try:
+        from cryptography.fernet import Fernet
+    except ImportError:
+        return None
+    secret = f"{LS_SESSION_KEY}\0{password}".encode("utf-8")
+    key = hashlib.pbkdf2_hmac("sha256", secret, salt, KDF_ITERATIONS)
+    return Fernet(base64.urlsafe_b64encode(key))
+
+
+class LsSessionStore:
+    """Encrypted, per-account LexTechSuite storage state (cookies + localStorage) on disk.
+
+    Files are <root>/<sha256(email)>.bin: a random salt followed by a Fernet token whose
+    key is derived (PBKDF2) from the account password and LS_SESSION_KEY. A wrong password,
+    a corrupt file or an entry older than ttl reads as "no session". Needs the optional
+    cryptography package; without it nothing is saved and every send logs in.
+    """
+
+    def __init__(self, root=None, ttl=None):
+        self.root = Path(root or LS_SESSION_DIR)
+        self.ttl = LS_SESSION_TTL if ttl is None else float(ttl)
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        try:
+            import cryptography  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def path(self, email):
+        return self.root / f"{hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()}.bin"
+
+    def load(self, email, password):
+        path = self.path(email)
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            return None
+        fernet = _fernet(password, raw[:SALT_BYTES])
+        if fernet is None:
+            return None
+        try:
+            payload = json.loads(fernet.decrypt(raw[SALT_BYTES:]))
+        except Exception:
+            return None
+        if time.time() - payload.get("saved_at", 0) > self.ttl:
+            return None
+        return payload.get("state")
+
+    def save(self, email, password, state):
+        salt = os.urandom(SALT_BYTES)
+        fernet = _fernet(password, salt)
+        if fernet is None:
+            return False
+        token = fernet.encrypt(json.dumps({"saved_at": time.time(), "state": state}).encode("utf-8"))
+        target = self.path(email)
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            try:
+                os.chmod(tmp, 0o600)
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(salt + token)
+                os.replace(tmp, target)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+        return True
+
+    def delete(self, email):
+        self.path(email).unlink(missing_ok=True)
+
+
+def restore_storage_state(context, state):
+    """Load a saved storage_state() into an already created context."""
+    if state.get("cookies"):
+        context.add_cookies(state["cookies"])
+    origins = {o["origin"]: {i["name"]: i["value"] for i in o.get("localStorage", [])} for o in state.get("origins", [])}
+    if any(origins.values()):
+        context.add_init_script(
+            "(origins => { const items = origins[location.origin];"
+            " if (items) for (const [k, v] of Object.entries(items))"
+            " if (localStorage.getItem(k) === null) localStorage.setItem(k, v); })"
+            f"({json.dumps(origins)})"
+        )
+
+
+_STORE = None
+
+
+def get_ls_session_store():
+    global _STORE
+    if _STORE is None:
+        _STORE = LsSessionStore()
+    return _STORE
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PDF_STORE_DIR = os.getenv("PDF_STORE_DIR", "cache/pdfs")
+# Streamlit serves <app dir>/static at app/static/ when server.enableStaticServing is on
+# (.streamlit/config.toml); previews are published there so the browser fetches them by URL.
+STATIC_DIR = Path(__file__).with_name("static")
+STATIC_URL = "app/static"
+THUMBNAIL_WIDTH = int(os.getenv("PDF_THUMBNAIL_WIDTH", "360"))
+# Retention for the store itself (PDFs also go when the result cache evicts their entry):
+# least recently used PDFs are removed above PDF_STORE_MAX_BYTES, and PDFs not used for
+# PDF_STORE_MAX_AGE_DAYS are removed too (0 disables a cap). Published previews and
+# thumbnails go with their PDF.
+PDF_STORE_MAX_BYTES = int(os.getenv("PDF_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+PDF_STORE_MAX_AGE_DAYS = float(os.getenv("PDF_STORE_MAX_AGE_DAYS", "30"))
+# put() prunes at most this often (seconds); pruning walks the whole store.
+PDF_STORE_PRUNE_INTERVAL = 60.0
+
+
+class PdfStore:
+    """Content-addressed PDF files: <root>/<sha256[:2]>/<sha256>.pdf.
+
+    put() hashes the bytes and writes them once (identical orders are stored once);
+    callers keep only the returned ref and read the file back when it is needed. A file's
+    mtime is its last use (put, read, preview); prune() removes the least recently used
+    ones above max_bytes and those unused for max_age_days.
+    """
+
+    def __init__(self, root=None, max_bytes=None, max_age_days=None):
+        self.root = Path(root or PDF_STORE_DIR)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = PDF_STORE_MAX_BYTES if max_bytes is None else int(max_bytes)
+        self.max_age_days = PDF_STORE_MAX_AGE_DAYS if max_age_days is None else float(max_age_days)
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def path(self, ref):
+        return self.root / ref[:2] / f"{ref}.pdf"
+
+    def exists(self, ref):
+        return bool(ref) and self.path(ref).is_file()
+
+    def size(self, ref):
+        return self.path(ref).stat().st_size
+
+    def _touch(self, ref):
+        try:
+            os.utime(self.path(ref))
+        except OSError:
+            pass
+
+    def put(self, data):
+        ref = hashlib.sha256(data).hexdigest()
+        target = self.path(ref)
+        if target.is_file():
+            self._touch(ref)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Write-then-rename so concurrent workers never expose a half-written file.
+            fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(data)
+                os.replace(tmp, target)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+        if time.monotonic() >= self._next_prune:
+            self.prune(keep=ref)
+        return ref
+
+    def read(self, ref):
+        self._touch(ref)
+        return self.path(ref).read_bytes()
+
+    def delete(self, ref):
+        self.path(ref).unlink(missing_ok=True)
+        (STATIC_DIR / "pdf" / f"{ref}.pdf").unlink(missing_ok=True)
+        (STATIC_DIR / "thumbs" / f"{ref}.png").unlink(missing_ok=True)
+
+    def prune(self, keep=None):
+        """Apply the size and age caps; returns the number of PDFs removed (never keep)."""
+        with self._lock:
+            self._next_prune = time.monotonic() + PDF_STORE_PRUNE_INTERVAL
+            files = []
+            for sub in self.root.iterdir():
+                if not sub.is_dir():
+                    continue
+                with os.scandir(sub) as entries:
+                    for entry in entries:
+                        if entry.is_file() and entry.name.endswith(".pdf"):
+                            st = entry.stat()
+                            files.append((st.st_mtime, st.st_size, entry.name[:-4]))
+            files.sort()
+            total = sum(size for _, size, _ in files)
+            cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days > 0 else None
+            removed = 0
+            for mtime, size, ref in files:
+                too_big = self.max_bytes > 0 and total > self.max_bytes
+                too_old = cutoff is not None and mtime < cutoff
+                if not (too_big or too_old):
+                    # Oldest first: nothing after this one is too old either.
+                    break
+                if ref == keep:
+                    continue
+                self.delete(ref)
+                total -= size
+                removed += 1
+            # Previews and thumbnails whose PDF is gone (e.g. removed by an older version).
+            for sub, suffix in (("pdf", ".pdf"), ("thumbs", ".png")):
+                published = STATIC_DIR / sub
+                if published.is_dir():
+                    for path in published.glob(f"*{suffix}"):
+                        if not self.exists(path.name[: -len(suffix)]):
+                            path.unlink(missing_ok=True)
+            return removed
+
+    def preview_url(self, ref):
+        """Publish the PDF under the static dir (hard link, copy across filesystems) and return its URL."""
+        self._touch(ref)
+        target = STATIC_DIR / "pdf" / f"{ref}.pdf"
+        if not target.is_file():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(self.path(ref), target)
+            except FileExistsError:
+                pass
+            except OSError:
+                shutil.copyfile(self.path(ref), target)
+        return f"{STATIC_URL}/pdf/{ref}.pdf"
+
+    def thumbnail_url(self, ref, width=THUMBNAIL_WIDTH):
+        """First-page PNG rendered once and kept on disk; None without pypdfium2 or on a bad PDF."""
+        target = STATIC_DIR / "thumbs" / f"{ref}.png"
+        if not target.is_file():
+            try:
+                import pypdfium2
+            except ImportError:
+                return None
+            try:
+                doc = pypdfium2.PdfDocument(str(self.path(ref)))
+                try:
+                    page = doc[0]
+                    image = page.render(scale=width / page.get_width()).to_pil()
+                finally:
+                    doc.close()
+            except Exception:
+                return None
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                image.save(fh, format="PNG", optimize=True)
+            os.replace(tmp, target)
+        return f"{STATIC_URL}/thumbs/{ref}.png"
+
+
+_STORE = None
+
+
+def get_pdf_store():
+    global _STORE
+    if _STORE is None:
+        _STORE = PdfStore()
+    return _STORE
@@ -0,0 +1,149 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlsplit
+
+# Politeness limits for hcservices, shared by every worker and session of the process:
+# a token bucket (HC_RATE_PER_MIN requests/minute, bursts of HC_RATE_BURST), at most
+# HC_MAX_CONCURRENCY requests in flight, and up to HC_RATE_JITTER seconds of random delay
+# so parallel workers do not fire in lockstep.
+HC_RATE_PER_MIN = float(os.getenv("HC_RATE_PER_MIN", "60"))
+HC_RATE_BURST = max(int(os.getenv("HC_RATE_BURST", "5") or 1), 1)
+HC_MAX_CONCURRENCY = max(int(os.getenv("HC_MAX_CONCURRENCY", "4") or 1), 1)
+HC_RATE_JITTER = float(os.getenv("HC_RATE_JITTER", "0.3"))
+# Hosts the limits apply to (comma separated); others are not limited.
+RATE_LIMITED_HOSTS = [
+    h.strip().lower() for h in os.getenv("RATE_LIMITED_HOSTS", "hcservices.ecourts.gov.in").split(",") if h.strip()
+]
+
+
+class HostLimiter:
+    """Token bucket plus concurrency cap for one host, with wait-time gauges.
+
+    slot() blocks until a token is available and fewer than max_concurrency requests are
+    in flight, then holds the concurrency slot for the duration of the with-block.
+    """
+
+    def __init__(self, rate_per_min=HC_RATE_PER_MIN, burst=HC_RATE_BURST, max_concurrency=HC_MAX_CONCURRENCY, jitter=HC_RATE_JITTER):
+        self.rate = max(float(rate_per_min), 0.001) / 60.0
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.jitter = jitter
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.last_wait = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @contextmanager
+    def slot(self):
+        start = time.monotonic()
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._tokens >= 1 and self.in_flight < self.max_concurrency:
+                        self._tokens -= 1
+                        self.in_flight += 1
+                        break
+                    # Sleep until the next token is due; a finishing request wakes us earlier.
+                    due = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.5
+                    self._cond.wait(timeout=min(max(due, 0.01), 1.0))
+            finally:
+                self.waiting -= 1
+        try:
+            if self.jitter > 0:
+                time.sleep(random.uniform(0, self.jitter))
+            waited = time.monotonic() - start
+            with self._cond:
+                self.requests += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+                self.last_wait = waited
+            yield waited
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def gauges(self):
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "waiting": self.waiting,
+                "requests": self.requests,
+                "wait_total_ms": self.wait_total * 1000,
+                "wait_avg_ms": self.wait_total / self.requests * 1000 if self.requests else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+                "wait_last_ms": self.last_wait * 1000,
+                "rate_per_min": self.rate * 60,
+            }
+
+
+class RateLimiter:
+    """Per-host HostLimiters for the hosts in RATE_LIMITED_HOSTS (or a subdomain of them)."""
+
+    def __init__(self, hosts=None, **limits):
+        self.hosts = RATE_LIMITED_HOSTS if hosts is None else [h.lower() for h in hosts]
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._limiters = {}
+
+    def _limiter(self, url):
+        host = (urlsplit(url).hostname or "").lower()
+        site = next((h for h in self.hosts if host == h or host.endswith("." + h)), None)
+        if site is None:
+            return None
+        with self._lock:
+            if site not in self._limiters:
+                self._limiters[site] = HostLimiter(**self.limits)
+            return self._limiters[site]
+
+    def slot(self, url):
+        limiter = self._limiter(url)
+        return limiter.slot() if limiter is not None else nullcontext(0.0)
+
+    def gauges(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {host: limiter.gauges() for host, limiter in limiters.items()}
+
+    def summary(self, since=None):
+        """One line per host; with since (an earlier gauges()) requests and wait_avg cover only the interval."""
+        parts = []
+        for host, g in self.gauges().items():
+            before = (since or {}).get(host, {})
+            requests = g["requests"] - before.get("requests", 0)
+            wait_total = g["wait_total_ms"] - before.get("wait_total_ms", 0.0)
+            parts.append(
+                f"{host}: in_flight={g['in_flight']}/{g['max_concurrency']} waiting={g['waiting']} "
+                f"requests={requests} wait_avg={wait_total / requests if requests else 0:.0f}ms "
+                f"wait_max={g['wait_max_ms']:.0f}ms"
+            )
+        return " | ".join(parts)
+
+
+_LIMITER = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def get_rate_limiter():
+    global _LIMITER
+    if _LIMITER is None:
+        with _LIMITER_LOCK:
+            if _LIMITER is None:
+                _LIMITER = RateLimiter()
+    return _LIMITER
@@ -0,0 +1,470 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# off: no interception; observe: only listen (request/response events) and count what
+# enforce would block; enforce: route every request to abort / stub the ones the rules
+# below mark as non-essential. Routing turns off Chromium's HTTP cache for the context,
+# so in enforce mode scripts and stylesheets come from the AssetCache instead.
+RESOURCE_POLICY = os.getenv("RESOURCE_POLICY", "enforce").strip().lower()
+RESOURCE_POLICY_MODES = ("off", "observe", "enforce")
+# Sizes (Content-Length) of responses observe mode saw and enforce would block, kept on
+# disk so an enforce run can report the bytes it saved. Enforce never sees those responses.
+RESOURCE_SIZE_HINTS = os.getenv("RESOURCE_SIZE_HINTS", "cache/resource_sizes.json")
+SIZE_HINTS_MAX = 4096
+SIZE_HINTS_SAVE_INTERVAL = 10.0
+# Per-site rules, matched on the request host (the site or a subdomain of it).
+# allow: URL patterns always let through, whatever their resource type.
+# block: resource types aborted for that site. Stylesheets are kept on purpose: the fetch
+# flow waits for elements to become visible, and visibility depends on the CSS.
+SITE_RULES = {
+    "hcservices.ecourts.gov.in": {
+        # The form page, #captcha_image, the showRecords / history XHRs and the order PDFs.
+        "allow": [r"/main\.php", r"/securimage/", r"/cases_qry/", r"/cases/", r"display_pdf", r"\.pdf(\?|$)"],
+        "block": ["image", "media", "font"],
+    },
+    "lextechsuite.com": {
+        "allow": [],
+        "block": ["image", "media", "font"],
+    },
+}
+# Third-party hosts no flow needs (analytics, tag managers, web fonts, social widgets).
+# Scripts and stylesheets from them are answered with an empty body so page code that
+# loads them keeps running; anything else is aborted.
+DENY_HOSTS = [
+    r"(^|\.)google-analytics\.com$",
+    r"(^|\.)googletagmanager\.com$",
+    r"(^|\.)doubleclick\.net$",
+    r"(^|\.)fonts\.googleapis\.com$",
+    r"(^|\.)fonts\.gstatic\.com$",
+    r"(^|\.)facebook\.(com|net)$",
+    r"(^|\.)hotjar\.com$",
+    r"(^|\.)clarity\.ms$",
+]
+# Scripts and stylesheets fetched by the contexts are kept on disk and served to later
+# contexts and runs without a network round trip. Set ASSET_CACHE=0 to disable.
+ASSET_CACHE = os.getenv("ASSET_CACHE", "1").strip().lower() not in ("0", "false", "off", "")
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", "cache/assets")
+# Upper bound on how long an asset is reused; a shorter Cache-Control max-age wins.
+ASSET_CACHE_TTL = float(os.getenv("ASSET_CACHE_TTL", str(24 * 3600)))
+# Least recently used assets are removed above this many bytes (checked at most once a minute).
+ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ASSET_CACHE_PRUNE_INTERVAL = 60.0
+ASSET_TYPES = {"script", "stylesheet"}
+# Never stored or replayed: per-context state (cookies), hop-by-hop headers, and the
+# encoding/length of the original transfer. route.fetch().body() is already decoded, so
+# passing the upstream content-encoding / content-length on would corrupt the asset.
+ASSET_DROP_HEADERS = {
+    "set-cookie",
+    "date",
+    "age",
+    "connection",
+    "keep-alive",
+    "transfer-encoding",
+    "content-encoding",
+    "content-length",
+}
+STUBS = {
+    "script": "application/javascript",
+    "stylesheet": "text/css",
+}
+
+
+def cache_lifetime(headers, ttl):
+    """Seconds a response may be reused per its Cache-Control (at most ttl); None if it must not be stored.
+
+    private and no-store responses are never kept (the cache is shared by every context);
+    no-cache means stored but revalidated on every use.
+    """
+    directives = {}
+    for part in headers.get("cache-control", "").lower().split(","):
+        name, _, value = part.strip().partition("=")
+        directives[name] = value.strip().strip('"')
+    if "no-store" in directives or "private" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    if "max-age" in directives:
+        try:
+            return min(max(float(directives["max-age"]), 0.0), ttl)
+        except ValueError:
+            return 0.0
+    return ttl
+
+
+def revalidation_headers(meta):
+    """Conditional request headers for a stored entry; empty when it has no validator."""
+    headers = {}
+    if meta["headers"].get("etag"):
+        headers["if-none-match"] = meta["headers"]["etag"]
+    if meta["headers"].get("last-modified"):
+        headers["if-modified-since"] = meta["headers"]["last-modified"]
+    return headers
+
+
+def request_site(request):
+    """Host of the document that made the request; assets are cached per site."""
+    try:
+        return urlsplit(request.frame.url).hostname or ""
+    except Exception:
+        return ""
+
+
+def resource_policy_mode(value):
+    value = str(value or "off").strip().lower()
+    if value not in RESOURCE_POLICY_MODES:
+        raise ValueError(f"unknown resource policy '{value}' (choose from {', '.join(RESOURCE_POLICY_MODES)})")
+    return value
+
+
+class AssetCache:
+    """Disk cache of static assets: <root>/<key[:2]>/<key>.{json,body}, key = sha1(site, url).
+
+    Entries are keyed by the requesting site as well as the URL, so one site's response is
+    never replayed to another. Only 200 GET responses without Set-Cookie and not marked
+    no-store or private are kept, so the cache never carries one context's session into
+    another. An entry is fresh for its Cache-Control max-age (at most ttl); get() still
+    returns a stale entry that has an ETag / Last-Modified, for the caller to revalidate
+    and refresh() on a 304. A hit refreshes the entry's mtime; put() prunes the least
+    recently used entries once the bodies exceed max_bytes.
+    """
+
+    def __init__(self, root=None, ttl=None, max_bytes=None):
+        self.root = Path(root or ASSET_CACHE_DIR)
+        self.ttl = ASSET_CACHE_TTL if ttl is None else float(ttl)
+        self.max_bytes = ASSET_CACHE_MAX_BYTES if max_bytes is None else int(max_bytes)
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def _paths(self, url, site=""):
+        key = hashlib.sha1(f"{site} {url}".encode("utf-8")).hexdigest()
+        base = self.root / key[:2] / key
+        return base.with_suffix(".json"), base.with_suffix(".body")
+
+    @staticmethod
+    def fresh(meta):
+        return time.time() < meta["expires_at"]
+
+    def get(self, url, site=""):
+        meta_path, body_path = self._paths(url, site)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if not self.fresh(meta) and not revalidation_headers(meta):
+                return None
+            body = body_path.read_bytes()
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        # Entries written before content-encoding/-length were dropped still carry them.
+        meta["headers"] = {k: v for k, v in meta["headers"].items() if k not in ASSET_DROP_HEADERS}
+        return meta, body
+
+    def _meta(self, url, site, status, headers):
+        headers = {k: v for k, v in headers.items() if k not in ASSET_DROP_HEADERS}
+        lifetime = cache_lifetime(headers, self.ttl)
+        if lifetime is None or (not lifetime and not revalidation_headers({"headers": headers})):
+            return None
+        now = time.time()
+        return {"url": url, "site": site, "status": status, "headers": headers, "stored_at": now, "expires_at": now + lifetime}
+
+    def _write(self, path, data):
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def put(self, url, status, headers, body, site=""):
+        meta = self._meta(url, site, status, headers) if status == 200 and "set-cookie" not in headers else None
+        if meta is None:
+            return False
+        meta_path, body_path = self._paths(url, site)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        # Body first, then meta: a reader that finds the meta also finds a complete body.
+        self._write(body_path, body)
+        self._write(meta_path, json.dumps(meta).encode("utf-8"))
+        if time.monotonic() >= self._next_prune:
+            self.prune()
+        return True
+
+    def refresh(self, url, meta, headers, site=""):
+        """Apply a 304's headers to a stale entry; returns the new meta, or None if it is dropped."""
+        meta_path, body_path = self._paths(url, site)
+        merged = {**meta["headers"], **{k: v for k, v in headers.items() if k != "set-cookie"}}
+        meta = self._meta(url, site, meta["status"], merged)
+        if meta is None:
+            meta_path.unlink(missing_ok=True)
+            body_path.unlink(missing_ok=True)
+            return None
+        self._write(meta_path, json.dumps(meta).encode("utf-8"))
+        return meta
+
+    def prune(self):
+        """Remove least recently used entries until the bodies fit in max_bytes; returns how many."""
+        with self._lock:
+            self._next_prune = time.monotonic() + ASSET_CACHE_PRUNE_INTERVAL
+            if self.max_bytes <= 0 or not self.root.is_dir():
+                return 0
+            entries = []
+            for meta_path in self.root.glob("*/*.json"):
+                body_path = meta_path.with_suffix(".body")
+                try:
+                    entries.append((meta_path.stat().st_mtime, body_path.stat().st_size, meta_path, body_path))
+                except OSError:
+                    continue
+            entries.sort()
+            total = sum(size for _, size, _, _ in entries)
+            removed = 0
+            for _, size, meta_path, body_path in entries:
+                if total <= self.max_bytes:
+                    break
+                # Meta first: a reader never finds meta without its body.
+                meta_path.unlink(missing_ok=True)
+                body_path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+            return removed
+
+
+class ResourcePolicy:
+    """Request interception for browser contexts: per-site allow/block rules plus a third-party deny list.
+
+    In enforce mode install(context) routes every request of the context through decide(),
+    which answers "allow", "block" (abort) or "stub" (empty 200). Routed contexts lose the
+    browser's HTTP cache (a reused context re-downloads everything), so allowed scripts and
+    stylesheets go through the AssetCache when one is given. Observe mode does not route:
+    it only listens to request/response events, so the traffic it measures is the
+    unmodified one. Counters are kept for all contexts of the process. Blocked bytes are
+    only known for responses that were seen: in observe mode every would-be-blocked
+    response is measured and its size saved per URL (hints_path), and enforce mode counts
+    those sizes as saved. Blocked requests without a known size are counted as unsized.
+    """
+
+    def __init__(self, mode=None, site_rules=None, deny_hosts=None, assets=None, hints_path=None):
+        self.mode = resource_policy_mode(RESOURCE_POLICY if mode is None else mode)
+        self.assets = assets
+        self.hints_path = Path(hints_path or RESOURCE_SIZE_HINTS)
+        self.site_rules = {
+            site: {
+                "allow": re.compile("|".join(rules["allow"])) if rules["allow"] else None,
+                "block": set(rules["block"]),
+            }
+            for site, rules in (SITE_RULES if site_rules is None else site_rules).items()
+        }
+        self.deny_hosts = re.compile("|".join(DENY_HOSTS if deny_hosts is None else deny_hosts) or "(?!)")
+        self._lock = threading.Lock()
+        self._size_hints = self._load_size_hints() if self.mode != "off" else {}
+        self._hints_dirty = False
+        self._next_hints_save = 0.0
+        self._stats = {
+            "requests": 0,
+            "allowed": 0,
+            "blocked": 0,
+            "stubbed": 0,
+            "allowed_bytes": 0,
+            "blocked_bytes": 0,
+            "blocked_unsized": 0,
+            "asset_hits": 0,
+            "asset_misses": 0,
+            "asset_revalidated": 0,
+            "asset_bytes": 0,
+        }
+
+    def _site(self, host):
+        for site, rules in self.site_rules.items():
+            if host == site or host.endswith("." + site):
+                return rules
+        return None
+
+    def decide(self, url, resource_type):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            return "allow"
+        host = parts.hostname or ""
+        if self.deny_hosts.search(host):
+            return "stub" if resource_type in STUBS else "block"
+        rules = self._site(host)
+        if rules is None:
+            return "allow"
+        if rules["allow"] is not None and rules["allow"].search(parts.path + ("?" + parts.query if parts.query else "")):
+            return "allow"
+        return "block" if resource_type in rules["block"] else "allow"
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def install(self, context):
+        if self.mode == "enforce":
+            context.route("**/*", self._handle)
+        elif self.mode == "observe":
+            context.on("request", self._on_request)
+        else:
+            return context
+        context.on("response", self._on_response)
+        return context
+
+    def _on_request(self, request):
+        with self._lock:
+            self._stats["requests"] += 1
+
+    def _handle(self, route, request):
+        action = self.decide(request.url, request.resource_type)
+        with self._lock:
+            self._stats["requests"] += 1
+            if action == "block":
+                self._stats["blocked"] += 1
+            elif action == "stub":
+                self._stats["stubbed"] += 1
+            if action != "allow":
+                size = self._size_hints.get(request.url.split("#")[0])
+                if size is None:
+                    self._stats["blocked_unsized"] += 1
+                else:
+                    self._stats["blocked_bytes"] += size
+        try:
+            if action == "block":
+                route.abort("blockedbyclient")
+            elif action == "stub":
+                route.fulfill(status=200, content_type=STUBS[request.resource_type], body="")
+            elif not self._serve_asset(route, request):
+                route.continue_()
+        except Exception:
+            # The page navigated away or closed while the request was in flight.
+            pass
+
+    def _serve_asset(self, route, request):
+        if self.assets is None or request.resource_type not in ASSET_TYPES or request.method != "GET":
+            return False
+        url = request.url.split("#")[0]
+        site = request_site(request)
+        cached = self.assets.get(url, site)
+        conditional = {}
+        if cached is not None:
+            meta, body = cached
+            if self.assets.fresh(meta):
+                return self._fulfill_cached(route, meta, body, "asset_hits")
+            conditional = revalidation_headers(meta)
+        try:
+            response = route.fetch(headers={**request.headers, **conditional}) if conditional else route.fetch()
+            headers = {k.lower(): v for k, v in response.headers.items()}
+            if response.status == 304 and conditional:
+                # Still valid: only the headers came over the wire.
+                self.assets.refresh(url, meta, headers, site)
+                return self._fulfill_cached(route, meta, body, "asset_revalidated")
+            body = response.body()
+        except Exception:
+            return False
+        self.assets.put(url, response.status, headers, body, site)
+        route.fulfill(
+            status=response.status,
+            headers={k: v for k, v in headers.items() if k not in ASSET_DROP_HEADERS},
+            body=body,
+        )
+        with self._lock:
+            self._stats["asset_misses"] += 1
+        return True
+
+    def _fulfill_cached(self, route, meta, body, counter):
+        route.fulfill(status=meta["status"], headers=meta["headers"], body=body)
+        with self._lock:
+            self._stats[counter] += 1
+            self._stats["asset_bytes"] += len(body)
+        return True
+
+    def _on_response(self, response):
+        # Only what is cheap to read: the content-length header (chunked responses count as 0).
+        try:
+            size = int(response.headers.get("content-length") or 0)
+            request = response.request
+            would_block = self.decide(response.url, request.resource_type) != "allow"
+        except Exception:
+            return
+        if would_block and self.mode == "enforce":
+            # One of our own stubs; already counted in _handle.
+            return
+        with self._lock:
+            if would_block:
+                url = response.url.split("#")[0]
+                if size and self._size_hints.get(url) != size and (
+                    url in self._size_hints or len(self._size_hints) < SIZE_HINTS_MAX
+                ):
+                    self._size_hints[url] = size
+                    self._hints_dirty = True
+                self._stats["blocked"] += 1
+                self._stats["blocked_bytes"] += size
+            else:
+                self._stats["allowed"] += 1
+                self._stats["allowed_bytes"] += size
+            save = self._hints_dirty and time.monotonic() >= self._next_hints_save
+        if save:
+            self.save_size_hints()
+
+    def _load_size_hints(self):
+        try:
+            hints = json.loads(self.hints_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(hints, dict):
+            return {}
+        return {url: size for url, size in list(hints.items())[:SIZE_HINTS_MAX] if isinstance(size, int) and size > 0}
+
+    def save_size_hints(self):
+        """Write the observed sizes to hints_path if they changed (observe mode keeps them current)."""
+        with self._lock:
+            if not self._hints_dirty:
+                return False
+            self._hints_dirty = False
+            self._next_hints_save = time.monotonic() + SIZE_HINTS_SAVE_INTERVAL
+            data = json.dumps(self._size_hints).encode("utf-8")
+        try:
+            self.hints_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.hints_path.with_name(f"{self.hints_path.name}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, self.hints_path)
+        except OSError:
+            return False
+        return True
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, mode=self.mode)
+
+    def summary(self, since=None):
+        s = self.stats()
+        if since:
+            s = {k: v - since.get(k, 0) if isinstance(v, int) else v for k, v in s.items()}
+        verb = "would_block" if self.mode == "observe" else "blocked"
+        # Enforce mode only knows the sizes observe runs saved; never report unknown as 0KB.
+        if s["blocked_unsized"] and not s["blocked_bytes"]:
+            saved = f"saved=? ({s['blocked_unsized']} unsized)"
+        else:
+            saved = f"saved~={s['blocked_bytes'] / 1024:.0f}KB"
+            if s["blocked_unsized"]:
+                saved += f" (+{s['blocked_unsized']} unsized)"
+        text = (
+            f"mode={s['mode']} requests={s['requests']} {verb}={s['blocked']} stubbed={s['stubbed']} "
+            f"loaded={s['allowed_bytes'] / 1024:.0f}KB {saved}"
+        )
+        if self.assets is not None:
+            text += (
+                f" assets hits={s['asset_hits']} revalidated={s['asset_revalidated']} misses={s['asset_misses']} "
+                f"from_cache={s['asset_bytes'] / 1024:.0f}KB"
+            )
+        return text
+
+
+_POLICY = None
+_POLICY_LOCK = threading.Lock()
+
+
+def get_resource_policy():
+    global _POLICY
+    if _POLICY is None:
+        with _POLICY_LOCK:
+            if _POLICY is None:
+                _POLICY = ResourcePolicy(assets=AssetCache() if ASSET_CACHE else None)
+    return _POLICY
@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from pdf_store import get_pdf_store
+
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "cache/results.sqlite3")
+# Entries younger than this are served without touching the site; older ones are revalidated.
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(12 * 3600)))
+# Least recently used entries are evicted once their PDFs exceed this many bytes.
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Outcomes worth remembering; failures are always retried.
+CACHEABLE_REASONS = {
+    "PDF downloaded",
+    "PDF unchanged (cached)",
+    "No recent orders found",
+    "No history/orders found",
+    "History opened; order table not found",
+}
+KEY_FIELDS = ("sess_state_code", "court_complex_code", "search_mode", "value", "no", "year")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    cnr TEXT NOT NULL DEFAULT '',
+    order_date TEXT,
+    order_link TEXT,
+    fetched INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    pdf_ref TEXT,
+    size INTEGER NOT NULL DEFAULT 0,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at);
+"""
+
+
+def cache_key(case):
+    return "|".join(str(case.get(field, "") or "").strip() for field in KEY_FIELDS)
+
+
+class ResultCache:
+    """On-disk (SQLite) cache of per-case fetch results: CNR, latest order and its PDF ref.
+
+    get() reports whether an entry is fresh (younger than ttl) or stale; stale entries are
+    meant to be revalidated by a fetch that can skip the PDF download when the latest
+    order link is unchanged. PDFs live in the pdf_store; put() evicts least recently used
+    entries above max_bytes and drops PDFs no remaining entry refers to.
+    """
+
+    def __init__(self, path=None, ttl=None, max_bytes=None):
+        self.path = Path(path or RESULT_CACHE_PATH)
+        self.ttl = RESULT_CACHE_TTL if ttl is None else float(ttl)
+        self.max_bytes = RESULT_CACHE_MAX_BYTES if max_bytes is None else int(max_bytes)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Shared by the Streamlit sessions of one server; SQLite serializes across processes.
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(results)")}
+        if "pdf_ref" not in columns:
+            self._db.execute("ALTER TABLE results ADD COLUMN pdf_ref TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_pdf_ref ON results (pdf_ref)")
+        self._db.commit()
+
+    def _total_bytes(self):
+        # Identical PDFs are stored once, so each pdf_ref counts once however many rows share it.
+        return self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM "
+            "(SELECT MAX(size) AS size FROM results WHERE pdf_ref IS NOT NULL GROUP BY pdf_ref)"
+        ).fetchone()[0]
+
+    def get(self, case):
+        now = time.time()
+        key = cache_key(case)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT cnr, order_date, order_link, fetched, reason, pdf_ref, stored_at FROM results WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        cnr, order_date, order_link, fetched, reason, pdf_ref, stored_at = row
+        return {
+            "cnr": cnr,
+            "order_date": order_date,
+            "order_link": order_link,
+            "fetched": bool(fetched),
+            "reason": reason,
+            "pdf_ref": pdf_ref,
+            "age": now - stored_at,
+            "fresh": now - stored_at < self.ttl,
+        }
+
+    def put(self, case, outcome, result=None):
+        if outcome.get("reason") not in CACHEABLE_REASONS:
+            return False
+        now = time.time()
+        pdf_ref = result.get("pdf_ref") if result else None
+        size = get_pdf_store().size(pdf_ref) if pdf_ref else 0
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results "
+                "(key, cnr, order_date, order_link, fetched, reason, pdf_ref, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    cache_key(case),
+                    outcome.get("cnr") or "",
+                    result.get("order_date") if result else None,
+                    result.get("order_link") if result else None,
+                    int(bool(outcome.get("fetched"))),
+                    outcome["reason"],
+                    pdf_ref,
+                    size,
+                    now,
+                    now,
+                ),
+            )
+            self._evict()
+            self._db.commit()
+        return True
+
+    def _evict(self):
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        store = get_pdf_store()
+        rows = self._db.execute("SELECT key, pdf_ref, size FROM results ORDER BY accessed_at").fetchall()
+        for key, pdf_ref, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            # Identical PDFs are stored once; keep the file (and its bytes) while another entry uses it.
+            if pdf_ref and not self._db.execute("SELECT 1 FROM results WHERE pdf_ref = ?", (pdf_ref,)).fetchone():
+                store.delete(pdf_ref)
+                total -= size
+
+    def stats(self):
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            size = self._total_bytes()
+        return {"entries": count, "bytes": size}
+
+    def summary(self):
+        s = self.stats()
+        return f"entries={s['entries']} size={s['bytes'] / 1e6:.1f}MB"
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM results")
+            self._db.commit()
+            self._db.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
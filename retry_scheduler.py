@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from collections import Counter
+
+# Failure classes a fetch attempt can end with: seconds to wait before the case is tried
+# again (doubled for every repeat of the class on that case), and whether the class says
+# something about the site rather than the case (those feed the circuit breaker).
+RETRY_POLICY = {
+    "captcha_unreadable": {"backoff": 0.0, "site": False},
+    "captcha_invalid": {"backoff": 0.0, "site": False},
+    "missing_history": {"backoff": 3.0, "site": False},
+    "navigation_timeout": {"backoff": 5.0, "site": True},
+    "site_unreachable": {"backoff": 10.0, "site": True},
+    "error": {"backoff": 2.0, "site": False},
+}
+RETRY_MAX_BACKOFF = 60.0
+# This many site failures in a row (across all workers, no attempt reaching the site in
+# between) open the breaker: nothing is dispatched for RETRY_BREAKER_COOLDOWN seconds,
+# doubled on every trip; after RETRY_BREAKER_MAX_TRIPS trips the run gives up.
+RETRY_BREAKER_THRESHOLD = max(int(os.getenv("RETRY_BREAKER_THRESHOLD", "4") or 1), 1)
+RETRY_BREAKER_COOLDOWN = float(os.getenv("RETRY_BREAKER_COOLDOWN", "30"))
+RETRY_BREAKER_MAX_TRIPS = max(int(os.getenv("RETRY_BREAKER_MAX_TRIPS", "3") or 1), 1)
+SITE_DOWN_REASON = "Site unavailable (circuit open)"
+
+
+def classify_failure(err):
+    """Failure class for an exception raised by a fetch attempt (browser or HTTP engine)."""
+    name = type(err).__name__
+    msg = str(err)
+    if "Timeout" in name or "Timeout" in msg.split("\n")[0]:
+        return "navigation_timeout"
+    if (
+        "net::ERR_" in msg
+        or name in ("ConnectionError", "ProxyError", "SSLError")
+        or getattr(getattr(err, "response", None), "status_code", 0) >= 500
+    ):
+        return "site_unreachable"
+    return "error"
+
+
+class RetryScheduler:
+    """Work queue for a fetch run that requeues failed attempts instead of retrying in place.
+
+    Workers take (case_index, case, attempt) from next() and hand the attempt's failure
+    class (None on success) to report(). A failed case goes to the back of the queue with
+    the class's backoff, so healthy cases keep flowing while it waits; it is given up
+    after max_attempts. Site-level failures in a row open a circuit breaker that pauses
+    dispatching, and abort the run once it has tripped max_trips times.
+    """
+
+    def __init__(
+        self,
+        items,
+        max_attempts,
+        notify=None,
+        policy=None,
+        breaker_threshold=RETRY_BREAKER_THRESHOLD,
+        breaker_cooldown=RETRY_BREAKER_COOLDOWN,
+        breaker_max_trips=RETRY_BREAKER_MAX_TRIPS,
+    ):
+        self.max_attempts = max_attempts
+        self.policy = RETRY_POLICY if policy is None else policy
+        self.notify = notify or (lambda msg: None)
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.breaker_max_trips = breaker_max_trips
+        self._cond = threading.Condition()
+        # [not_before, case_index, case]; appended at the back, taken front-first once due.
+        self._queue = [[0.0, case_index, case] for case_index, case in items]
+        self._attempts = Counter()
+        self._failures = {}
+        self._in_flight = 0
+        self._site_failures = 0
+        self._trips = 0
+        self.total_trips = 0
+        self._paused_until = 0.0
+        self.aborted = False
+        self._closed = False
+        self.counts = Counter()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._queue) + self._in_flight
+
+    def next(self):
+        """Block until a case is due; None once the queue is drained (or the run aborted)."""
+        with self._cond:
+            while True:
+                if self.aborted or self._closed or (not self._queue and not self._in_flight):
+                    self._cond.notify_all()
+                    return None
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    for pos, (not_before, case_index, case) in enumerate(self._queue):
+                        if not_before <= now:
+                            del self._queue[pos]
+                            self._in_flight += 1
+                            self._attempts[case_index] += 1
+                            return case_index, case, self._attempts[case_index]
+                    wait = min((entry[0] for entry in self._queue), default=now + 0.5) - now
+                self._cond.wait(timeout=max(min(wait, 0.5), 0.01))
+
+    def report(self, case_index, case, failure=None):
+        """Record an attempt. Returns "done", ("retry", delay) or "abort"."""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+            if failure is None or not self.policy.get(failure, {}).get("site"):
+                # The site answered; whatever went wrong was about this case.
+                self._site_failures = 0
+                self._trips = 0 if failure is None else self._trips
+            if failure is None:
+                return "done"
+            self.counts[failure] += 1
+            rule = self.policy.get(failure, self.policy["error"])
+            if rule["site"]:
+                self._site_failures += 1
+                if self._site_failures >= self.breaker_threshold:
+                    self._trip()
+            if self.aborted:
+                return "abort"
+            if self._attempts[case_index] >= self.max_attempts:
+                return "done"
+            repeats = self._failures.setdefault(case_index, Counter())
+            repeats[failure] += 1
+            delay = min(rule["backoff"] * 2 ** (repeats[failure] - 1), RETRY_MAX_BACKOFF)
+            self._queue.append([time.monotonic() + delay, case_index, case])
+            return ("retry", delay)
+
+    def _trip(self):
+        self._site_failures = 0
+        self._trips += 1
+        self.total_trips += 1
+        if self._trips >= self.breaker_max_trips:
+            self.aborted = True
+            self.notify(f"[breaker] site still failing after {self._trips} pauses; giving up on the remaining cases")
+            return
+        cooldown = self.breaker_cooldown * 2 ** (self._trips - 1)
+        self._paused_until = time.monotonic() + cooldown
+        self.notify(f"[breaker] {self.breaker_threshold} site failures in a row; pausing {cooldown:.0f}s")
+
+    def close(self):
+        # Stop handing out cases (e.g. the consumer went away); in-flight attempts finish.
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def remaining(self):
+        """Case indices still queued (after an abort)."""
+        with self._cond:
+            return [case_index for _, case_index, _ in self._queue]
+
+    def summary(self):
+        counts = " ".join(f"{name}={count}" for name, count in sorted(self.counts.items()))
+        return f"failures: {counts or 'none'} breaker_trips={self.total_trips}" + (" aborted" if self.aborted else "")
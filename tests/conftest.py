@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+@pytest.fixture
+def pdf_store(tmp_path, monkeypatch):
+    # A PdfStore of its own, installed as the process-wide one for the code under test.
+    import pdf_store
+
+    store = pdf_store.PdfStore(tmp_path / "pdfs")
+    monkeypatch.setattr(pdf_store, "_STORE", store)
+    monkeypatch.setattr(pdf_store, "STATIC_DIR", tmp_path / "static")
+    return store
+
+
+@pytest.fixture
+def standin_server():
+    from standin_hcservices import serve
+
+    server, base_url = serve()
+    yield server, base_url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def standin(standin_server):
+    return standin_server[1]
+
+
+@pytest.fixture
+def ls_standin():
+    from standin_lextechsuite import serve
+
+    server, base_url = serve()
+    yield server, base_url
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,116 @@
+"""Local stand-in for the hcservices endpoints the fetch engines call.
+
+Serves main.php (session cookie), a captcha image, the showRecords search, the case
+history and order PDFs, enough for the HTTP engine to run a case end to end:
+
+    python tests/standin_hcservices.py 8765
+    python fetch_engine.py cases.jsonl --engine http --base-url http://127.0.0.1:8765/hcservices/
+
+Any six-character captcha is accepted, as long as the HCSESSID cookie belongs to a live
+session (main.php starts one; clearing server.state["sessions"] expires them all, and a
+search on a dead session reads "Invalid Captcha" like the real site). Case number 404 has
+no records; case number 500 answers the search with a server error.
+"""
+
+import io
+import json
+import sys
+import threading
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CINO = "MHHC010012342020"
+HISTORY_HTML = """<html><body>
+<table class="case_details_table table"><tr><td>CNR Number</td><td><strong>MHHC01-001234-2020</strong></td></tr>
+<tr><td>Filing Number</td><td>1234/2020</td></tr></table>
+<table class="order_table table-bordered"><tr><th>Sr No</th><th>Case No</th><th>Judge</th><th>Order Date</th><th>Order Details</th></tr>
+<tr><td>1</td><td>SA/508/1999</td><td>J</td><td>01-02-2023</td><td><a href="cases/display_pdf.php?filename=a">View</a></td></tr>
+<tr><td>2</td><td>SA/508/1999</td><td>J</td><td>05-06-2024</td><td><a href="cases/display_pdf.php?filename=b">View</a></td></tr>
+</table></body></html>"""
+
+
+def captcha_png(text="ab3k9q"):
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (140, 44), "white")
+    ImageDraw.Draw(img).text((8, 14), text, fill="black")
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, body, content_type, status=200, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.endswith("main.php"):
+            state = self.server.state
+            with state["lock"]:
+                state["main_loads"] += 1
+                session = f"standin{state['main_loads']}"
+                state["sessions"].add(session)
+            self.send(b"<html>main</html>", "text/html", headers={"Set-Cookie": f"HCSESSID={session}; Path=/"})
+        elif "securimage" in path:
+            self.send(captcha_png(), "image/png")
+        elif "display_pdf" in path:
+            self.send(b"%PDF-1.4 stand-in " + self.path.encode("utf-8"), "application/pdf")
+        else:
+            self.send(b"not found", "text/plain", 404)
+
+    def live_session(self):
+        cookie = SimpleCookie(self.headers.get("Cookie") or "")
+        session = cookie["HCSESSID"].value if "HCSESSID" in cookie else ""
+        with self.server.state["lock"]:
+            return session in self.server.state["sessions"]
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        path = urlparse(self.path).path
+        if "index_qry" in path:
+            if len(form.get("captcha", [""])[0]) != 6 or not self.live_session():
+                return self.send(b"Invalid Captcha", "text/plain")
+            case_no = form.get("case_no", [""])[0]
+            if case_no == "500":
+                return self.send(b"server error", "text/plain", 500)
+            if case_no == "404":
+                return self.send(json.dumps({"con": ["[]"], "totRecords": 0}).encode("utf-8"), "application/json")
+            records = json.dumps([{"cino": CINO, "case_no": "201100050819999"}])
+            self.send(json.dumps({"con": [records], "totRecords": 1}).encode("utf-8"), "application/json")
+        elif "history" in path:
+            self.send(HISTORY_HTML.encode("utf-8"), "text/html")
+        else:
+            self.send(b"not found", "text/plain", 404)
+
+
+def make_server(port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandinHandler)
+    server.state = {"lock": threading.Lock(), "sessions": set(), "main_loads": 0}
+    return server
+
+
+def serve(port=0):
+    """Start the stand-in on a background thread; returns (server, base_url)."""
+    server = make_server(port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/hcservices/"
+
+
+if __name__ == "__main__":
+    server = make_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"stand-in at http://127.0.0.1:{server.server_address[1]}/hcservices/")
+    server.serve_forever()
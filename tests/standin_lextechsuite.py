@@ -0,0 +1,116 @@
+"""Local stand-in for the LexTechSuite endpoints the sender calls without the browser.
+
+POST /Member/SaveCNR takes the modal's form (fcnr_number plus an anti-forgery tok) and
+answers with the texts the +cnr modal shows. GET /Member/CaseList?page=N is the member's
+case list as JSON, PAGE_SIZE cases a page (EXISTING plus whatever was saved):
+
+    python tests/standin_lextechsuite.py 8766
+
+Requests without the SID=standin cookie are redirected to MembersOnlyPage; a wrong tok
+gets a 403. A CNR seen before is "already exists", one starting with XXXX is invalid and
+one starting with ZZZZ gets an empty 200 (an answer that confirms nothing).
+"""
+
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SESSION_COOKIE = "SID=standin"
+TOKEN = "standin-token"
+EXISTING = ["MHHC010000102020", "MHHC010000112020", "MHHC010000122020"]
+PAGE_SIZE = 2
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, body, status=200, content_type="text/html; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/MembersOnlyPage"):
+            return self.send(b"<html><body>Members only. Please log in.</body></html>")
+        if url.path != "/Member/CaseList":
+            return self.send(b"not found", status=404)
+        if not self.logged_in():
+            return self.members_only()
+        self.server.state["list_requests"] += 1
+        page = int(parse_qs(url.query).get("page", ["1"])[0])
+        with self.server.state["lock"]:
+            cnrs = sorted(set(EXISTING) | self.server.state["saved"])
+        rows = [
+            # Titles quote other cases' CNRs; only CNRNo is this case's.
+            {"CNRNo": f"{c[:6]}-{c[6:12]}-{c[12:]}", "Title": f"Appeal against MHHC01999999{c[12:]}"}
+            for c in cnrs[(page - 1) * PAGE_SIZE : page * PAGE_SIZE]
+        ]
+        self.send(json.dumps({"page": page, "data": rows}).encode("utf-8"), content_type="application/json")
+
+    def logged_in(self):
+        return SESSION_COOKIE in (self.headers.get("Cookie") or "")
+
+    def members_only(self):
+        self.send_response(302)
+        self.send_header("Location", "/Public/MembersOnlyPage")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        state = self.server.state
+        with state["lock"]:
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        try:
+            # Long enough for concurrent replays to overlap (not time.sleep, which tests stub).
+            threading.Event().wait(0.05)
+            self.save(form)
+        finally:
+            with state["lock"]:
+                state["in_flight"] -= 1
+
+    def save(self, form):
+        if urlparse(self.path).path != "/Member/SaveCNR":
+            return self.send(b"not found", status=404)
+        if not self.logged_in():
+            return self.members_only()
+        if form.get("tok", [""])[0] != TOKEN:
+            return self.send(b"bad token", status=403)
+        cnr = form.get("fcnr_number", [""])[0]
+        if cnr.startswith("XXXX"):
+            return self.send(b"Invalid CNR Number")
+        if cnr.startswith("ZZZZ"):
+            return self.send(b"")
+        with self.server.state["lock"]:
+            seen = cnr in self.server.state["saved"]
+            self.server.state["saved"].add(cnr)
+        self.send(b"CNR already exists" if seen else b"Record has been saved")
+
+
+def make_server(port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandinHandler)
+    server.state = {"lock": threading.Lock(), "saved": set(), "in_flight": 0, "max_in_flight": 0, "list_requests": 0}
+    return server
+
+
+def serve(port=0):
+    """Start the stand-in on a background thread; returns (server, base_url)."""
+    server = make_server(port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+if __name__ == "__main__":
+    server = make_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8766)
+    print(f"stand-in at http://127.0.0.1:{server.server_address[1]}/")
+    server.serve_forever()
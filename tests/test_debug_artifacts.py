@@ -0,0 +1,132 @@
+import os
+import time
+
+from debug_artifacts import (
+    CaseDebug,
+    DebugIndex,
+    build_debug_bundle,
+    build_debug_file_path,
+    cap_debug_files,
+    debug_tier,
+    filter_debug_files,
+    get_debug_writer,
+    parse_debug_file_name,
+    scan_debug_dir,
+)
+
+
+def test_debug_tier_keeps_old_values_and_tolerates_typos(capsys):
+    assert debug_tier("1") == "full"
+    assert debug_tier(True) == "full"
+    assert debug_tier("failures") == "failures"
+    assert debug_tier(None) == debug_tier("0") == "off"
+    assert debug_tier("fulll") == "off"
+    assert "unknown debug tier 'fulll'" in capsys.readouterr().err
+
+
+def capture(tier, tmp_path, ring_size=2):
+    logs = []
+    debug = CaseDebug(tier, tmp_path, "SA_1_2020", logs.append, ring_size=ring_size)
+    for i in range(3):
+        debug.bytes(1, f"frame{i}", "txt", b"x")
+    return debug, logs
+
+
+def written(tmp_path):
+    assert get_debug_writer().flush(timeout=5)
+    return sorted(name for path in tmp_path.glob("*.txt") for name in ("frame0", "frame1", "frame2") if name in path.name)
+
+
+def test_failures_tier_keeps_recent_frames_until_flush(tmp_path):
+    debug, logs = capture("failures", tmp_path)
+    assert written(tmp_path) == []
+    debug.flush("invalid captcha")
+    assert written(tmp_path) == ["frame1", "frame2"]
+    assert "[debug] invalid captcha: saving 2 recent frame(s)" in logs
+
+
+def test_full_tier_writes_every_frame_and_off_writes_none(tmp_path):
+    capture("full", tmp_path / "full")
+    assert written(tmp_path / "full") == ["frame0", "frame1", "frame2"]
+    debug, _ = capture("off", tmp_path / "off")
+    debug.flush("exception")
+    assert written(tmp_path / "off") == []
+
+
+def test_file_names_round_trip(tmp_path):
+    path = build_debug_file_path(tmp_path, "SA 508/1999", 2, "captcha_raw", "png", run_id="R-261017-091500")
+    assert parse_debug_file_name(path.name) == ("R-261017-091500", "SA_508_1999", 2, "captcha_raw")
+    assert filter_debug_files([(path.name, 1, 0)], run_id="R-261017-091500", case="sa 508/1999")
+
+
+def write(debug_dir, index, name, size, kind="captcha_raw"):
+    (debug_dir / name).write_bytes(b"x" * size)
+    index.add(name, kind=kind, size=size)
+
+
+def test_index_lists_and_evicts_least_recently_used(tmp_path):
+    index = DebugIndex(tmp_path, max_bytes=250, max_age_days=0)
+    write(tmp_path, index, "a.png", 100)
+    write(tmp_path, index, "b.png", 100)
+    index.touch(["a.png"])
+    write(tmp_path, index, "c.png", 100)
+    names = {name for name, _, _ in index.files()}
+    assert names == {"a.png", "c.png"}
+    assert not (tmp_path / "b.png").exists()
+    assert index.latest("captcha_raw") == tmp_path / "c.png"
+    assert index.stats() == {"files": 2, "bytes": 200}
+
+
+def test_index_is_rebuilt_from_disk_and_shared_by_readers(tmp_path):
+    (tmp_path / "R-261017-091500_SA_1_1_attempt1_page_20261017_091500_000001.html.gz").write_bytes(b"x")
+    index = DebugIndex(tmp_path, max_age_days=0)
+    assert index.run_ids() == ["R-261017-091500"]
+    other = DebugIndex(tmp_path, max_age_days=0)
+    write(tmp_path, index, "late.png", 5)
+    assert "late.png" in {name for name, _, _ in other.files()}
+
+
+def test_age_cap(tmp_path):
+    index = DebugIndex(tmp_path, max_bytes=0, max_age_days=1)
+    write(tmp_path, index, "old.png", 1)
+    index._entries["old.png"]["ts"] = time.time() - 2 * 86400
+    index._next_age_check = 0
+    assert index.enforce() == 1
+    assert index.files() == []
+
+
+def test_bundle_is_reused_until_the_selection_changes(tmp_path):
+    debug_dir = tmp_path / "debug"
+    debug_dir.mkdir()
+    (debug_dir / "a.html").write_text("a")
+    files = scan_debug_dir(debug_dir)
+    first = build_debug_bundle(debug_dir, files, bundle_dir=tmp_path / "bundles")
+    assert build_debug_bundle(debug_dir, files, bundle_dir=tmp_path / "bundles") == first
+    (debug_dir / "b.html").write_text("b")
+    os.utime(debug_dir / "b.html")
+    assert build_debug_bundle(debug_dir, scan_debug_dir(debug_dir), bundle_dir=tmp_path / "bundles") != first
+
+
+def test_writer_flush_waits_without_extra_threads(tmp_path, monkeypatch):
+    import threading
+
+    import debug_artifacts
+    from debug_artifacts import DebugWriter
+
+    release = threading.Event()
+    monkeypatch.setitem(debug_artifacts.ENCODERS, "slow", lambda data: (release.wait(5), data)[1])
+    writer = DebugWriter()
+    writer.submit(tmp_path / "a.txt", b"a", encoding="slow")
+    threads = threading.active_count()
+    assert writer.flush(timeout=0.05) is False
+    assert threading.active_count() == threads
+    release.set()
+    assert writer.flush(timeout=5) is True
+    assert (tmp_path / "a.txt").read_bytes() == b"a"
+    assert writer.stats()["written"] == 1
+
+
+def test_bundle_cap_keeps_the_newest_files():
+    files = [("a.png", 40, 1.0), ("c.png", 40, 3.0), ("b.png", 40, 2.0)]
+    assert cap_debug_files(files, max_bytes=100) == ([("c.png", 40, 3.0), ("b.png", 40, 2.0)], 1)
+    assert cap_debug_files(files, max_bytes=0) == (files, 0)
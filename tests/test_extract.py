@@ -0,0 +1,38 @@
+import pytest
+
+from fetch_engine import extract_case_snapshot, extract_cnr_number, get_latest_order_link, latest_order
+
+PAGE = """<html><body><div><table class="{details}"><tr><td>CNR Number</td><td><strong>MHHC01-001234-2020</strong></td></tr>
+<tr><td>Filing Number</td><td>1234/2020</td></tr></table></div>
+<table class="{orders}"><tr><th>Sr</th><th>Case</th><th>Judge</th><th>Date</th><th>Order</th></tr>
+<tr><td>1</td><td>x</td><td>j</td><td>01-02-2021</td><td><a href="p0">v</a></td></tr>
+<tr><td>2</td><td>x</td><td>j</td><td>05-03-2021</td><td><a href="p1">v</a></td></tr>
+</table></body></html>"""
+
+
+@pytest.mark.parametrize(
+    "details, orders",
+    [
+        ("case_details_table", "order_table"),
+        ("case_details_table table", "order_table table-bordered"),
+        ("table case_details_table", "table table-striped order_table"),
+    ],
+)
+def test_snapshot_reads_tables_with_extra_classes(details, orders):
+    snapshot = extract_case_snapshot(PAGE.format(details=details, orders=orders))
+    assert snapshot["has_order_table"]
+    assert snapshot["details"]["Filing Number"] == "1234/2020"
+    assert snapshot["cnr"] == "MHHC01-001234-2020"
+    assert latest_order(snapshot) == ("05-03-2021", "p1")
+
+
+def test_helpers_share_the_snapshot():
+    page = PAGE.format(details="case_details_table table", orders="order_table table-bordered")
+    assert get_latest_order_link(page) == ("05-03-2021", "p1")
+    assert extract_cnr_number(page) == "MHHC01-001234-2020"
+
+
+def test_page_without_tables():
+    snapshot = extract_case_snapshot("<html>no tables, CNR MHHC01-000001-2021 in text</html>")
+    assert snapshot["has_order_table"] is False
+    assert snapshot["cnr"] == "MHHC01-000001-2021"
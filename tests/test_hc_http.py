@@ -0,0 +1,131 @@
+import hc_http
+import fetch_engine
+from hc_http import HcHttpClient, fetch_case_http, format_cino, parse_search_records
+
+
+class FakeOcr:
+    last_inference_seconds = 0.001
+
+    def __init__(self, code):
+        self.code = code
+
+    def classify(self, img):
+        return self.code
+
+    def summary(self):
+        return "fake"
+
+
+CASE = {
+    "name": "SA",
+    "value": "4",
+    "no": "508",
+    "year": "1999",
+    "sess_state_code": "1",
+    "court_complex_code": "1",
+    "search_mode": "CN",
+}
+
+
+def test_parse_search_records_decodes_nested_json():
+    text = '{"con": ["[{\\"cino\\": \\"MHHC010012342020\\", \\"case_no\\": \\"2011\\"}]"], "totRecords": 1}'
+    assert parse_search_records(text) == [{"cino": "MHHC010012342020", "case_no": "2011"}]
+    assert parse_search_records('{"con": ["[]"], "totRecords": 0}') == []
+    assert parse_search_records("Invalid Captcha") == []
+
+
+def test_format_cino():
+    assert format_cino("mhhc010012342020") == "MHHC01-001234-2020"
+    assert format_cino("not-a-cino") == "NOT-A-CINO"
+    assert format_cino(None) == ""
+
+
+def test_client_talks_to_standin(standin):
+    client = HcHttpClient(base_url=standin)
+    try:
+        client.prime()
+        assert client.session.cookies.get("HCSESSID") == "standin1"
+        assert client.captcha().startswith(b"\x89PNG")
+        assert parse_search_records(client.search(CASE, "abcdef"))[0]["cino"] == "MHHC010012342020"
+        assert client.search(CASE, "abc") == "Invalid Captcha"
+    finally:
+        client.close()
+
+
+def run_case(standin, monkeypatch, case, code="ab3k9q"):
+    monkeypatch.setattr(hc_http, "get_ocr_engine", lambda: FakeOcr(code))
+    monkeypatch.setattr(hc_http.time, "sleep", lambda seconds: None)
+    logs = []
+    client = HcHttpClient(base_url=standin)
+    try:
+        result, outcome = fetch_case_http(client, case, "off", "unused", logs.append, attempts=[1, 2])
+    finally:
+        client.close()
+    return result, outcome, logs
+
+
+def test_fetch_case_http_downloads_latest_order(standin, monkeypatch, pdf_store):
+    result, outcome, _ = run_case(standin, monkeypatch, CASE)
+    assert outcome["reason"] == "PDF downloaded"
+    assert outcome["cnr"] == "MHHC01-001234-2020"
+    assert result["order_date"] == "05-06-2024"
+    assert pdf_store.read(result["pdf_ref"]).startswith(b"%PDF")
+    assert "filename=b" in pdf_store.read(result["pdf_ref"]).decode()
+
+
+def test_fetch_case_http_without_records(standin, monkeypatch, pdf_store):
+    result, outcome, _ = run_case(standin, monkeypatch, dict(CASE, no="404"))
+    assert result is None
+    assert outcome["reason"] == "No history/orders found"
+
+
+def test_fetch_case_http_classifies_failures(standin, monkeypatch, pdf_store):
+    _, outcome, _ = run_case(standin, monkeypatch, CASE, code="abc")
+    assert outcome["failure"] == "captcha_unreadable"
+    _, outcome, _ = run_case(standin, monkeypatch, dict(CASE, no="500"))
+    assert outcome["failure"] == "site_unreachable"
+    assert outcome["reason"] == "Failed after retries"
+
+
+def test_iter_fetch_events_http_engine(standin, monkeypatch, pdf_store, tmp_path):
+    monkeypatch.setattr(hc_http, "get_ocr_engine", lambda: FakeOcr("ab3k9q"))
+    monkeypatch.setattr(fetch_engine, "warm_up_ocr", lambda: FakeOcr("ab3k9q"))
+    cases = [CASE, dict(CASE, no="404")]
+    events = list(
+        fetch_engine.iter_fetch_events(cases, workers=2, engine="http", base_url=standin, debug_dir=tmp_path)
+    )
+    outcomes = [event[3] for event in events if event[0] == "case"]
+    assert [o["reason"] for o in outcomes] == ["PDF downloaded", "No history/orders found"]
+
+
+def test_unreadable_captcha_flushes_buffered_frames(standin, monkeypatch, tmp_path):
+    monkeypatch.setattr(hc_http, "get_ocr_engine", lambda: FakeOcr("x"))
+    logs = []
+    client = HcHttpClient(base_url=standin)
+    try:
+        _, outcome = fetch_case_http(client, CASE, "failures", tmp_path, logs.append, attempts=[1])
+    finally:
+        client.close()
+    assert outcome["failure"] == "captcha_unreadable"
+    assert any(line.startswith("[debug] captcha unreadable: saving 2") for line in logs)
+
+
+def test_retry_renews_an_expired_session(standin_server, monkeypatch, pdf_store):
+    server, base_url = standin_server
+    monkeypatch.setattr(hc_http, "get_ocr_engine", lambda: FakeOcr("ab3k9q"))
+    monkeypatch.setattr(hc_http.time, "sleep", lambda seconds: None)
+    client = HcHttpClient(base_url=base_url)
+    try:
+        client.prime()
+        # The PHP session dies mid-run: the next search reads as an invalid captcha.
+        server.state["sessions"].clear()
+        _, outcome = fetch_case_http(client, CASE, "off", "unused", lambda msg: None, attempts=[1])
+        assert outcome["failure"] == "captcha_invalid"
+        # The scheduler's next attempt starts a new session, which the next case then reuses.
+        result, outcome = fetch_case_http(client, CASE, "off", "unused", lambda msg: None, attempts=[2])
+        assert outcome["reason"] == "PDF downloaded"
+        _, outcome = fetch_case_http(client, dict(CASE, no="404"), "off", "unused", lambda msg: None, attempts=[1])
+        assert outcome["reason"] == "No history/orders found"
+    finally:
+        client.close()
+    assert server.state["main_loads"] == 2
@@ -0,0 +1,336 @@
+import types
+
+import pytest
+
+import lextechsuite
+import ls_session
+
+
+class FakeLocator:
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+
+    @property
+    def first(self):
+        return self
+
+    def count(self):
+        return 1 if self.selector in self.page.present else 0
+
+    def is_visible(self):
+        return self.count() > 0
+
+    def fill(self, value):
+        self.page.values[self.selector] = value
+
+    def click(self, **kwargs):
+        if self.selector == "#btnSav":
+            self.page.save()
+
+    def wait_for(self, **kwargs):
+        if self.count() == 0:
+            raise TimeoutError("not visible")
+
+    def inner_text(self):
+        return self.page.message
+
+
+class FakePage:
+    """Just enough of a Playwright page for _send_job on the Case Manager."""
+
+    def __init__(self, context, modal=True):
+        self.context = context
+        self.present = {"button.kc_fab_main_btn", "#spErr_frmAddMod"} | ({"#fcnr_number"} if modal else set())
+        self.values = {}
+        self.message = ""
+        self.listeners = {}
+        self.url = lextechsuite.LEXTECHSUITE_CASES_URL
+
+    def set_default_timeout(self, timeout):
+        pass
+
+    def goto(self, url, **kwargs):
+        if url == lextechsuite.LEXTECHSUITE_CASES_URL:
+            self.context.visits += 1
+            if self.context.visits in self.context.bounce_visits:
+                # The server logged us out: the Case Manager redirects to MembersOnlyPage.
+                url = lextechsuite.LEXTECHSUITE_BASE_URL + "Public/MembersOnlyPage"
+        elif url == lextechsuite.LEXTECHSUITE_LOGIN_URL:
+            self.context.logins += 1
+        self.url = url
+
+    def wait_for_load_state(self, *args, **kwargs):
+        pass
+
+    def wait_for_selector(self, *args, **kwargs):
+        pass
+
+    def locator(self, selector, **kwargs):
+        return FakeLocator(self, selector)
+
+    def evaluate(self, expression, *args):
+        return "#fcnr_number" in self.present
+
+    def select_option(self, *args, **kwargs):
+        pass
+
+    def on(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners[event].remove(handler)
+
+    def content(self):
+        return self.context.cases_html
+
+    def screenshot(self, **kwargs):
+        return b"\xff\xd8fake-jpeg"
+
+    def save(self):
+        cnr = self.values["#fcnr_number"]
+        self.context.saved.append(cnr)
+        self.message = "Record has been saved"
+        request = types.SimpleNamespace(
+            method="POST",
+            url=lextechsuite.LEXTECHSUITE_BASE_URL + "Member/SaveCNR",
+            post_data=f"fcnr_number={cnr}&fwher=h",
+            headers={"content-type": "application/x-www-form-urlencoded"},
+        )
+        for handler in self.listeners.get("request", []):
+            handler(request)
+
+
+class FakeContext:
+    def __init__(self, modal=True, cases_html=""):
+        self.cases_html = cases_html
+        self.saved = []
+        self.visits = 0
+        self.bounce_visits = set()
+        self.logins = 0
+        self.page = FakePage(self, modal=modal)
+        self.request = types.SimpleNamespace(get=lambda url, **kwargs: types.SimpleNamespace(ok=True, url=url))
+
+    def new_page(self):
+        return self.page
+
+    def add_cookies(self, cookies):
+        pass
+
+    def clear_cookies(self):
+        pass
+
+    def cookies(self, *args):
+        return []
+
+    def storage_state(self):
+        return {"cookies": [{"name": "session", "value": f"login-{self.logins}"}], "origins": []}
+
+
+@pytest.fixture(autouse=True)
+def no_saved_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(ls_session, "_STORE", ls_session.LsSessionStore(tmp_path / "sessions"))
+    monkeypatch.setattr(lextechsuite, "_KNOWN", {})
+    monkeypatch.setattr(lextechsuite.time, "sleep", lambda seconds: None)
+
+
+def send(context, cnrs, tmp_path, debug=False, bulk=False, logs=None):
+    log = logs.append if logs is not None else (lambda msg: None)
+    return lextechsuite._send_job(context, [cnrs], "me@example.com", "pw", debug, tmp_path / "debug", bulk, log)
+
+
+def test_modal_flow_saves_each_cnr(tmp_path):
+    context = FakeContext()
+    outcomes = send(context, ["MHHC010000012020", "SHORT"], tmp_path)
+    assert context.saved == ["MHHC010000012020"]
+    assert [o["ok"] for o in outcomes] == [True, False]
+
+
+def test_modal_failure_dumps_go_through_the_debug_index(tmp_path, monkeypatch):
+    from debug_artifacts import get_debug_index, get_debug_writer, parse_debug_file_name
+
+    monkeypatch.chdir(tmp_path)
+    outcomes = send(FakeContext(modal=False), ["MHHC010000012020"], tmp_path)
+    assert outcomes[0]["reason"] == "Could not open +cnr modal"
+    assert get_debug_writer().flush(timeout=5)
+    files = get_debug_index(tmp_path / "debug").files()
+    assert {parse_debug_file_name(name)[3] for name, _, _ in files} == {"ls_openfab"}
+    assert len(files) == 2
+    assert not (tmp_path / "debug_artifacts").exists()
+
+
+def test_relogin_after_bulk_expiry_replaces_the_saved_session(tmp_path, monkeypatch):
+    store = ls_session.get_ls_session_store()
+    assert store.available
+    store.save("me@example.com", "pw", {"cookies": [{"name": "session", "value": "old"}], "origins": []})
+
+    def expired(template, cnrs, cookies, log, concurrency=None):
+        return [{"cnr": c, "ok": False, "reason": lextechsuite.SESSION_EXPIRED_REASON} for c in cnrs]
+
+    monkeypatch.setattr(lextechsuite, "bulk_save_cnrs", expired)
+    context = FakeContext()
+    # Visit 1 opens the Case Manager; visit 2 follows the expired bulk save and bounces.
+    context.bounce_visits = {2}
+    logs = []
+    outcomes = send(context, ["MHHC010000012020", "MHHC010000022020"], tmp_path, bulk=True, logs=logs)
+    assert [o["ok"] for o in outcomes] == [True, True]
+    assert "[ls] reusing saved login session" in logs
+    assert context.logins == 1
+    assert store.load("me@example.com", "pw")["cookies"][0]["value"] == "login-1"
+
+
+@pytest.mark.parametrize(
+    "status, url, text, expected",
+    [
+        (200, "https://x/Member/SaveCNR", "<span>Record has been saved</span>", (True, "Sent to LexSuite")),
+        (200, "https://x/Member/SaveCNR", "CNR already exists", (True, "Already in LexSuite")),
+        (200, "https://x/Member/SaveCNR", "<b>Invalid</b> CNR Number", (False, "Invalid CNR Number")),
+        (200, "https://x/Public/MembersOnlyPage", "Please log in", (False, lextechsuite.SESSION_EXPIRED_REASON)),
+        (200, "https://x/Member/SaveCNR", "", (False, lextechsuite.SAVE_UNCONFIRMED_REASON)),
+        (200, "https://x/Member/SaveCNR", "<html><form id=login></form></html>", (False, lextechsuite.SAVE_UNCONFIRMED_REASON)),
+        (403, "https://x/Member/SaveCNR", "Record has been saved", (False, "Save not confirmed (HTTP 403)")),
+    ],
+)
+def test_classify_save_response(status, url, text, expected):
+    assert lextechsuite.classify_save_response(status, url, text) == expected
+
+
+def standin_template(base_url, cnr="MHHC010000012020"):
+    from standin_lextechsuite import TOKEN
+
+    return {
+        "url": base_url + "Member/SaveCNR",
+        "body": f"fcnr_number={cnr}&tok={TOKEN}",
+        "headers": {"Content-Type": "application/x-www-form-urlencoded"},
+        "cnr": cnr,
+    }
+
+
+def test_bulk_save_against_standin(ls_standin):
+    server, base_url = ls_standin
+    cookies = [{"name": "SID", "value": "standin", "domain": "127.0.0.1"}]
+    cnrs = ["MHHC010000022020", "MHHC010000032020", "MHHC010000022020", "XXXX010000042020", "ZZZZ010000052020"]
+    outcomes = lextechsuite.bulk_save_cnrs(standin_template(base_url), cnrs, cookies, lambda msg: None, concurrency=2)
+    assert [o["cnr"] for o in outcomes] == cnrs
+    reasons = [o["reason"] for o in outcomes]
+    assert reasons[:2] == ["Sent to LexSuite", "Sent to LexSuite"]
+    assert set(reasons[:3]) == {"Sent to LexSuite", "Already in LexSuite"} and reasons.count("Already in LexSuite") == 1
+    assert reasons[3:] == ["Invalid CNR Number", lextechsuite.SAVE_UNCONFIRMED_REASON]
+    assert [lextechsuite.needs_modal(o) for o in outcomes] == [False, False, False, False, True]
+    assert 1 < server.state["max_in_flight"] <= 2
+
+
+def test_bulk_save_without_session_reports_expiry(ls_standin):
+    _, base_url = ls_standin
+    outcomes = lextechsuite.bulk_save_cnrs(standin_template(base_url), ["MHHC010000022020"], [], lambda msg: None)
+    assert outcomes[0]["reason"] == lextechsuite.SESSION_EXPIRED_REASON
+
+
+def test_unconfirmed_bulk_saves_go_through_the_modal(tmp_path, monkeypatch):
+    def unconfirmed(template, cnrs, cookies, log, concurrency=None):
+        return [{"cnr": c, "ok": False, "reason": lextechsuite.SAVE_UNCONFIRMED_REASON} for c in cnrs]
+
+    monkeypatch.setattr(lextechsuite, "bulk_save_cnrs", unconfirmed)
+    context = FakeContext()
+    outcomes = send(context, ["MHHC010000012020", "MHHC010000022020"], tmp_path, bulk=True)
+    assert context.saved == ["MHHC010000012020", "MHHC010000022020"]
+    assert [o["reason"] for o in outcomes] == ["Sent to LexSuite", "Sent to LexSuite"]
+
+
+def test_listed_cnrs_reads_only_cnr_fields():
+    text = '{"data": [{"CNRNo": "MHHC01-000010-2020", "Title": "vs MHHC019999992020"}, {"cnr": "bad"}]}'
+    assert lextechsuite.listed_cnrs(text) == {"MHHC010000102020"}
+    assert lextechsuite.listed_cnrs("<td>MHHC01-000010-2020</td>") == {"MHHC010000102020"}
+    assert lextechsuite.with_page("https://x/List?size=50&page=1", "page", 3) == "https://x/List?size=50&page=3"
+
+
+class RequestsApi:
+    """The slice of Playwright's APIRequestContext KnownCnrs uses, over requests."""
+
+    def __init__(self, cookies):
+        import requests
+
+        self.session = requests.Session()
+        self.session.cookies.update(cookies)
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        res = self.session.get(url, timeout=5)
+        return types.SimpleNamespace(ok=res.ok, url=res.url, text=lambda: res.text)
+
+
+def test_known_cnrs_follow_the_case_list_pages(ls_standin):
+    from standin_lextechsuite import EXISTING
+
+    server, base_url = ls_standin
+    server.state["saved"].add("MHHC010000132020")
+    known = lextechsuite.KnownCnrs(list_url=base_url + "Member/CaseList")
+    api = RequestsApi({"SID": "standin"})
+    assert known.refresh(api) == 4
+    assert known.cnrs == set(EXISTING) | {"MHHC010000132020"}
+    # Two full pages, then an empty third one ends the listing.
+    assert [url.rsplit("=", 1)[1] for url in api.urls] == ["1", "2", "3"]
+    assert not known.stale
+
+
+def test_known_cnrs_stop_when_paging_is_ignored():
+    page = '{"data": [{"cnr": "MHHC010000102020"}]}'
+    calls = []
+
+    def get(url, timeout=None):
+        calls.append(url)
+        return types.SimpleNamespace(ok=True, url=url, text=lambda: page)
+
+    known = lextechsuite.KnownCnrs(list_url="https://x/Member/CaseList")
+    assert known.refresh(types.SimpleNamespace(get=get)) == 1
+    assert len(calls) == 2
+
+
+
+def test_failed_case_list_stays_stale(ls_standin):
+    _, base_url = ls_standin
+    known = lextechsuite.KnownCnrs(list_url=base_url + "Member/CaseList")
+    # Logged out: redirected to MembersOnlyPage.
+    assert known.refresh(RequestsApi({})) == 0
+    assert known.stale
+    known.list_url = base_url + "Member/Missing"
+    assert known.refresh(RequestsApi({"SID": "standin"})) == 0
+    assert known.stale
+    known.list_url = base_url + "Member/CaseList"
+    assert known.refresh(RequestsApi({"SID": "standin"})) == 3
+    assert not known.stale
+
+def test_known_cnrs_discover_the_listing_xhr():
+    def response(url, method, content_type, text):
+        return types.SimpleNamespace(
+            url=url,
+            request=types.SimpleNamespace(method=method),
+            headers={"content-type": content_type},
+            text=lambda: text,
+        )
+
+    known = lextechsuite.KnownCnrs()
+    known.list_url = None
+    responses = [
+        response("https://x/Member/Notes", "GET", "application/json", '{"note": "MHHC010000102020"}'),
+        response("https://x/Member/Save", "POST", "application/json", '{"cnr": "MHHC010000102020"}'),
+        response("https://x/Member/CaseList?pageNo=1&size=20", "GET", "application/json", '{"rows": [{"CNR": "MHHC010000102020"}]}'),
+    ]
+    assert known.discover(responses)
+    assert known.list_url == "https://x/Member/CaseList?pageNo=1&size=20"
+    assert (known.page_param, known.first_page) == ("pageNo", 1)
+    other = lextechsuite.KnownCnrs()
+    other.list_url = None
+    assert not other.discover(responses[:2])
+
+
+def test_known_cnrs_are_kept_per_account_across_sends(tmp_path):
+    assert lextechsuite.get_known_cnrs(" Me@Example.com") is lextechsuite.get_known_cnrs("me@example.com")
+    context = FakeContext()
+    send(context, ["MHHC010000012020"], tmp_path)
+    logs = []
+    outcomes = send(context, ["MHHC010000012020", "MHHC010000022020"], tmp_path, logs=logs)
+    assert context.saved == ["MHHC010000012020", "MHHC010000022020"]
+    assert outcomes[0]["skipped"] and outcomes[1]["reason"] == "Sent to LexSuite"
+    assert "[ls] skipped 1 CNR(s) already in LexSuite; 1 to send" in logs
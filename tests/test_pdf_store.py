@@ -0,0 +1,41 @@
+def test_put_is_content_addressed(pdf_store):
+    ref = pdf_store.put(b"%PDF-1.4 same")
+    assert pdf_store.put(b"%PDF-1.4 same") == ref
+    assert pdf_store.path(ref).parent.name == ref[:2]
+    assert pdf_store.read(ref) == b"%PDF-1.4 same"
+    assert pdf_store.size(ref) == len(b"%PDF-1.4 same")
+
+
+def test_preview_and_delete(pdf_store):
+    ref = pdf_store.put(b"%PDF-1.4 preview")
+    assert pdf_store.preview_url(ref).endswith(f"/pdf/{ref}.pdf")
+    pdf_store.delete(ref)
+    assert not pdf_store.exists(ref)
+    assert not pdf_store.exists("")
+
+
+def test_prune_removes_least_recently_used_first(pdf_store):
+    import os
+
+    refs = [pdf_store.put(bytes([i]) * 1000) for i in range(3)]
+    pdf_store.preview_url(refs[1])
+    for age, ref in zip((300, 200, 100), refs):
+        os.utime(pdf_store.path(ref), (0, os.path.getmtime(pdf_store.path(ref)) - age))
+    pdf_store.read(refs[0])  # used again: now the most recent
+    pdf_store.max_bytes = 2000
+    assert pdf_store.prune() == 1
+    assert pdf_store.exists(refs[0]) and pdf_store.exists(refs[2])
+    assert not pdf_store.exists(refs[1])
+    assert not list((pdf_store.path(refs[1]).parent.parent.parent / "static" / "pdf").glob("*.pdf"))
+
+
+def test_prune_by_age(pdf_store):
+    import os
+    import time
+
+    old = pdf_store.put(b"%PDF old")
+    new = pdf_store.put(b"%PDF new")
+    os.utime(pdf_store.path(old), (0, time.time() - 3 * 86400))
+    pdf_store.max_age_days = 1
+    assert pdf_store.prune() == 1
+    assert pdf_store.exists(new) and not pdf_store.exists(old)
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from rate_limiter import HostLimiter, RateLimiter
+
+
+def test_burst_then_rate():
+    limiter = HostLimiter(rate_per_min=600, burst=3, max_concurrency=10, jitter=0)
+    start = time.monotonic()
+    for _ in range(5):
+        with limiter.slot():
+            pass
+    # 3 from the burst, then 2 more at 10/s.
+    assert 0.15 <= time.monotonic() - start < 1.0
+    assert limiter.gauges()["requests"] == 5
+
+
+def test_concurrency_cap():
+    limiter = HostLimiter(rate_per_min=60000, burst=100, max_concurrency=2, jitter=0)
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with limiter.slot():
+            with lock:
+                peak.append(limiter.in_flight)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 2
+    assert limiter.gauges()["in_flight"] == 0
+
+
+def test_only_listed_hosts_are_limited():
+    limiter = RateLimiter(hosts=["hcservices.ecourts.gov.in"], rate_per_min=60, burst=1, jitter=0)
+    with limiter.slot("https://hcservices.ecourts.gov.in/hcservices/main.php") as waited:
+        assert waited >= 0
+    with limiter.slot("http://127.0.0.1:8765/hcservices/main.php") as waited:
+        assert waited == 0.0
+    assert list(limiter.gauges()) == ["hcservices.ecourts.gov.in"]
+    assert "requests=1" in limiter.summary()
@@ -0,0 +1,189 @@
+import os
+import time
+import types
+
+import pytest
+
+import resource_policy
+from resource_policy import AssetCache, ResourcePolicy, resource_policy_mode
+
+
+@pytest.fixture(autouse=True)
+def size_hints(tmp_path, monkeypatch):
+    path = tmp_path / "resource_sizes.json"
+    monkeypatch.setattr(resource_policy, "RESOURCE_SIZE_HINTS", str(path))
+    return path
+
+
+class FakeContext:
+    def __init__(self):
+        self.routes = []
+        self.listeners = {}
+
+    def route(self, pattern, handler):
+        self.routes.append(pattern)
+
+    def on(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+
+def test_decide():
+    policy = ResourcePolicy(mode="enforce")
+    hc = "https://hcservices.ecourts.gov.in/hcservices/"
+    assert policy.decide(hc + "main.php", "document") == "allow"
+    assert policy.decide(hc + "securimage/securimage_show.php?0.1", "image") == "allow"
+    assert policy.decide(hc + "images/logo.png", "image") == "block"
+    assert policy.decide(hc + "css/site.css", "stylesheet") == "allow"
+    assert policy.decide("https://www.googletagmanager.com/gtm.js", "script") == "stub"
+    assert policy.decide("https://fonts.gstatic.com/x.woff2", "font") == "block"
+    assert policy.decide("https://example.com/x.png", "image") == "allow"
+    assert policy.decide("data:image/png;base64,xx", "image") == "allow"
+    with pytest.raises(ValueError):
+        resource_policy_mode("sometimes")
+
+
+@pytest.mark.parametrize("mode, routed, events", [("off", 0, set()), ("observe", 0, {"request", "response"}), ("enforce", 1, {"response"})])
+def test_only_enforce_routes(mode, routed, events):
+    context = FakeContext()
+    ResourcePolicy(mode=mode).install(context)
+    assert len(context.routes) == routed
+    assert set(context.listeners) == events
+
+
+def response(url, resource_type, size):
+    request = types.SimpleNamespace(url=url, resource_type=resource_type)
+    return types.SimpleNamespace(url=url, request=request, headers={"content-length": str(size)})
+
+
+def test_observe_counts_without_routing():
+    policy = ResourcePolicy(mode="observe")
+    context = FakeContext()
+    policy.install(context)
+
+    for url, kind, size in [
+        ("https://hcservices.ecourts.gov.in/hcservices/main.php", "document", 1000),
+        ("https://hcservices.ecourts.gov.in/hcservices/images/a.png", "image", 500),
+    ]:
+        context.listeners["request"][0](types.SimpleNamespace(url=url, resource_type=kind))
+        context.listeners["response"][0](response(url, kind, size))
+    stats = policy.stats()
+    assert (stats["requests"], stats["allowed"], stats["blocked"]) == (2, 1, 1)
+    assert stats["blocked_bytes"] == 500
+    assert "would_block=1" in policy.summary()
+
+
+class FakeRoute:
+    def __init__(self, url, headers, body, status=200):
+        self.request = types.SimpleNamespace(url=url, resource_type="script", method="GET", headers={})
+        self.upstream = types.SimpleNamespace(status=status, headers=headers, body=lambda: body)
+        self.fulfilled = None
+        self.sent_headers = None
+
+    def fetch(self, headers=None):
+        self.sent_headers = headers
+        return self.upstream
+
+    def fulfill(self, **kwargs):
+        self.fulfilled = kwargs
+
+
+def test_assets_are_served_without_transfer_headers(tmp_path):
+    policy = ResourcePolicy(mode="enforce", assets=AssetCache(tmp_path))
+    url = "https://hcservices.ecourts.gov.in/hcservices/js/app.js"
+    upstream = {"Content-Type": "application/javascript", "Content-Encoding": "gzip", "Content-Length": "12"}
+    for expected in ("asset_misses", "asset_hits"):
+        route = FakeRoute(url, upstream, b"var a = 1;")
+        assert policy._serve_asset(route, route.request)
+        assert route.fulfilled["headers"] == {"content-type": "application/javascript"}
+        assert route.fulfilled["body"] == b"var a = 1;"
+        assert "response" not in route.fulfilled
+        assert policy.stats()[expected] == 1
+
+
+def test_asset_cache_prunes_least_recently_used(tmp_path):
+    cache = AssetCache(tmp_path, max_bytes=250)
+    for i, url in enumerate(["https://x/a.js", "https://x/b.js", "https://x/c.js"]):
+        cache.put(url, 200, {}, b"x" * 100)
+        meta_path, _ = cache._paths(url)
+        os.utime(meta_path, (1000 + i, 1000 + i))
+    # Reading a.js makes it the most recently used, so b.js goes first.
+    assert cache.get("https://x/a.js") is not None
+    assert cache.prune() == 1
+    assert cache.get("https://x/b.js") is None
+    assert cache.get("https://x/a.js") is not None
+    assert cache.get("https://x/c.js") is not None
+
+
+def test_asset_cache_follows_cache_control(tmp_path, monkeypatch):
+    cache = AssetCache(tmp_path, ttl=3600)
+    assert not cache.put("https://x/a.js", 200, {"cache-control": "no-store"}, b"a")
+    assert not cache.put("https://x/a.js", 200, {"cache-control": "private, max-age=600"}, b"a")
+    # Must be revalidated every time, and there is nothing to revalidate with.
+    assert not cache.put("https://x/a.js", 200, {"cache-control": "no-cache"}, b"a")
+    assert cache.get("https://x/a.js") is None
+
+    assert cache.put("https://x/b.js", 200, {"cache-control": "public, max-age=60"}, b"b")
+    assert cache.get("https://x/b.js") is not None
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("https://x/b.js") is None
+
+
+def test_asset_cache_is_keyed_per_site(tmp_path):
+    cache = AssetCache(tmp_path)
+    cache.put("https://cdn/x.js", 200, {}, b"one", site="a.example")
+    assert cache.get("https://cdn/x.js", "a.example")[1] == b"one"
+    assert cache.get("https://cdn/x.js", "b.example") is None
+
+
+def test_stale_asset_is_revalidated(tmp_path, monkeypatch):
+    policy = ResourcePolicy(mode="enforce", assets=AssetCache(tmp_path))
+    url = "https://hcservices.ecourts.gov.in/hcservices/js/app.js"
+    route = FakeRoute(url, {"Cache-Control": "max-age=60", "ETag": '"v1"'}, b"var a = 1;")
+    assert policy._serve_asset(route, route.request)
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    route = FakeRoute(url, {"Cache-Control": "max-age=60"}, b"", status=304)
+    assert policy._serve_asset(route, route.request)
+    assert route.sent_headers == {"if-none-match": '"v1"'}
+    assert route.fulfilled["status"] == 200 and route.fulfilled["body"] == b"var a = 1;"
+    assert policy.stats()["asset_revalidated"] == 1
+
+    # The 304 renewed the entry, so the next request is a plain hit.
+    route = FakeRoute(url, {}, b"")
+    assert policy._serve_asset(route, route.request)
+    assert route.sent_headers is None and policy.stats()["asset_hits"] == 1
+
+
+class BlockedRoute:
+    def __init__(self):
+        self.aborted = None
+
+    def abort(self, reason):
+        self.aborted = reason
+
+
+def test_enforce_counts_sizes_observe_saved(size_hints):
+    logo = "https://hcservices.ecourts.gov.in/hcservices/images/logo.png"
+    font = "https://fonts.gstatic.com/x.woff2"
+    observe = ResourcePolicy(mode="observe")
+    observe._on_response(response(logo, "image", 2048))
+    assert size_hints.exists()
+
+    policy = ResourcePolicy(mode="enforce")
+    for url, kind in [(logo, "image"), (font, "font")]:
+        route = BlockedRoute()
+        policy._handle(route, types.SimpleNamespace(url=url, resource_type=kind))
+        assert route.aborted == "blockedbyclient"
+    stats = policy.stats()
+    assert (stats["blocked"], stats["blocked_bytes"], stats["blocked_unsized"]) == (2, 2048, 1)
+    assert "saved~=2KB (+1 unsized)" in policy.summary()
+
+
+def test_enforce_without_sizes_does_not_report_zero_saved():
+    policy = ResourcePolicy(mode="enforce")
+    policy._handle(BlockedRoute(), types.SimpleNamespace(url="https://fonts.gstatic.com/x.woff2", resource_type="font"))
+    assert policy.stats()["blocked_bytes"] == 0
+    assert "saved=? (1 unsized)" in policy.summary()
+    assert "saved~=0KB" not in policy.summary()
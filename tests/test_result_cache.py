@@ -0,0 +1,77 @@
+import pytest
+
+from result_cache import ResultCache, cache_key
+
+CASE = {"sess_state_code": "1", "court_complex_code": "1", "search_mode": "CN", "value": "4", "no": "508", "year": "1999"}
+
+
+@pytest.fixture
+def cache(tmp_path, pdf_store):
+    cache = ResultCache(tmp_path / "results.sqlite3", ttl=60, max_bytes=10_000)
+    yield cache
+    cache.close()
+
+
+def test_cache_key_ignores_other_fields():
+    assert cache_key(dict(CASE, name="SA")) == cache_key(CASE)
+    assert cache_key(dict(CASE, no="509")) != cache_key(CASE)
+
+
+def test_put_and_get(cache, pdf_store):
+    ref = pdf_store.put(b"%PDF-1.4 a")
+    outcome = {"reason": "PDF downloaded", "fetched": True, "cnr": "MHHC01-001234-2020"}
+    result = {"pdf_ref": ref, "order_date": "05-06-2024", "order_link": "cases/display_pdf.php?filename=b"}
+    assert cache.put(CASE, outcome, result)
+    entry = cache.get(CASE)
+    assert entry["fresh"] and entry["pdf_ref"] == ref and entry["order_date"] == "05-06-2024"
+    assert cache.get(dict(CASE, no="1")) is None
+
+
+def test_failures_are_not_cached(cache):
+    assert not cache.put(CASE, {"reason": "Failed after retries", "fetched": False})
+    assert cache.get(CASE) is None
+
+
+def test_stale_after_ttl(tmp_path, pdf_store):
+    cache = ResultCache(tmp_path / "stale.sqlite3", ttl=0)
+    cache.put(CASE, {"reason": "No recent orders found", "fetched": False})
+    assert cache.get(CASE)["fresh"] is False
+    cache.close()
+
+
+def test_lru_eviction_drops_unreferenced_pdfs(cache, pdf_store):
+    refs = []
+    for i in range(3):
+        ref = pdf_store.put(bytes([i]) * 4000)
+        refs.append(ref)
+        cache.put(dict(CASE, no=str(i)), {"reason": "PDF downloaded", "fetched": True}, {"pdf_ref": ref})
+    # 12000 bytes > 10000: the least recently used entry (no=0) and its PDF go.
+    assert cache.get(dict(CASE, no="0")) is None
+    assert not pdf_store.exists(refs[0])
+    assert pdf_store.exists(refs[2])
+    assert cache.stats() == {"entries": 2, "bytes": 8000}
+
+
+def test_fresh_entry_without_its_pdf_is_fetched_again(cache, pdf_store, monkeypatch):
+    import fetch_engine
+
+    ref = pdf_store.put(b"%PDF-1.4 gone")
+    case = dict(CASE, name="SA")
+    cache.put(case, {"reason": "PDF downloaded", "fetched": True, "cnr": "X"}, {"pdf_ref": ref, "order_date": "01-01-2024"})
+    pdf_store.delete(ref)
+    monkeypatch.setattr(fetch_engine, "warm_up_ocr", lambda: (_ for _ in ()).throw(RuntimeError("fetch started")))
+    events = fetch_engine.iter_fetch_events([case], engine="http", cache=cache)
+    logs = []
+    with pytest.raises(RuntimeError, match="fetch started"):
+        for event in events:
+            logs.append(event[1])
+    assert any("hits=0" in line and "misses=1" in line for line in logs)
+
+
+def test_shared_pdf_counts_once(cache, pdf_store):
+    ref = pdf_store.put(b"x" * 4000)
+    for no in ("1", "2", "3"):
+        cache.put(dict(CASE, no=no), {"reason": "PDF downloaded", "fetched": True}, {"pdf_ref": ref})
+    # Three rows, one 4000-byte file: within the 10000-byte budget, nothing is evicted.
+    assert cache.stats() == {"entries": 3, "bytes": 4000}
+    assert pdf_store.exists(ref)
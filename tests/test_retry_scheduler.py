@@ -0,0 +1,107 @@
+import pytest
+
+from retry_scheduler import SITE_DOWN_REASON, RetryScheduler, classify_failure
+
+POLICY = {
+    "captcha_invalid": {"backoff": 0.0, "site": False},
+    "navigation_timeout": {"backoff": 0.0, "site": True},
+    "error": {"backoff": 0.0, "site": False},
+}
+
+
+def test_classify_failure():
+    class TimeoutError_(Exception):
+        pass
+
+    TimeoutError_.__name__ = "TimeoutError"
+    assert classify_failure(TimeoutError_("x")) == "navigation_timeout"
+    assert classify_failure(RuntimeError("net::ERR_CONNECTION_REFUSED at ...")) == "site_unreachable"
+    assert classify_failure(ValueError("boom")) == "error"
+
+
+def test_failed_case_is_requeued_behind_the_others():
+    scheduler = RetryScheduler([(0, "a"), (1, "b")], max_attempts=3, policy=POLICY)
+    assert scheduler.next() == (0, "a", 1)
+    assert scheduler.report(0, "a", "captcha_invalid") == ("retry", 0.0)
+    assert scheduler.next() == (1, "b", 1)
+    assert scheduler.report(1, "b") == "done"
+    assert scheduler.next() == (0, "a", 2)
+    assert scheduler.report(0, "a") == "done"
+    assert scheduler.next() is None
+    assert "captcha_invalid=1" in scheduler.summary()
+
+
+def test_case_is_given_up_after_max_attempts():
+    scheduler = RetryScheduler([(0, "a")], max_attempts=2, policy=POLICY)
+    for attempt in (1, 2):
+        assert scheduler.next() == (0, "a", attempt)
+        outcome = scheduler.report(0, "a", "error")
+    assert outcome == "done"
+    assert scheduler.next() is None
+
+
+def test_site_failures_trip_the_breaker_and_abort():
+    notices = []
+    scheduler = RetryScheduler(
+        [(i, str(i)) for i in range(6)],
+        max_attempts=5,
+        notify=notices.append,
+        policy=POLICY,
+        breaker_threshold=2,
+        breaker_cooldown=0.0,
+        breaker_max_trips=2,
+    )
+    outcomes = []
+    while True:
+        item = scheduler.next()
+        if item is None:
+            break
+        outcomes.append(scheduler.report(item[0], item[1], "navigation_timeout"))
+    assert outcomes[-1] == "abort"
+    assert scheduler.aborted
+    assert scheduler.total_trips == 2
+    assert scheduler.remaining()
+    assert any("giving up" in n for n in notices)
+    assert SITE_DOWN_REASON
+
+
+def test_case_failure_resets_the_site_failure_streak():
+    scheduler = RetryScheduler([(i, str(i)) for i in range(3)], max_attempts=1, policy=POLICY, breaker_threshold=2)
+    for failure in ("navigation_timeout", "error", "navigation_timeout"):
+        case_index, case, _ = scheduler.next()
+        scheduler.report(case_index, case, failure)
+    assert scheduler.total_trips == 0
+
+
+@pytest.mark.parametrize("failure", [None, "error"])
+def test_close_stops_dispatching(failure):
+    scheduler = RetryScheduler([(0, "a"), (1, "b")], max_attempts=3, policy=POLICY)
+    scheduler.next()
+    scheduler.close()
+    scheduler.report(0, "a", failure)
+    assert scheduler.next() is None
+
+
+def test_requeued_case_keeps_its_case_debug(tmp_path):
+    import queue
+
+    from debug_artifacts import CaseDebugs
+    from fetch_engine import run_scheduled_cases
+
+    case = {"name": "SA", "no": "1", "year": "2020"}
+    scheduler = RetryScheduler([(0, case)], 3, policy=POLICY)
+    debugs = CaseDebugs("failures", tmp_path)
+    seen = []
+
+    def fetch(case, log, attempts, debug):
+        seen.append(debug)
+        if attempts == [1]:
+            return None, {"case_label": "SA 1/2020", "failure": "captcha_invalid"}
+        return None, {"case_label": "SA 1/2020", "reason": "No history/orders found"}
+
+    events = queue.Queue()
+    run_scheduled_cases(1, scheduler, events, fetch, debugs)
+    assert len(seen) == 2 and seen[0] is seen[1]
+    assert seen[0].case_slug == "SA_1_2020"
+    assert debugs._cases == {}
+    assert [event[0] for event in events.queue][-1] == "done"